@@ -1,3 +1,4 @@
+import importlib
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -18,6 +19,16 @@ from .middleware.security import (
 )
 from slowapi.errors import RateLimitExceeded
 from .services.firestore_service import firestore_service
+from .services.job_queue import job_queue
+from .services.rag_coaching import rag_coaching_service
+from .services.providers.registry import provider_registry
+from .services.providers.response_cache import response_cache
+from .services.providers.scheduler import provider_scheduler
+from .services.coach_cache import coach_answer_cache
+from .services.analysis_router import analysis_router
+from .services.image_cache import image_cache
+from .services.image_derivatives import shutdown_derivative_pool
+from .utils.singleflight import singleflight_stats
 
 # Load environment variables from .env if present
 load_dotenv()
@@ -91,6 +102,21 @@ async def test_providers():
     }
     return {"success": True, "providers": providers}
 
+@app.get("/api/metrics")
+async def metrics():
+    """Arka plan iş kuyruğu ve performans metrikleri"""
+    return {
+        "jobs": job_queue.stats(),
+        "index": {"vectors": rag_coaching_service.count()},
+        "providers": provider_registry.stats(),
+        "llm_cache": response_cache.stats(),
+        "coach_cache": coach_answer_cache.stats(),
+        "singleflight": singleflight_stats(),
+        "scheduler": provider_scheduler.stats(),
+        "analysis_routing": analysis_router.stats(),
+        "image_cache": image_cache.stats()
+    }
+
 # Debug endpoint - API endpoints listesi
 @app.get("/api/endpoints")
 async def list_endpoints():
@@ -105,6 +131,28 @@ async def list_endpoints():
             })
     return {"endpoints": routes} 
 
+# Startup: kalıcı iş kuyruğu worker'larını başlat
+@app.on_event("startup")
+async def start_job_workers():
+    # Yalnızca script'lerden kuyruğa alınan iş türleri (analysis_backfill) worker'lar başlamadan kaydedilir
+    importlib.import_module(".services.analysis_backfill", __package__)
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    job_queue.stop()
+    shutdown_derivative_pool()
+
+@app.on_event("startup")
+async def warm_providers():
+    """LLM istemcilerini ilk istekten önce oluştur"""
+    for name, status in provider_registry.warm().items():
+        print(f"{'✅' if status == 'ready' else '⚠️'} Provider {name}: {status}")
+
+@app.on_event("shutdown")
+async def close_providers():
+    await provider_registry.aclose()
+
 # Startup: ensure demo account exists
 @app.on_event("startup")
 async def seed_demo_account():
@@ -4,7 +4,8 @@ from typing import Optional, List
 
 from ..utils.auth import get_current_user, CurrentUser
 from ..services.rag_coaching import rag_coaching_service
-from ..services.providers.llm_gemini import GeminiLLMProvider
+from ..services.coach_cache import coach_answer_cache, COACH_CACHE_ENABLED
+from ..services.providers.registry import provider_registry
 
 
 router = APIRouter(prefix="/api/v1/coach", tags=["coach"])
@@ -26,9 +27,35 @@ async def coach_chat(req: ChatRequest, current_user: CurrentUser = Depends(get_c
                 detail="Gemini API key is not configured. Please set GEMINI_API_KEY environment variable."
             )
         
+        top_k = req.top_k or 4
+        # Soru bir kez vektörleştirilir; hem önbellek araması hem retrieval için kullanılır
+        try:
+            question_embedding = rag_coaching_service._embed_texts([req.message])[0]
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Failed to embed question: {str(e)}"
+            )
+
+        # Aynı niyetli bir soru günlükler değişmeden önce yanıtlandıysa LLM'e gitme
+        if COACH_CACHE_ENABLED:
+            cached = coach_answer_cache.lookup(current_user.id, question_embedding, top_k)
+            if cached:
+                return {
+                    "success": True,
+                    "answer": cached["answer"],
+                    "sources": rag_coaching_service.get_entries(cached["source_ids"]),
+                    "cached": True,
+                    "similarity": round(cached["similarity"], 4),
+                }
+
         # Retrieve related diary entries for context
+        # Nesil retrieval'dan önce okunur; arada gelen değişiklik önbelleği bayat bırakmaz
+        generation = rag_coaching_service.index_generation(current_user.id)
         try:
-            related = rag_coaching_service.query_diary(req.message, top_k=req.top_k or 4, user_id=current_user.id)
+            related = rag_coaching_service.query_diary(
+                req.message, top_k=top_k, user_id=current_user.id, query_embedding=question_embedding
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500, 
@@ -40,14 +67,17 @@ async def coach_chat(req: ChatRequest, current_user: CurrentUser = Depends(get_c
             no_results = not related.get("success") or not (related.get("results") or [])
             if no_results:
                 rag_coaching_service.sync_user_diaries_from_firestore(user_id=current_user.id)
-                related = rag_coaching_service.query_diary(req.message, top_k=req.top_k or 4, user_id=current_user.id)
+                generation = rag_coaching_service.index_generation(current_user.id)
+                related = rag_coaching_service.query_diary(
+                    req.message, top_k=top_k, user_id=current_user.id, query_embedding=question_embedding
+                )
         except Exception:
             # best-effort sync; continue with what we have
             pass
             
         context_snippets: List[str] = []
         if related.get("success"):
-            for r in (related.get("results") or [])[: req.top_k or 4]:
+            for r in (related.get("results") or [])[:top_k]:
                 meta = r.get("metadata", {})
                 context_snippets.append(
                     f"Tarih: {meta.get('date','')} | Duygu: {meta.get('emotion','')}\n{r.get('content','')[:500]}"
@@ -61,7 +91,7 @@ async def coach_chat(req: ChatRequest, current_user: CurrentUser = Depends(get_c
 
         # Initialize Gemini provider
         try:
-            llm = GeminiLLMProvider()
+            llm = provider_registry.gemini_llm()
         except Exception as e:
             raise HTTPException(
                 status_code=500, 
@@ -85,10 +115,18 @@ async def coach_chat(req: ChatRequest, current_user: CurrentUser = Depends(get_c
                 detail=f"Gemini API call failed: {str(e)}"
             )
 
+        sources = (related.get("results") or [])[:top_k]
+        if COACH_CACHE_ENABLED and answer:
+            coach_answer_cache.store(
+                current_user.id, req.message, question_embedding, answer,
+                [r["id"] for r in sources if r.get("id")], top_k, generation,
+            )
+
         return {
             "success": True,
             "answer": answer,
-            "sources": (related.get("results") or [])[: req.top_k or 4],
+            "sources": sources,
+            "cached": False,
         }
     except HTTPException:
         # Re-raise HTTP exceptions as-is
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 from ..services.rag_coaching import rag_coaching_service
 from ..utils.auth import get_current_user, CurrentUser
 from ..models.user import User
@@ -91,7 +92,8 @@ async def query_diary_entries(
 ):
     """Günlük girdilerini sorgular"""
     try:
-        result = rag_coaching_service.query_diary(
+        result = await asyncio.to_thread(
+            rag_coaching_service.query_diary,
             question=query.question,
             top_k=query.top_k,
             user_id=current_user.id
@@ -116,7 +118,8 @@ async def get_personalized_advice(
 ):
     """Kişiselleştirilmiş tavsiye alır"""
     try:
-        result = rag_coaching_service.generate_personalized_advice(
+        result = await asyncio.to_thread(
+            rag_coaching_service.generate_personalized_advice,
             question=request.question
         )
         
@@ -139,7 +142,8 @@ async def get_emotional_insights(
 ):
     """Duygu durumu analizi ve içgörüler alır"""
     try:
-        result = rag_coaching_service.get_emotional_insights(
+        result = await asyncio.to_thread(
+            rag_coaching_service.get_emotional_insights,
             user_id=current_user.id
         )
         
@@ -1,17 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from ..services.emotion_analysis import analyze_emotion
 from ..services.location_extraction import extract_locations
 from ..services.location_extraction import get_coordinates
 
-from ..services.firebase import upload_image_to_storage, delete_image_from_storage, list_user_images
+from ..services.firebase import upload_image_content_addressed, delete_image_from_storage
+from ..services.image_index import image_index
+from ..services.image_upload import stream_image_upload
+from ..utils.upload_guard import UploadRejected
 from ..utils.auth import get_current_user
 import base64
-import uuid
-from ..services.coaching import generate_reflective_questions, generate_personal_development_advice, analyze_progress
+import json
+import os
+from ..services.coaching import (
+    generate_reflective_questions, generate_personal_development_advice, analyze_progress,
+    stream_reflective_questions, stream_personal_development_advice, COACHING_MODEL
+)
 from ..services.notifications import send_notification_to_user, send_bulk_notification, create_personalized_notification
 from ..services.analytics_backend import analytics_tracker, track_user_action, track_model_usage
 from datetime import datetime
+from typing import Optional
+import asyncio
 import time
 
 router = APIRouter(prefix="/emotion", tags=["emotion"])
@@ -73,14 +83,11 @@ def save_image_to_storage(req: ImageSaveRequest, current_user=Depends(get_curren
         # Base64'ten bytes'a çevir
         image_bytes = base64.b64decode(req.image_base64)
         
-        # Dosya adı oluştur
-        filename = f"user_{current_user.id}_{uuid.uuid4()}.png"
-        
-        # Firebase Storage'a yükle
-        result = upload_image_to_storage(image_bytes, filename, "generated_images")
+        # İçerik-adresli yükle: aynı görsel tekrar kaydedilirse mevcut nesne döner
+        result = upload_image_content_addressed(image_bytes, current_user.id, "generated_images")
         
         if result["success"]:
-            # TODO: Veritabanına görsel kaydını ekle (diary_entry_id ile ilişkili)
+            image_index.record(current_user.id, result["path"], url=result["url"], size=len(image_bytes))
             return {
                 "success": True,
                 "url": result["url"],
@@ -93,16 +100,51 @@ def save_image_to_storage(req: ImageSaveRequest, current_user=Depends(get_curren
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Save failed: {str(e)}")
 
+@router.post("/image/upload")
+async def upload_image_stream(request: Request, current_user=Depends(get_current_user)):
+    """Ham görsel gövdesini (Content-Type: image/*) akışla Storage'a yükler
+
+    /image/save'in aksine base64 yoktur ve görsel bellekte tutulmaz: gövde
+    parçalar halinde resumable yüklemeye aktarılır, tür ve boyut akarken
+    doğrulanır (415 / 413).
+    """
+    content_length = request.headers.get("content-length")
+    try:
+        result = await stream_image_upload(
+            request.stream(),
+            current_user.id,
+            "generated_images",
+            declared_length=int(content_length) if content_length and content_length.isdigit() else None,
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    if not result["success"]:
+        raise HTTPException(status_code=500, detail=result["error"])
+    await asyncio.to_thread(
+        image_index.record, current_user.id, result["path"],
+        url=result["url"], size=result["size"], content_type=result["content_type"]
+    )
+    return {
+        "success": True,
+        "url": result["url"],
+        "filename": result["filename"],
+        "path": result["path"],
+        "size": result["size"],
+        "content_type": result["content_type"],
+        "deduplicated": result["deduplicated"],
+        "message": "Image saved successfully"
+    }
+
 @router.get("/images/list")
-def list_user_images_endpoint(current_user=Depends(get_current_user)):
+def list_user_images_endpoint(limit: int = 24, cursor: Optional[str] = None, current_user=Depends(get_current_user)):
+    """Kullanıcının görsellerini yeniden eskiye sayfalar; devam için next_cursor gönderilir"""
     try:
-        result = list_user_images(current_user.id, "generated_images")
-        
-        if result["success"]:
-            return result
-        else:
-            raise HTTPException(status_code=500, detail=result["error"])
-            
+        return image_index.list(current_user.id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"List failed: {str(e)}")
 
@@ -116,6 +158,7 @@ def delete_image_endpoint(file_path: str, current_user=Depends(get_current_user)
         result = delete_image_from_storage(file_path)
         
         if result["success"]:
+            image_index.remove([file_path])
             return result
         else:
             raise HTTPException(status_code=500, detail=result["error"])
@@ -136,13 +179,20 @@ class ProgressAnalysisRequest(BaseModel):
     user_responses: list
     time_period_days: int = 30
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _require_openai_key():
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=500, detail="OpenAI API key is required")
+
 @router.post("/coaching/questions")
-def get_reflective_questions(req: ReflectiveQuestionsRequest, current_user=Depends(get_current_user)):
+async def get_reflective_questions(req: ReflectiveQuestionsRequest, current_user=Depends(get_current_user)):
     if not req.diary_text or len(req.diary_text.strip()) == 0:
         raise HTTPException(status_code=400, detail="Diary text is required")
     
     try:
-        result = generate_reflective_questions(
+        result = await generate_reflective_questions(
             req.diary_text,
             req.emotion,
             req.user_history
@@ -156,13 +206,32 @@ def get_reflective_questions(req: ReflectiveQuestionsRequest, current_user=Depen
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Question generation failed: {str(e)}")
 
+@router.post("/coaching/questions/stream")
+async def stream_questions(req: ReflectiveQuestionsRequest, current_user=Depends(get_current_user)):
+    """Yansıtıcı soruları üretildikçe SSE ile gönderir (her soru ayrı 'question' olayı)"""
+    if not req.diary_text or len(req.diary_text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Diary text is required")
+    _require_openai_key()
+
+    async def _events():
+        questions = []
+        try:
+            async for question in stream_reflective_questions(req.diary_text, req.emotion, req.user_history):
+                yield _sse_event("question", {"index": len(questions), "question": question})
+                questions.append(question)
+            yield _sse_event("done", {"success": True, "questions": questions, "model_used": COACHING_MODEL})
+        except Exception as e:
+            yield _sse_event("error", {"success": False, "error": f"Question generation failed: {str(e)}"})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/coaching/advice")
-def get_personal_advice(req: PersonalAdviceRequest, current_user=Depends(get_current_user)):
+async def get_personal_advice(req: PersonalAdviceRequest, current_user=Depends(get_current_user)):
     if not req.diary_entries or len(req.diary_entries) == 0:
         raise HTTPException(status_code=400, detail="At least one diary entry is required")
     
     try:
-        result = generate_personal_development_advice(
+        result = await generate_personal_development_advice(
             req.diary_entries,
             req.emotions
         )
@@ -175,13 +244,32 @@ def get_personal_advice(req: PersonalAdviceRequest, current_user=Depends(get_cur
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advice generation failed: {str(e)}")
 
+@router.post("/coaching/advice/stream")
+async def stream_advice(req: PersonalAdviceRequest, current_user=Depends(get_current_user)):
+    """Kişisel gelişim önerisini metin parçaları halinde SSE ile gönderir ('delta' olayları)"""
+    if not req.diary_entries or len(req.diary_entries) == 0:
+        raise HTTPException(status_code=400, detail="At least one diary entry is required")
+    _require_openai_key()
+
+    async def _events():
+        parts = []
+        try:
+            async for delta in stream_personal_development_advice(req.diary_entries, req.emotions):
+                parts.append(delta)
+                yield _sse_event("delta", {"text": delta})
+            yield _sse_event("done", {"success": True, "advice": "".join(parts), "model_used": COACHING_MODEL})
+        except Exception as e:
+            yield _sse_event("error", {"success": False, "error": f"Advice generation failed: {str(e)}"})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/coaching/progress")
-def analyze_user_progress(req: ProgressAnalysisRequest, current_user=Depends(get_current_user)):
+async def analyze_user_progress(req: ProgressAnalysisRequest, current_user=Depends(get_current_user)):
     if not req.user_responses or len(req.user_responses) == 0:
         raise HTTPException(status_code=400, detail="User responses are required for analysis")
     
     try:
-        result = analyze_progress(
+        result = await analyze_progress(
             req.user_responses,
             req.time_period_days
         )
@@ -1,16 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Iterator
 from datetime import datetime
+import asyncio
+import json
+import zlib
 from ..services.firestore_service import firestore_service
 from ..utils.auth import get_current_user, CurrentUser
 from ..services.emotion_analysis import analyze_emotion
 from ..services.rag_coaching import rag_coaching_service
-from ..services.text_analysis import analyze_diary_openai, should_generate_image, build_sd_prompt
-from ..services.providers.images_fal import FalImageProvider
+from ..services.enrichment import diary_enrichment_service, analysis_progress, ENRICHMENT_TERMINAL_STATES
+from ..services.diary_import import diary_import_service, parse_import_payload, ImportFormatError
+from ..services.job_queue import job_queue
+from ..services.diary_deletion import diary_deletion_service
 
 router = APIRouter(prefix="/api/v1/diary", tags=["diary"])
 
+# Export sırasında vektör metadata'sı bu boyuttaki gruplar halinde okunur
+EXPORT_VECTOR_BATCH = 100
+# İçe aktarma dosyası için üst sınır
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+# Zenginleştirme SSE aboneliği için yoklama aralığı ve üst süre (saniye)
+ENRICHMENT_POLL_SECONDS = 1.0
+ENRICHMENT_STREAM_TIMEOUT = 180
+
 class DiaryEntryCreate(BaseModel):
     title: str
     content: str
@@ -23,6 +37,9 @@ class DiaryEntryUpdate(BaseModel):
     location: Optional[str] = None
     mood: Optional[str] = None
 
+class DiaryBatchGetRequest(BaseModel):
+    entry_ids: List[str]
+
 class DiaryEntryResponse(BaseModel):
     id: str
     title: str
@@ -35,79 +52,48 @@ class DiaryEntryResponse(BaseModel):
 
 @router.post("/", response_model=dict)
 async def create_diary_entry(entry: DiaryEntryCreate, current_user: CurrentUser = Depends(get_current_user)):
-    """Yeni günlük girişi oluştur"""
+    """Yeni günlük girişi oluştur
+
+    Giriş tek bir Firestore yazmasıyla kaydedilir ve hemen döner; analiz,
+    indeksleme ve görsel üretimi kalıcı kuyrukta zenginleştirme işi olarak yürür.
+    """
     try:
         # Authenticated user
         user_id = current_user.id
-        
-        # Legacy emotion analyzer removed for reliability on long texts; will map from OpenAI analysis below
-        detected_emotion = None
+        job = diary_enrichment_service.new_job()
 
         entry_data = {
             "title": entry.title,
             "content": entry.content,
             "location": entry.location,
-            "mood": entry.mood or detected_emotion
+            "mood": entry.mood,
+            "enrichment": job
         }
         
         result = firestore_service.create_diary_entry(user_id, entry_data)
         
         if result["success"]:
             entry_id = result["entry_id"]
-            # 1. Terapist düzeyi analiz (senkron, kısa gecikme kabul)
-            try:
-                analysis = analyze_diary_openai(entry.content)
-                # Map a simple emotion label for backward-compat
-                try:
-                    pe = analysis.get("affect", {}).get("primary_emotions", [])
-                    if isinstance(pe, list) and len(pe) > 0 and isinstance(pe[0], dict):
-                        detected_emotion = pe[0].get("label")
-                except Exception:
-                    pass
-                # Firestore kayıt güncelle: analysis
-                firestore_service.update_diary_entry(entry_id, {"analysis": analysis, "analysis_v": "v2_therapy"})
-            except Exception:
-                pass
-            # 2) Add to vector DB for RAG insights (best-effort)
-            try:
-                date_str = datetime.utcnow().strftime('%Y-%m-%d')
-                rag_result = rag_coaching_service.add_diary_entry(
-                    content=entry.content,
-                    emotion=(entry_data.get("mood") or detected_emotion or "neutral"),
-                    date=date_str,
-                    location=(entry.location or ""),
-                    tags=[],
-                    user_id=user_id
-                )
-                if not rag_result.get("success"):
-                    print(f"⚠️ RAG add failed: {rag_result.get('error', 'Unknown error')}")
-            except Exception as e:
-                print(f"⚠️ RAG add exception: {str(e)}")
-
-            # 3) Rüya ise görsel üretim (best-effort)
-            try:
-                if should_generate_image(entry.content, analysis if 'analysis' in locals() else {}):
-                    prompt = build_sd_prompt(entry.content, analysis if 'analysis' in locals() else {})
-                    provider = FalImageProvider()
-                    img_res = provider.generate(prompt)
-                    if img_res.get("success"):
-                        media = {"media": {"image_url": img_res["data"].get("image_url", img_res["data"].get("url")), "prompt": prompt, "image_provider": "fal"}}
-                        firestore_service.update_diary_entry(entry_id, media)
-            except Exception:
-                pass
+            diary_enrichment_service.enqueue(entry_id, user_id, job)
 
             return {
                 "success": True,
                 "message": "Diary entry created successfully",
                 "entry_id": entry_id,
                 "analysis": {
-                    "emotion": detected_emotion
+                    "emotion": entry.mood
                 },
-                "analysis_v2": analysis if 'analysis' in locals() else None
+                "enrichment": {
+                    "job_id": job["job_id"],
+                    "status": job["status"],
+                    "status_url": f"/api/v1/diary/{entry_id}/enrichment"
+                }
             }
         else:
             raise HTTPException(status_code=500, detail=result["error"])
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create diary entry: {str(e)}")
 
@@ -131,6 +117,126 @@ async def get_diary_entries(limit: int = 10, current_user: CurrentUser = Depends
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get diary entries: {str(e)}")
 
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _export_lines(user_id: str, include_analysis: bool, include_vectors: bool) -> Iterator[bytes]:
+    """Girişleri NDJSON satırları olarak üretir; bellekte en fazla bir grup tutulur"""
+    batch: List[dict] = []
+
+    def _flush(items: List[dict]) -> Iterator[bytes]:
+        vectors = rag_coaching_service.get_vector_metadata([e["id"] for e in items]) if include_vectors else {}
+        for item in items:
+            if include_vectors:
+                item["vector"] = vectors.get(item["id"])
+            yield (json.dumps(item, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+    for entry in firestore_service.iter_diary_entries(user_id):
+        if not include_analysis:
+            entry.pop("analysis", None)
+        batch.append(entry)
+        if len(batch) >= EXPORT_VECTOR_BATCH:
+            yield from _flush(batch)
+            batch = []
+    if batch:
+        yield from _flush(batch)
+
+def _gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@router.get("/export")
+async def export_diary_entries(
+    include_analysis: bool = False,
+    include_vectors: bool = False,
+    gzip: bool = False,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Kullanıcının tüm günlük geçmişini NDJSON olarak akış halinde dışa aktar"""
+    if not firestore_service.db:
+        raise HTTPException(status_code=500, detail="Firestore not initialized")
+
+    stream = _export_lines(current_user.id, include_analysis, include_vectors)
+    filename = f"memorymap-export-{datetime.utcnow().strftime('%Y%m%d')}.ndjson"
+    media_type = "application/x-ndjson"
+    if gzip:
+        # Dosya olarak indirilsin diye Content-Encoding değil, gzip içerik tipi kullanılır
+        stream = _gzip_stream(stream)
+        filename += ".gz"
+        media_type = "application/gzip"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StreamingResponse(stream, media_type=media_type, headers=headers)
+
+@router.post("/import", response_model=dict)
+async def import_diary_entries(
+    file: UploadFile = File(...),
+    analyze: bool = True,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """NDJSON veya JSON dizisi dosyasından toplu günlük içe aktar"""
+    raw = await file.read(MAX_IMPORT_BYTES + 1)
+    if len(raw) > MAX_IMPORT_BYTES:
+        raise HTTPException(status_code=413, detail="Import file too large")
+    try:
+        entries = parse_import_payload(raw)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not entries:
+        raise HTTPException(status_code=400, detail="No importable entries found")
+
+    try:
+        result = diary_import_service.start(current_user.id, entries, analyze=analyze)
+        if not result["success"]:
+            raise HTTPException(status_code=500, detail=result["error"])
+        import_id = result["import_id"]
+        return {
+            "success": True,
+            "import_id": import_id,
+            "total": len(entries),
+            "status_url": f"/api/v1/diary/import/{import_id}"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start diary import: {str(e)}")
+
+@router.get("/import/{import_id}", response_model=dict)
+async def get_import_status(import_id: str, current_user: CurrentUser = Depends(get_current_user)):
+    """Toplu içe aktarma ilerlemesini getir"""
+    result = firestore_service.get_import_job(import_id)
+    if not result["success"] or result["job"].get("user_id") != current_user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return {"success": True, "import": diary_import_service.status_view(result["job"])}
+
+@router.post("/batch-get", response_model=dict)
+async def batch_get_diary_entries(req: DiaryBatchGetRequest, current_user: CurrentUser = Depends(get_current_user)):
+    """ID listesine göre günlük girişlerini tek seferde getir (RAG kaynakları vb.)"""
+    if len(req.entry_ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 entry ids per request")
+    try:
+        result = firestore_service.get_diary_entries_by_ids(req.entry_ids, user_id=current_user.id)
+        
+        if result["success"]:
+            return {
+                "success": True,
+                "entries": result["entries"],
+                "missing": result["missing"] + result["forbidden"],
+                "count": result["count"]
+            }
+        else:
+            raise HTTPException(status_code=500, detail=result["error"])
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to batch get diary entries: {str(e)}")
+
 @router.get("/{entry_id}", response_model=dict)
 async def get_diary_entry(entry_id: str):
     """Tekil günlük girişi getir"""
@@ -148,9 +254,96 @@ async def get_diary_entry(entry_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get diary entry: {str(e)}")
 
+def _enrichment_payload(entry: dict) -> dict:
+    enrichment = entry.get("enrichment") or {}
+    queued_job = job_queue.get(enrichment["job_id"]) if enrichment.get("job_id") else None
+    return {
+        "entry_id": entry["id"],
+        "enrichment": enrichment or None,
+        "queue": {
+            "status": queued_job["status"],
+            "attempts": queued_job["attempts"],
+            "max_attempts": queued_job["max_attempts"],
+            "last_error": queued_job["last_error"],
+            "next_attempt_at": queued_job["available_at"] if queued_job["status"] == "queued" else None
+        } if queued_job else None,
+        "mood": entry.get("mood"),
+        "analysis_v": entry.get("analysis_v"),
+        "analysis_status": entry.get("analysis_status"),
+        "image_status": entry.get("image_status"),
+        "media": entry.get("media")
+    }
+
+@router.get("/{entry_id}/enrichment")
+async def get_enrichment_status(entry_id: str, stream: bool = False, current_user: CurrentUser = Depends(get_current_user)):
+    """Giriş zenginleştirme işinin durumunu getir; stream=true ile SSE aboneliği
+
+    Akışta terapi analizi alanları tamamlandıkça ayrı "analysis" olayları
+    ({"field", "value"}) olarak gönderilir: iş aynı süreçte çalışıyorsa anında,
+    değilse Firestore'a ara kayıtlar düştükçe.
+    """
+    result = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+    if not result["success"] or result["entry"].get("user_id") != current_user.id:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+
+    if not stream:
+        return {"success": True, **_enrichment_payload(result["entry"])}
+
+    async def _events():
+        entry = result["entry"]
+        last_sent = None
+        sent_fields: dict = {}
+        deadline = asyncio.get_running_loop().time() + ENRICHMENT_STREAM_TIMEOUT
+        progress, unsubscribe = analysis_progress.subscribe(entry_id)
+
+        def _analysis_event(field: str, value) -> Optional[str]:
+            data = json.dumps({"field": field, "value": value}, ensure_ascii=False, default=_json_default)
+            if sent_fields.get(field) == data:
+                return None
+            sent_fields[field] = data
+            return f"event: analysis\ndata: {data}\n\n"
+
+        try:
+            while True:
+                payload = json.dumps(_enrichment_payload(entry), ensure_ascii=False, default=_json_default)
+                if payload != last_sent:
+                    yield f"event: enrichment\ndata: {payload}\n\n"
+                    last_sent = payload
+                if entry.get("analysis_status") in ("streaming", "completed"):
+                    for field, value in (entry.get("analysis") or {}).items():
+                        event = _analysis_event(field, value)
+                        if event:
+                            yield event
+                status = (entry.get("enrichment") or {}).get("status")
+                if status in ENRICHMENT_TERMINAL_STATES or asyncio.get_running_loop().time() > deadline:
+                    break
+                try:
+                    # Aynı süreçteki iş alanları anında iletir; yoksa bir sonraki yoklamaya kadar beklenir
+                    pushed = await asyncio.wait_for(progress.get(), ENRICHMENT_POLL_SECONDS)
+                    event = _analysis_event(pushed["field"], pushed["value"])
+                    if event:
+                        yield event
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                polled = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+                if not polled["success"]:
+                    break
+                entry = polled["entry"]
+        finally:
+            unsubscribe()
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.put("/{entry_id}", response_model=dict)
-async def update_diary_entry(entry_id: str, entry_update: DiaryEntryUpdate):
-    """Günlük girişini güncelle"""
+async def update_diary_entry(entry_id: str, entry_update: DiaryEntryUpdate, current_user: CurrentUser = Depends(get_current_user)):
+    """Günlük girişini güncelle
+
+    Sadece değişen alanlar yazılır. İçerik değiştiyse analiz ve embedding
+    zenginleştirme işi olarak yeniden kuyruğa alınır; duygu/konum değişiklikleri
+    yalnızca vektör metadata'sına yamanır.
+    """
     try:
         # Sadece dolu alanları güncelle
         update_data = {}
@@ -165,23 +358,59 @@ async def update_diary_entry(entry_id: str, entry_update: DiaryEntryUpdate):
             
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
-        
-        result = firestore_service.update_diary_entry(entry_id, update_data)
+
+        entry_result = firestore_service.get_diary_entry(entry_id)
+        if not entry_result["success"]:
+            raise HTTPException(status_code=404, detail="Diary entry not found")
+        entry = entry_result["entry"]
+        if entry["user_id"] != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to update this entry")
+
+        plan = diary_enrichment_service.plan_update(entry, update_data)
+        changes = plan["changes"]
+        if not changes:
+            return {
+                "success": True,
+                "message": "Diary entry is already up to date",
+                "changed_fields": []
+            }
+
+        job = None
+        if plan["content_changed"]:
+            # Görsel içerikten bağımsız tutulur; sadece analiz ve indeks yenilenir
+            job = diary_enrichment_service.new_job(completed_steps=("image",) if entry.get("media") else ())
+            changes["enrichment"] = job
+
+        result = firestore_service.update_diary_entry(entry_id, changes)
         
         if result["success"]:
-            return {
+            response = {
                 "success": True,
-                "message": "Diary entry updated successfully"
+                "message": "Diary entry updated successfully",
+                "changed_fields": sorted(k for k in changes if k not in ("content_hash", "enrichment")),
+                "reindex": plan["content_changed"]
             }
+            if job:
+                diary_enrichment_service.enqueue(entry_id, current_user.id, job, content_digest=changes["content_hash"])
+                response["enrichment"] = {
+                    "job_id": job["job_id"],
+                    "status": job["status"],
+                    "status_url": f"/api/v1/diary/{entry_id}/enrichment"
+                }
+            elif plan["metadata"]:
+                diary_enrichment_service.enqueue_metadata_patch(entry_id, plan["metadata"])
+            return response
         else:
             raise HTTPException(status_code=500, detail=result["error"])
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update diary entry: {str(e)}")
 
 @router.delete("/{entry_id}", response_model=dict)
 async def delete_diary_entry(entry_id: str, current_user: CurrentUser = Depends(get_current_user)):
-    """Günlük girişini sil"""
+    """Günlük girişini vektörü ve medyasıyla birlikte sil"""
     try:
         # Authenticated user
         user_id = current_user.id
@@ -194,32 +423,36 @@ async def delete_diary_entry(entry_id: str, current_user: CurrentUser = Depends(
         if entry_result["entry"]["user_id"] != user_id:
             raise HTTPException(status_code=403, detail="Not authorized to delete this entry")
         
-        result = firestore_service.delete_diary_entry(entry_id)
+        result = diary_deletion_service.delete_entries([entry_result["entry"]])
         
         if result["success"]:
             return {
                 "success": True,
-                "message": "Diary entry deleted successfully"
+                "message": "Diary entry deleted successfully",
+                "cleanup_pending": result["cleanup_pending"]
             }
         else:
             raise HTTPException(status_code=500, detail=result["error"])
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete diary entry: {str(e)}")
 
 @router.delete("/clear/all", response_model=dict)
 async def clear_all_diary_entries(current_user: CurrentUser = Depends(get_current_user)):
-    """Kullanıcının tüm günlük girişlerini temizle"""
+    """Kullanıcının tüm günlük girişlerini vektörleri ve medyasıyla birlikte temizle"""
     try:
         user_id = current_user.id
         
-        result = firestore_service.clear_all_diary_entries(user_id)
+        result = diary_deletion_service.clear_user(user_id)
         
         if result["success"]:
             return {
                 "success": True,
                 "message": f"All diary entries cleared successfully. {result.get('deleted_count', 0)} entries deleted.",
-                "deleted_count": result.get("deleted_count", 0)
+                "deleted_count": result.get("deleted_count", 0),
+                "cleanup_pending": result["cleanup_pending"]
             }
         else:
             raise HTTPException(status_code=500, detail=result["error"])
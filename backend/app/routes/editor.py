@@ -2,11 +2,14 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
-from ..services.providers.llm_openai import OpenAILLMProvider
+from ..services.providers.registry import provider_registry
 
 
 router = APIRouter(prefix="/api/v1/editor", tags=["editor"])
 
+# Yazım düzeltmesi deterministik olduğundan aynı metin için yanıt önbelleğe alınır
+CORRECT_CACHE_TTL = 24 * 3600
+
 
 class SuggestRequest(BaseModel):
     text: str
@@ -42,7 +45,7 @@ def _build_prompt(req: SuggestRequest) -> str:
 @router.post("/suggest", response_model=dict)
 async def suggest(req: SuggestRequest):
     try:
-        provider = OpenAILLMProvider()
+        provider = provider_registry.openai_llm()
         prompt = _build_prompt(req)
         text = provider.chat_text(
             model="gpt-4o-mini",
@@ -52,6 +55,7 @@ async def suggest(req: SuggestRequest):
             ],
             temperature=0.2,
             max_tokens=400,
+            cache_ttl=CORRECT_CACHE_TTL if req.intent == "correct" else None,
         )
         return {"success": True, "suggestion": text}
     except Exception as e:
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/api/v1/emotion", tags=["emotion"])
 
 class EmotionRequest(BaseModel):
     text: str
-    analysis_type: Optional[str] = "deep"  # "basic", "deep", "comparative"
+    analysis_type: Optional[str] = "auto"  # "auto", "basic", "deep", "comparative"
     user_context: Optional[Dict[str, Any]] = None
 
 class ComparativeEmotionRequest(BaseModel):
@@ -121,6 +121,13 @@ async def get_available_analysis_types():
     """Mevcut analiz türlerini listele"""
     return {
         "analysis_types": [
+            {
+                "type": "auto",
+                "name": "Otomatik Analiz",
+                "description": "Kısa ve düşük sinyalli metinlerde yerel analiz, gerektiğinde Gemini",
+                "features": ["Ana duygu", "Güven skoru", "Yönlendirme gerekçesi"],
+                "provider": "HuggingFace DistilBERT + Google Gemini 1.5 Flash"
+            },
             {
                 "type": "basic",
                 "name": "Temel Analiz",
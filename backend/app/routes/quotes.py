@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
 from ..services.quote_service import quote_service
 from ..utils.auth import get_current_user, CurrentUser
 
@@ -34,7 +35,8 @@ async def generate_quote(
         if not request.emotion:
             raise HTTPException(status_code=400, detail="Emotion is required")
         
-        result = quote_service.generate_inspirational_quote(
+        result = await asyncio.to_thread(
+            quote_service.generate_inspirational_quote,
             emotion=request.emotion,
             diary_content=request.diary_content
         )
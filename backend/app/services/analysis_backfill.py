@@ -0,0 +1,371 @@
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from .firestore_service import firestore_service
+from .job_queue import job_queue
+from .providers.registry import provider_registry
+from .text_analysis import (
+    ANALYSIS_VERSION,
+    LOCAL_ANALYSIS_VERSION,
+    THERAPY_SCHEMA,
+    analyze_diary_openai,
+    build_therapy_messages,
+    finalize_analysis,
+)
+from ..utils.database import get_local_db
+
+BACKFILL_MODEL = os.getenv("APP_BACKFILL_MODEL", "gpt-4o-mini")
+BACKFILL_MAX_TOKENS = 900
+# Checkpoint'in en fazla kaç taranan girişte bir yazılacağı
+CHECKPOINT_EVERY = 50
+BATCH_POLL_SECONDS = 30
+# Başarısız giriş sonraki çalıştırmalarda en fazla bu kadar yeniden denenir
+BACKFILL_MAX_RETRIES = int(os.getenv("APP_BACKFILL_MAX_RETRIES", "3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    name TEXT PRIMARY KEY,
+    target_version TEXT NOT NULL,
+    last_entry_id TEXT,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    analyzed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    tokens_used INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backfill_failures (
+    name TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (name, entry_id)
+);
+CREATE TABLE IF NOT EXISTS backfill_batches (
+    batch_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    entry_ids TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """İstek başına kaba token tahmini: girdi (~4 karakter/token) + prompt + azami çıktı"""
+    return len(text or "") // 4 + 150 + BACKFILL_MAX_TOKENS
+
+
+def needs_backfill(entry: Dict[str, Any], target_version: str = ANALYSIS_VERSION) -> bool:
+    """Analizi olmayan veya hedef sürümden farklı sürümle analiz edilmiş girişler
+
+    Yönlendiricinin bilerek yerel analizde bıraktığı girişler ("v2_local")
+    şemanın zorunlu alanlarını taşıdıkça güncel sayılır; içerik düzenlenirse
+    zenginleştirme yeniden yönlendirir. Eksik alanlı eski yerel analizler tamamlanır.
+    """
+    if not (entry.get("content") or "").strip():
+        return False
+    if target_version == ANALYSIS_VERSION and entry.get("analysis_v") == LOCAL_ANALYSIS_VERSION:
+        analysis = entry.get("analysis") or {}
+        return not all(field in analysis for field in THERAPY_SCHEMA["required"])
+    return not entry.get("analysis") or entry.get("analysis_v") != target_version
+
+
+class AnalysisBackfillRunner:
+    """Eksik veya eski analizli girişleri hız ve token bütçesi altında yeniden analiz eder
+
+    Koleksiyon doküman ID sırasıyla taranır ve ilerleme yerel SQLite'ta checkpoint
+    olarak saklanır; aynı isimle tekrar çalıştırıldığında kaldığı yerden devam eder.
+    mode="batch" ile istekler OpenAI Batch API'ye toplu gönderilir (daha ucuz,
+    sonuçlar 24 saat içinde); bekleyen batch'ler sonraki çalıştırmalarda toplanır.
+
+    Cursor başarısız girişlerin de ötesine geçer; bu girişler backfill_failures
+    tablosuna yazılır ve her çalıştırmanın başında (en fazla BACKFILL_MAX_RETRIES
+    kez) yeniden denenir. token_budget çalıştırma başınadır; checkpoint'teki
+    tokens_used tüm çalıştırmaların toplamını tutar.
+    """
+
+    def __init__(self, name: str = "default", target_version: str = ANALYSIS_VERSION,
+                 requests_per_minute: float = 30.0, token_budget: Optional[int] = None,
+                 mode: str = "sync", batch_size: int = 200, user_id: Optional[str] = None,
+                 limit: Optional[int] = None, dry_run: bool = False):
+        if mode not in ("sync", "batch"):
+            raise ValueError("mode must be 'sync' or 'batch'")
+        self.name = name
+        self.target_version = target_version
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self.token_budget = token_budget
+        self.mode = mode
+        self.batch_size = batch_size
+        self.user_id = user_id
+        self.limit = limit
+        self.dry_run = dry_run
+        self._stop = threading.Event()
+        # Batch modunda henüz gönderilmemiş girişler varken cursor ilerletilmez
+        self._holding = False
+        get_local_db().executescript(_SCHEMA)
+
+    # Checkpoint
+    def load_checkpoint(self) -> Dict[str, Any]:
+        row = get_local_db().execute(
+            "SELECT * FROM backfill_checkpoints WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row and row["target_version"] == self.target_version:
+            return dict(row)
+        return {
+            "name": self.name, "target_version": self.target_version, "last_entry_id": None,
+            "scanned": 0, "analyzed": 0, "failed": 0, "tokens_used": 0, "status": "new",
+        }
+
+    def save_checkpoint(self, state: Dict[str, Any]) -> None:
+        if self.dry_run:
+            return
+        get_local_db().execute(
+            "INSERT OR REPLACE INTO backfill_checkpoints (name, target_version, last_entry_id, scanned, analyzed, "
+            "failed, tokens_used, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.name, self.target_version, state["last_entry_id"], state["scanned"], state["analyzed"],
+             state["failed"], state["tokens_used"], state["status"], time.time()),
+        )
+
+    def reset(self) -> None:
+        db = get_local_db()
+        db.execute("DELETE FROM backfill_checkpoints WHERE name = ?", (self.name,))
+        db.execute("DELETE FROM backfill_failures WHERE name = ?", (self.name,))
+
+    # Başarısız girişler
+    def record_failure(self, entry_id: str, error: str) -> None:
+        if self.dry_run:
+            return
+        get_local_db().execute(
+            "INSERT INTO backfill_failures (name, entry_id, attempts, last_error, updated_at) VALUES (?, ?, 1, ?, ?) "
+            "ON CONFLICT(name, entry_id) DO UPDATE SET attempts = attempts + 1, last_error = excluded.last_error, "
+            "updated_at = excluded.updated_at",
+            (self.name, entry_id, error[:500], time.time()),
+        )
+
+    def clear_failures(self, entry_ids: List[str]) -> None:
+        if self.dry_run or not entry_ids:
+            return
+        get_local_db().executemany(
+            "DELETE FROM backfill_failures WHERE name = ? AND entry_id = ?", [(self.name, i) for i in entry_ids]
+        )
+
+    def _retry_candidates(self) -> Iterator[Dict[str, Any]]:
+        db = get_local_db()
+        rows = db.execute(
+            "SELECT entry_id FROM backfill_failures WHERE name = ? AND attempts <= ? ORDER BY entry_id",
+            (self.name, BACKFILL_MAX_RETRIES),
+        ).fetchall()
+        # Henüz toplanmamış batch'teki girişler yeniden gönderilmez
+        in_flight = {
+            entry_id
+            for batch in db.execute(
+                "SELECT entry_ids FROM backfill_batches WHERE name = ? AND status = 'submitted'", (self.name,)
+            ).fetchall()
+            for entry_id in json.loads(batch["entry_ids"])
+        }
+        for row in rows:
+            if row["entry_id"] in in_flight:
+                continue
+            result = firestore_service.get_diary_entry(row["entry_id"])
+            if not result["success"] or not needs_backfill(result["entry"], self.target_version):
+                # Silinmiş veya bu arada analiz edilmiş
+                self.clear_failures([row["entry_id"]])
+                continue
+            yield {**result["entry"], "id": row["entry_id"], "_retry": True}
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _candidates(self, state: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for entry in firestore_service.iter_diary_entries(self.user_id, start_after_id=state["last_entry_id"]):
+            state["previous_entry_id"] = state["last_entry_id"]
+            state["scanned"] += 1
+            state["last_entry_id"] = entry["id"]
+            if needs_backfill(entry, self.target_version):
+                yield entry
+            elif state["scanned"] % CHECKPOINT_EVERY == 0 and not self._holding:
+                self.save_checkpoint(state)
+
+    @staticmethod
+    def _rewind(state: Dict[str, Any]) -> None:
+        # İşlenmeden bırakılan giriş bir sonraki çalıştırmada yeniden ele alınsın
+        state["last_entry_id"] = state.get("previous_entry_id")
+        state["scanned"] -= 1
+
+    def _budget_allows(self, run_tokens: int, tokens: int) -> bool:
+        return self.token_budget is None or run_tokens + tokens <= self.token_budget
+
+    def run(self) -> Dict[str, Any]:
+        state = self.load_checkpoint()
+        state["status"] = "running"
+        if self.mode == "batch":
+            state["batches"] = self.collect_batches()
+        processed = 0
+        run_tokens = 0
+        next_slot = time.monotonic()
+        pending: List[Dict[str, Any]] = []
+
+        for entry in itertools.chain(self._retry_candidates(), self._candidates(state)):
+            retry = entry.pop("_retry", False)
+            if self._stop.is_set() or (self.limit is not None and processed >= self.limit):
+                if not retry:
+                    self._rewind(state)
+                state["status"] = "paused"
+                break
+            tokens = estimate_tokens(entry.get("content"))
+            if not self._budget_allows(run_tokens, tokens):
+                if not retry:
+                    self._rewind(state)
+                state["status"] = "budget_exhausted"
+                break
+            processed += 1
+            run_tokens += tokens
+            state["tokens_used"] += tokens
+            if self.dry_run:
+                continue
+
+            if self.mode == "batch":
+                pending.append(entry)
+                self._holding = True
+                if len(pending) >= self.batch_size:
+                    self._submit_batch(pending)
+                    pending = []
+                    self._holding = False
+                    self.save_checkpoint(state)
+                continue
+
+            wait = next_slot - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+            next_slot = time.monotonic() + self.interval
+            try:
+                analysis = analyze_diary_openai(entry["content"], model=BACKFILL_MODEL)
+                result = firestore_service.update_diary_entry(
+                    entry["id"], {"analysis": analysis, "analysis_v": self.target_version}
+                )
+                if not result.get("success"):
+                    raise RuntimeError(result.get("error"))
+                state["analyzed"] += 1
+                if retry:
+                    state["failed"] = max(0, state["failed"] - 1)
+                    self.clear_failures([entry["id"]])
+            except Exception as e:
+                if not retry:
+                    state["failed"] += 1
+                self.record_failure(entry["id"], str(e))
+                print(f"⚠️ Backfill analysis failed for {entry['id']}: {str(e)}")
+            self.save_checkpoint(state)
+        else:
+            state["status"] = "completed"
+
+        if pending and not self.dry_run:
+            self._submit_batch(pending)
+            self._holding = False
+        self.save_checkpoint(state)
+        state.pop("previous_entry_id", None)
+        state["processed_this_run"] = processed
+        state["tokens_this_run"] = run_tokens
+        return state
+
+    # Batch mode
+    def _submit_batch(self, entries: List[Dict[str, Any]]) -> str:
+        llm = provider_registry.openai_llm()
+        requests = [
+            llm.build_json_request(
+                custom_id=e["id"],
+                messages=build_therapy_messages(e["content"]),
+                schema=THERAPY_SCHEMA,
+                model=BACKFILL_MODEL,
+                temperature=0.2,
+                max_tokens=BACKFILL_MAX_TOKENS,
+            )
+            for e in entries
+        ]
+        batch_id = llm.submit_batch(requests, metadata={"backfill": self.name, "target": self.target_version})
+        now = time.time()
+        get_local_db().execute(
+            "INSERT INTO backfill_batches (batch_id, name, entry_ids, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'submitted', ?, ?)",
+            (batch_id, self.name, json.dumps([e["id"] for e in entries]), now, now),
+        )
+        return batch_id
+
+    def collect_batches(self, wait: bool = False) -> Dict[str, Any]:
+        """Bekleyen batch'leri kontrol eder, tamamlananların sonuçlarını girişlere yazar"""
+        db = get_local_db()
+        summary = {"completed": 0, "pending": 0, "failed": 0, "written": 0}
+        llm = None
+        while True:
+            rows = db.execute(
+                "SELECT * FROM backfill_batches WHERE name = ? AND status = 'submitted'", (self.name,)
+            ).fetchall()
+            if not rows:
+                break
+            llm = llm or provider_registry.openai_llm()
+            still_pending = 0
+            for row in rows:
+                info = llm.get_batch(row["batch_id"])
+                if info["status"] in ("validating", "in_progress", "finalizing", "cancelling"):
+                    still_pending += 1
+                    continue
+                status = "collected"
+                if info["status"] == "completed":
+                    results = llm.fetch_batch_results(row["batch_id"])
+                    for entry_id, res in results.items():
+                        if "data" in res:
+                            analysis = finalize_analysis(res["data"], BACKFILL_MODEL)
+                            firestore_service.update_diary_entry(
+                                entry_id, {"analysis": analysis, "analysis_v": self.target_version}
+                            )
+                            self.clear_failures([entry_id])
+                            summary["written"] += 1
+                        else:
+                            self.record_failure(entry_id, str(res.get("error") or "no result"))
+                    summary["completed"] += 1
+                else:
+                    status = info["status"]
+                    summary["failed"] += 1
+                    # Batch'teki girişler sonraki çalıştırmaların yeniden deneme turuna alınır
+                    for entry_id in json.loads(row["entry_ids"]):
+                        self.record_failure(entry_id, f"batch {status}")
+                db.execute(
+                    "UPDATE backfill_batches SET status = ?, updated_at = ? WHERE batch_id = ?",
+                    (status, time.time(), row["batch_id"]),
+                )
+            summary["pending"] = still_pending
+            if not wait or not still_pending or self._stop.wait(BATCH_POLL_SECONDS):
+                break
+        return summary
+
+    def status(self) -> Dict[str, Any]:
+        state = self.load_checkpoint()
+        rows = get_local_db().execute(
+            "SELECT status, COUNT(*) AS n FROM backfill_batches WHERE name = ? GROUP BY status", (self.name,)
+        ).fetchall()
+        state["batches"] = {row["status"]: row["n"] for row in rows}
+        failures = get_local_db().execute(
+            "SELECT COUNT(*) AS n, SUM(attempts > ?) AS exhausted FROM backfill_failures WHERE name = ?",
+            (BACKFILL_MAX_RETRIES, self.name),
+        ).fetchone()
+        state["pending_retries"] = (failures["n"] or 0) - (failures["exhausted"] or 0)
+        state["retries_exhausted"] = failures["exhausted"] or 0
+        return state
+
+
+def handle_backfill_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Kuyruk handler'ı: backfill'i API worker'larında arka planda çalıştırır"""
+    options = {k: v for k, v in payload.items() if not k.startswith("_")}
+    result = AnalysisBackfillRunner(**options).run()
+    result["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return result
+
+
+job_queue.register("analysis_backfill", handle_backfill_job, concurrency=1, max_attempts=3, visibility_timeout=6 * 3600)
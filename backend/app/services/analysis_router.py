@@ -0,0 +1,270 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .text_analysis import ANALYSIS_VERSION, LOCAL_ANALYSIS_VERSION, analyze_diary_openai
+from ..utils.database import get_local_db
+
+# APP_ANALYSIS_ROUTING=false ile her giriş eskisi gibi LLM analizine gider
+ROUTING_ENABLED = os.getenv("APP_ANALYSIS_ROUTING", "true").lower() not in ("0", "false", "no")
+# Bu kelime sayısı ve üstündeki girişler her zaman LLM ile analiz edilir
+ROUTER_MIN_WORDS = int(os.getenv("APP_ROUTER_MIN_WORDS", "40"))
+# Daha kısa girişlerde bu kadar duygu ifadesi varsa LLM'e gidilir
+ROUTER_EMOTION_HITS = int(os.getenv("APP_ROUTER_EMOTION_HITS", "2"))
+# DistilBERT bu güvenle NEGATIVE diyorsa kısa giriş de LLM'e gider
+ROUTER_NEGATIVE_CONFIDENCE = float(os.getenv("APP_ROUTER_NEGATIVE_CONFIDENCE", "0.97"))
+# Duygu/olumsuzluk sinyalleri bundan kısa metinlerde dikkate alınmaz ("öğle yemeği yedim")
+ROUTER_SIGNAL_MIN_WORDS = 12
+# LLM analizinin ortalama maliyeti (tasarruf tahmini için): prompt + tipik yanıt
+LLM_ANALYSIS_OVERHEAD_TOKENS = 150 + 700
+
+# Bu ifadelerden biri geçiyorsa uzunluktan bağımsız olarak tam analiz yapılır
+RISK_KEYWORDS = (
+    "intihar", "kendimi öldür", "ölmek istiyorum", "yaşamak istemiyorum", "kendime zarar",
+    "canıma kıy", "her şeyi bitir", "artık dayanamıyorum", "kimse beni sevmiyor", "jilet",
+    "suicide", "kill myself", "self-harm", "self harm", "want to die", "end it all", "hurt myself",
+)
+DREAM_KEYWORDS = ("rüya", "ruya", "dream", "kabus", "uykuda")
+# Kelime kökü -> duygu etiketi (yerel analizde birincil duygu olarak kullanılır)
+EMOTION_LEXICON = {
+    "mutlu": "mutlu", "sevin": "mutlu", "harika": "mutlu", "heyecan": "heyecanlı",
+    "huzur": "huzurlu", "rahatla": "huzurlu", "minnet": "minnettar", "şükür": "minnettar",
+    "stres": "stres", "gergin": "stres", "kaygı": "kaygılı", "endişe": "endişeli", "panik": "kaygılı",
+    "korku": "korku", "korkuyor": "korku", "üzgün": "üzgün", "üzül": "üzgün", "ağla": "üzgün",
+    "kırgın": "kırgın", "yalnız": "yalnız", "kızgın": "öfkeli", "sinir": "öfkeli", "öfke": "öfkeli",
+    "yorgun": "yorgun", "bitkin": "yorgun", "özle": "özlem", "pişman": "pişman", "suçlu": "suçluluk",
+}
+# Kelime kökü -> tema (yerel analizde themes/life_domains)
+THEME_LEXICON = {
+    "iş": "iş", "proje": "iş", "patron": "iş", "toplantı": "iş", "ofis": "iş",
+    "aile": "aile", "anne": "aile", "baba": "aile", "kardeş": "aile",
+    "arkadaş": "arkadaşlık", "sevgili": "ilişki", "ilişki": "ilişki",
+    "okul": "eğitim", "sınav": "eğitim", "ders": "eğitim",
+    "spor": "sağlık", "doktor": "sağlık", "hasta": "sağlık", "uyku": "uyku", "uyu": "uyku",
+    "borç": "finans", "maaş": "finans", "kira": "finans", "yemek": "günlük yaşam", "kahvaltı": "günlük yaşam",
+    "yürüyüş": "hareket", "kitap": "hobi", "film": "hobi", "müzik": "hobi",
+}
+
+# Yerel analizde THERAPY_SCHEMA'nın zorunlu metin alanları için sabit, genel içerikler
+LOCAL_FILLER_THEME = "öz farkındalık"
+LOCAL_REFRAME = {
+    "negative": "Bu duygu kalıcı değil; yaşadığını fark edip yazman onunla baş etmenin bir parçası.",
+    "other": "Küçük anları fark edip kaydetmek, iyi giden şeyleri görmeyi kolaylaştırır.",
+}
+LOCAL_SELF_COMPASSION = "Kendine, zor bir gün geçiren bir arkadaşına davranacağın kadar nazik davran."
+LOCAL_COPING_PLAN = [
+    "Gününü birkaç cümleyle yazmaya devam et.",
+    "Beş dakikalık bir yürüyüş ya da nefes egzersizine yer aç.",
+    "Seni iyi hissettiren küçük bir şeyi bugün yeniden yap.",
+]
+LOCAL_QUOTE = {"text": "Kendini bilmek, tüm bilgeliğin başlangıcıdır.", "author": "Aristoteles"}
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_routing_stats (
+    day TEXT NOT NULL,
+    tier TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    entries INTEGER NOT NULL DEFAULT 0,
+    tokens_saved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, tier, reason)
+);
+"""
+
+
+def _normalize(text: str) -> str:
+    # Türkçe büyük İ/I harflerinin lower() ile bozulmaması için önce eşlenir
+    return (text or "").replace("İ", "i").replace("I", "ı").lower()
+
+
+def _risk_hits(text: str) -> List[str]:
+    """Risk ifadeleri hem casefold hem Türkçe eşlemeli biçimde aranır
+
+    Türkçe eşleme ASCII "I" harfini "ı" yaptığından "Intihar" veya "KILL MYSELF"
+    yalnızca casefold ile yakalanır; "İNTİHAR" ise yalnızca Türkçe eşlemeyle.
+    """
+    forms = ((text or "").casefold(), _normalize(text))
+    return [k for k in RISK_KEYWORDS if any(k in form for form in forms)]
+
+
+def _lexicon_hits(words: List[str], lexicon: Dict[str, str]) -> List[str]:
+    hits: List[str] = []
+    for word in words:
+        for stem, label in lexicon.items():
+            if word.startswith(stem) and label not in hits:
+                hits.append(label)
+                break
+    return hits
+
+
+class AnalysisRouter:
+    """Günlük analizini yerel sinyallerle yönlendiren katmanlı yönlendirici
+
+    Önce ucuz yerel sinyaller hesaplanır: kelime sayısı, risk ve rüya ifadeleri,
+    duygu sözlüğü eşleşmeleri ve DistilBERT duygu skoru. Risk ifadesi, yeterli
+    uzunluk veya güçlü duygu sinyali varsa tam LLM analizi yapılır; aksi halde
+    THERAPY_SCHEMA'nın tüm zorunlu alanlarını şemaya uygun değerlerle taşıyan
+    yerel bir analiz dokümanı ("v2_local") yazılır. Her karar ve tahmini token tasarrufu yerel SQLite'ta
+    gün/katman/gerekçe bazında sayılır.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, sentiment: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 enabled: bool = ROUTING_ENABLED):
+        self.db_path = db_path
+        self.enabled = enabled
+        self._sentiment_fn = sentiment
+        self._lock = threading.Lock()
+        get_local_db(self.db_path).executescript(_SCHEMA)
+
+    def _sentiment(self, text: str) -> Dict[str, Any]:
+        if self._sentiment_fn is None:
+            # transformers ağır olduğundan yalnızca ilk kullanımda yüklenir
+            from .emotion_analysis import analyze_emotion
+            self._sentiment_fn = analyze_emotion
+        try:
+            result = self._sentiment_fn(text) or {}
+        except Exception as e:
+            print(f"⚠️ Local sentiment failed: {str(e)}")
+            result = {}
+        return {"label": result.get("emotion"), "score": float(result.get("confidence") or 0.0)}
+
+    def decide(self, text: str) -> Dict[str, Any]:
+        """{"tier": "llm" | "local", "reason", "signals"} döndürür"""
+        normalized = _normalize(text)
+        words = _WORD_RE.findall(normalized)
+        signals: Dict[str, Any] = {
+            "words": len(words),
+            "emotions": _lexicon_hits(words, EMOTION_LEXICON),
+            "themes": _lexicon_hits(words, THEME_LEXICON),
+            "risk": _risk_hits(text),
+            "dream": any(k in normalized for k in DREAM_KEYWORDS),
+        }
+
+        def _decision(tier: str, reason: str) -> Dict[str, Any]:
+            return {"tier": tier, "reason": reason, "signals": signals}
+
+        # Risk ifadesi her koşulda LLM katmanına gider
+        if signals["risk"]:
+            return _decision("llm", "risk_keywords")
+        if not self.enabled:
+            return _decision("llm", "routing_disabled")
+        if signals["dream"]:
+            return _decision("llm", "dream")
+        if len(words) >= ROUTER_MIN_WORDS:
+            return _decision("llm", "length")
+        if len(words) >= ROUTER_SIGNAL_MIN_WORDS and len(signals["emotions"]) >= ROUTER_EMOTION_HITS:
+            return _decision("llm", "emotional_signal")
+
+        signals["sentiment"] = self._sentiment(text)
+        if (len(words) >= ROUTER_SIGNAL_MIN_WORDS and signals["sentiment"]["label"] == "NEGATIVE"
+                and signals["sentiment"]["score"] >= ROUTER_NEGATIVE_CONFIDENCE):
+            return _decision("llm", "strong_negative")
+        return _decision("local", "low_signal" if len(words) >= ROUTER_SIGNAL_MIN_WORDS else "short")
+
+    @staticmethod
+    def local_analysis(text: str, decision: Dict[str, Any]) -> Dict[str, Any]:
+        """LLM çağırmadan THERAPY_SCHEMA'ya uyan analiz dokümanı
+
+        Sinyallerden türetilemeyen zorunlu alanlar (reframe, self_compassion,
+        coping_plan, quote) genel içeriklerle doldurulur; themes en az iki öğe taşır.
+        """
+        signals = decision.get("signals") or {}
+        sentiment = signals.get("sentiment") or {}
+        score = float(sentiment.get("score") or 0.0)
+        positive = sentiment.get("label") == "POSITIVE"
+        if signals.get("emotions"):
+            label = signals["emotions"][0]
+        elif score >= 0.7:
+            label = "olumlu" if positive else "olumsuz"
+        else:
+            label = "nötr"
+        intensity = round(min(1.0, 0.3 + 0.1 * len(signals.get("emotions") or []) + 0.2 * score), 2)
+        domains = list(signals.get("themes") or []) or ["günlük yaşam"]
+        themes = (domains + [t for t in ("günlük yaşam", LOCAL_FILLER_THEME) if t not in domains])[:max(2, len(domains))]
+        negative = label == "olumsuz" or (sentiment.get("label") == "NEGATIVE" and score >= 0.7)
+        summary = (text or "").strip()
+        return {
+            "affect": {
+                "primary_emotions": [{"label": label, "intensity": intensity}],
+                "valence": round(score if positive else -score, 2) if score >= 0.7 else 0.0,
+                "arousal": round(intensity * 0.8, 2),
+                "dominance": 0.5,
+                "global_intensity": intensity,
+            },
+            "themes": themes[:7],
+            "life_domains": domains[:5],
+            "triggers": [],
+            "cognitive_patterns": [],
+            "unmet_needs": [],
+            "summary": summary if len(summary) <= 200 else summary[:197] + "...",
+            "reframe": LOCAL_REFRAME["negative" if negative else "other"],
+            "self_compassion": LOCAL_SELF_COMPASSION,
+            "coping_plan": list(LOCAL_COPING_PLAN),
+            "risk": {"crisis_flags": [], "self_harm_score": 0.0},
+            "quote": dict(LOCAL_QUOTE),
+            "provider_meta": {"model": "local-heuristics+distilbert", "tier": "local"},
+        }
+
+    def record(self, decision: Dict[str, Any], text: str) -> None:
+        """Kararı ve yerel katmanda tahmini token tasarrufunu sayar"""
+        tokens_saved = len(text or "") // 4 + LLM_ANALYSIS_OVERHEAD_TOKENS if decision["tier"] == "local" else 0
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        try:
+            get_local_db(self.db_path).execute(
+                "INSERT INTO analysis_routing_stats (day, tier, reason, entries, tokens_saved) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT(day, tier, reason) DO UPDATE SET entries = entries + 1, "
+                "tokens_saved = tokens_saved + excluded.tokens_saved",
+                (day, decision["tier"], decision["reason"], tokens_saved),
+            )
+        except Exception as e:
+            print(f"⚠️ Routing stats write failed: {str(e)}")
+
+    def analyze(self, text: str, model: str = "gpt-4o-mini") -> Tuple[Dict[str, Any], str, Dict[str, Any]]:
+        """Senkron yol (ör. içe aktarma): (analiz, analysis_v, karar) döndürür"""
+        decision = self.decide(text)
+        self.record(decision, text)
+        if decision["tier"] == "local":
+            return self.local_analysis(text, decision), LOCAL_ANALYSIS_VERSION, decision
+        return analyze_diary_openai(text, model=model), ANALYSIS_VERSION, decision
+
+    def stats(self, days: int = 7) -> Dict[str, Any]:
+        since = datetime.fromtimestamp(time.time() - days * 86400, timezone.utc).strftime("%Y-%m-%d")
+        rows = get_local_db(self.db_path).execute(
+            "SELECT tier, reason, SUM(entries) AS entries, SUM(tokens_saved) AS tokens_saved "
+            "FROM analysis_routing_stats WHERE day >= ? GROUP BY tier, reason", (since,)
+        ).fetchall()
+        by_tier: Dict[str, int] = {}
+        reasons: Dict[str, int] = {}
+        tokens_saved = 0
+        for row in rows:
+            by_tier[row["tier"]] = by_tier.get(row["tier"], 0) + row["entries"]
+            reasons[f"{row['tier']}:{row['reason']}"] = row["entries"]
+            tokens_saved += row["tokens_saved"] or 0
+        total = sum(by_tier.values())
+        return {
+            "days": days,
+            "enabled": self.enabled,
+            "entries": by_tier,
+            "reasons": reasons,
+            "local_share": round(by_tier.get("local", 0) / total, 3) if total else 0.0,
+            "llm_calls_avoided": by_tier.get("local", 0),
+            "tokens_saved": tokens_saved,
+        }
+
+
+def routing_summary(decision: Dict[str, Any]) -> Dict[str, Any]:
+    """Giriş dokümanına yazılacak karar özeti"""
+    return {
+        "tier": decision["tier"],
+        "reason": decision["reason"],
+        "words": decision["signals"].get("words"),
+        "routed_at": datetime.now(timezone.utc),
+    }
+
+
+# Global instance
+analysis_router = AnalysisRouter()
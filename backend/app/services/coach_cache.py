@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .rag_coaching import rag_coaching_service
+
+# Önbellekten yanıt vermek için gereken en düşük kosinüs benzerliği
+COACH_CACHE_THRESHOLD = float(os.getenv("APP_COACH_CACHE_THRESHOLD", "0.92"))
+COACH_CACHE_TTL = float(os.getenv("APP_COACH_CACHE_TTL", str(7 * 24 * 3600)))
+COACH_CACHE_ENABLED = os.getenv("APP_COACH_CACHE", "true").lower() not in ("0", "false", "no")
+
+
+class CoachAnswerCache:
+    """Koç sohbeti için kullanıcı başına anlamsal yanıt önbelleği
+
+    Yanıtlanan her soru embedding'i, yanıtı ve kaynak günlük ID'leriyle kosinüs
+    uzayındaki ayrı bir Chroma koleksiyonunda saklanır. Yeni soru, aynı
+    kullanıcının aynı indeks neslinde (günlükleri o zamandan beri değişmemiş)
+    sorulmuş bir soruya eşik üzerinde benziyorsa LLM çağrılmadan yanıtlanır.
+    """
+
+    def __init__(self, threshold: float = COACH_CACHE_THRESHOLD, ttl: float = COACH_CACHE_TTL):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.collection = rag_coaching_service.client.get_or_create_collection(
+            name="coach_answer_cache",
+            metadata={"hnsw:space": "cosine", "description": "Koç sohbeti anlamsal yanıt önbelleği"},
+        )
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def lookup(self, user_id: str, embedding: List[float], top_k: int) -> Optional[Dict[str, Any]]:
+        """Eşik üzerindeki en yakın önbellek kaydını döndürür; yoksa None"""
+        generation = rag_coaching_service.index_generation(user_id)
+        try:
+            results = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=1,
+                where={"$and": [
+                    {"user_id": user_id},
+                    {"generation": generation},
+                    {"top_k": top_k},
+                    {"created_at": {"$gte": time.time() - self.ttl}},
+                ]},
+                include=["documents", "metadatas", "distances"],
+            )
+        except Exception as e:
+            print(f"⚠️ Coach cache lookup failed: {str(e)}")
+            self._count("misses")
+            return None
+        if not results["ids"] or not results["ids"][0]:
+            self._count("misses")
+            return None
+        similarity = 1 - results["distances"][0][0]
+        if similarity < self.threshold:
+            self._count("misses")
+            return None
+        meta = results["metadatas"][0][0]
+        self._count("hits")
+        return {
+            "answer": meta["answer"],
+            "source_ids": json.loads(meta.get("source_ids") or "[]"),
+            "matched_question": results["documents"][0][0],
+            "similarity": similarity,
+        }
+
+    def store(self, user_id: str, question: str, embedding: List[float], answer: str,
+              source_ids: List[str], top_k: int, generation: int) -> None:
+        try:
+            # Eski nesillere ait kayıtlar artık hiç eşleşmeyeceği için temizlenir
+            self.collection.delete(where={"$and": [{"user_id": user_id}, {"generation": {"$ne": generation}}]})
+            self.collection.add(
+                ids=[uuid.uuid4().hex],
+                embeddings=[embedding],
+                documents=[question],
+                metadatas=[{
+                    "user_id": user_id,
+                    "answer": answer,
+                    "source_ids": json.dumps(source_ids),
+                    "top_k": top_k,
+                    "generation": generation,
+                    "created_at": time.time(),
+                }],
+            )
+            self._count("stores")
+        except Exception as e:
+            print(f"⚠️ Coach cache store failed: {str(e)}")
+
+    def invalidate_user(self, user_id: str) -> None:
+        self.collection.delete(where={"user_id": user_id})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["threshold"] = self.threshold
+        return stats
+
+
+# Global instance
+coach_answer_cache = CoachAnswerCache()
@@ -1,22 +1,23 @@
-import openai
 import os
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 
-# OpenAI API ayarları
-openai.api_key = os.getenv("OPENAI_API_KEY", "")
+from .providers.registry import provider_registry
+from ..utils.json_stream import JsonArrayStream
 
-def generate_reflective_questions(diary_text: str, emotion: str = None, user_history: List[str] = None) -> Dict:
-    """
-    Günlük girdisine göre yansıtıcı sorular üretir
-    """
-    if not openai.api_key:
-        return {
-            "success": False,
-            "error": "OpenAI API key is required"
-        }
-    
+# Koçluk metinleri için model; paylaşılan async OpenAI istemcisiyle akışlı çağrılır
+COACHING_MODEL = os.getenv("APP_COACHING_MODEL", "gpt-4o-mini")
+
+
+def _api_key_error() -> Dict:
+    return {
+        "success": False,
+        "error": "OpenAI API key is required"
+    }
+
+
+def _questions_messages(diary_text: str, emotion: str = None, user_history: List[str] = None) -> List[Dict[str, str]]:
     # Prompt oluştur
-    system_prompt = """You are a thoughtful life coach and therapist. Based on the user's diary entry, generate 3-5 reflective questions that help them explore their thoughts, feelings, and experiences more deeply. 
+    system_prompt = """You are a thoughtful life coach and therapist. Based on the user's diary entry, generate 3-5 reflective questions that help them explore their thoughts, feelings, and experiences more deeply.
 
 The questions should be:
 - Thoughtful and introspective
@@ -28,61 +29,69 @@ The questions should be:
 Return the questions as a JSON array of strings."""
 
     user_prompt = f"Diary entry: {diary_text}"
-    
+
     if emotion:
         user_prompt += f"\nDetected emotion: {emotion}"
-    
+
     if user_history:
         user_prompt += f"\nUser's recent themes: {', '.join(user_history[-3:])}"
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        questions_text = response.choices[0].message.content
-        
-        # JSON parse etmeye çalış
-        import json
-        try:
-            questions = json.loads(questions_text)
-            if isinstance(questions, list):
-                return {
-                    "success": True,
-                    "questions": questions,
-                    "model_used": "gpt-4"
-                }
-        except json.JSONDecodeError:
-            # JSON parse edilemezse, satır satır ayır
-            questions = [q.strip() for q in questions_text.split('\n') if q.strip() and '?' in q]
-            return {
-                "success": True,
-                "questions": questions[:5],  # İlk 5 soruyu al
-                "model_used": "gpt-4"
-            }
-            
-    except Exception as e:
-        return {
-            "success": False,
-            "error": f"GPT-4 request failed: {str(e)}"
-        }
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
 
-def generate_personal_development_advice(diary_entries: List[str], emotions: List[str] = None) -> Dict:
+
+async def stream_reflective_questions(diary_text: str, emotion: str = None,
+                                      user_history: List[str] = None) -> AsyncIterator[str]:
     """
-    Kullanıcının günlük geçmişine göre kişisel gelişim önerileri üretir
+    Yansıtıcı soruları üretildikçe tek tek döndürür
+
+    Model çıktısı JSON dizisi olarak artımlı ayrıştırılır; böylece ilk soru,
+    diğerleri hâlâ üretilirken gönderilebilir. Çıktı JSON değilse akış sonunda
+    soru işareti içeren satırlara geri dönülür.
+    """
+    parser = JsonArrayStream()
+    llm = provider_registry.openai_llm()
+    async for delta in llm.stream_text(
+        _questions_messages(diary_text, emotion, user_history),
+        model=COACHING_MODEL,
+        max_tokens=500,
+        temperature=0.7
+    ):
+        for item in parser.feed(delta):
+            if isinstance(item, str) and item.strip():
+                yield item.strip()
+
+    if parser.count == 0:
+        # JSON parse edilemezse, satır satır ayır
+        questions = [q.strip() for q in parser.buffer.split('\n') if q.strip() and '?' in q]
+        for question in questions[:5]:  # İlk 5 soruyu al
+            yield question
+
+
+async def generate_reflective_questions(diary_text: str, emotion: str = None, user_history: List[str] = None) -> Dict:
+    """
+    Günlük girdisine göre yansıtıcı sorular üretir
     """
-    if not openai.api_key:
+    if not os.getenv("OPENAI_API_KEY"):
+        return _api_key_error()
+
+    try:
+        questions = [q async for q in stream_reflective_questions(diary_text, emotion, user_history)]
+        return {
+            "success": True,
+            "questions": questions,
+            "model_used": COACHING_MODEL
+        }
+    except Exception as e:
         return {
             "success": False,
-            "error": "OpenAI API key is required"
+            "error": f"Coaching request failed: {str(e)}"
         }
-    
+
+
+def _advice_messages(diary_entries: List[str], emotions: List[str] = None) -> List[Dict[str, str]]:
     system_prompt = """You are an experienced life coach. Based on the user's recent diary entries, provide personalized development advice and actionable recommendations.
 
 Focus on:
@@ -95,39 +104,55 @@ Focus on:
 Return your advice as a structured response with sections: insights, recommendations, and next_steps."""
 
     entries_text = "\n\n".join([f"Entry {i+1}: {entry}" for i, entry in enumerate(diary_entries[-5:])])
-    
+
     user_prompt = f"Recent diary entries:\n{entries_text}"
-    
+
     if emotions:
         emotion_summary = ", ".join(emotions[-5:])
         user_prompt += f"\n\nRecent emotions: {emotion_summary}"
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+async def stream_personal_development_advice(diary_entries: List[str], emotions: List[str] = None) -> AsyncIterator[str]:
+    """
+    Kişisel gelişim önerisini metin parçaları halinde akıtır
+    """
+    llm = provider_registry.openai_llm()
+    async for delta in llm.stream_text(
+        _advice_messages(diary_entries, emotions),
+        model=COACHING_MODEL,
+        max_tokens=800,
+        temperature=0.7
+    ):
+        yield delta
+
+
+async def generate_personal_development_advice(diary_entries: List[str], emotions: List[str] = None) -> Dict:
+    """
+    Kullanıcının günlük geçmişine göre kişisel gelişim önerileri üretir
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        return _api_key_error()
+
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=800,
-            temperature=0.7
-        )
-        
-        advice_text = response.choices[0].message.content
-        
+        advice_text = "".join([d async for d in stream_personal_development_advice(diary_entries, emotions)])
         return {
             "success": True,
             "advice": advice_text,
-            "model_used": "gpt-4"
+            "model_used": COACHING_MODEL
         }
-        
     except Exception as e:
         return {
             "success": False,
-            "error": f"GPT-4 request failed: {str(e)}"
+            "error": f"Coaching request failed: {str(e)}"
         }
 
-def analyze_progress(user_responses: List[Dict], time_period_days: int = 30) -> Dict:
+
+async def analyze_progress(user_responses: List[Dict], time_period_days: int = 30) -> Dict:
     """
     Kullanıcının yansıtıcı soru yanıtlarına göre ilerleme analizi yapar
     """
@@ -136,13 +161,10 @@ def analyze_progress(user_responses: List[Dict], time_period_days: int = 30) ->
             "success": False,
             "error": "No user responses to analyze"
         }
-    
-    if not openai.api_key:
-        return {
-            "success": False,
-            "error": "OpenAI API key is required"
-        }
-    
+
+    if not os.getenv("OPENAI_API_KEY"):
+        return _api_key_error()
+
     system_prompt = """You are a progress tracking specialist. Based on the user's responses to reflective questions over time, analyze their personal growth and development patterns.
 
 Provide insights on:
@@ -158,31 +180,29 @@ Return a structured analysis with sections: progress_summary, key_insights, area
         f"Date: {resp.get('date', 'Unknown')}\nQuestion: {resp.get('question', '')}\nResponse: {resp.get('response', '')}"
         for resp in user_responses[-10:]  # Son 10 yanıt
     ])
-    
+
     user_prompt = f"User's reflective question responses over the last {time_period_days} days:\n\n{responses_text}"
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
+        analysis_text = await provider_registry.openai_llm().achat_text(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
+            model=COACHING_MODEL,
             max_tokens=800,
             temperature=0.7
         )
-        
-        analysis_text = response.choices[0].message.content
-        
+
         return {
             "success": True,
             "analysis": analysis_text,
-            "model_used": "gpt-4",
+            "model_used": COACHING_MODEL,
             "responses_analyzed": len(user_responses)
         }
-        
+
     except Exception as e:
         return {
             "success": False,
-            "error": f"GPT-4 request failed: {str(e)}"
-        } 
\ No newline at end of file
+            "error": f"Coaching request failed: {str(e)}"
+        }
@@ -0,0 +1,120 @@
+from typing import Any, Dict, List
+from urllib.parse import unquote, urlparse
+
+from .firestore_service import firestore_service
+from .rag_coaching import rag_coaching_service
+from .firebase import delete_images_from_storage
+from .image_cache import image_cache
+from .image_derivatives import manifest_path
+from .image_index import image_index
+from .job_queue import job_queue
+
+STORAGE_PUBLIC_HOST = "storage.googleapis.com"
+
+
+def media_storage_paths(entry: Dict[str, Any]) -> List[str]:
+    """Girişe bağlı Firebase Storage dosyalarının yolları (görsel ve türevleri)"""
+    media = entry.get("media") or {}
+    paths: List[str] = []
+    if media.get("storage_path"):
+        paths.append(media["storage_path"])
+    derivatives = [d for d in media.get("derivatives") or [] if isinstance(d, dict) and d.get("path")]
+    if derivatives and media.get("sha256") and entry.get("user_id"):
+        # Manifest önce silinir; yarım kalan silmede türevler "var" sanılmaz
+        paths.append(manifest_path(entry["user_id"], media["sha256"]))
+    paths.extend(d["path"] for d in derivatives)
+    image_url = media.get("image_url") or ""
+    parsed = urlparse(image_url)
+    if not paths and parsed.netloc == STORAGE_PUBLIC_HOST:
+        # https://storage.googleapis.com/<bucket>/<path>
+        parts = unquote(parsed.path).lstrip("/").split("/", 1)
+        if len(parts) == 2 and parts[1]:
+            paths.append(parts[1])
+    return paths
+
+
+class DiaryDeletionService:
+    """Günlük girişini tüm türetilmiş verisiyle birlikte siler
+
+    Önce Firestore dokümanı (analiz ve zenginleştirme alanları dahil) silinir;
+    ardından vektör ve Storage'daki medya temizlenir. İkincil silmelerden biri
+    başarısız olursa kalan iş "diary_delete_cleanup" olarak kuyruğa alınır ve
+    yeniden denenir; böylece indeks canlı veriyle aynı boyutta kalır.
+    """
+
+    CLEANUP_KIND = "diary_delete_cleanup"
+
+    def delete_entries(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Verilen girişleri (id ve media alanlarıyla) kaskad olarak siler"""
+        entry_ids = [e["id"] for e in entries]
+        if not entry_ids:
+            return {"success": True, "deleted_count": 0, "cleanup_pending": False}
+        result = firestore_service.delete_diary_entries_batch(entry_ids)
+        if not result["success"]:
+            return result
+        paths: List[str] = []
+        for e in entries:
+            original = (e.get("media") or {}).get("storage_path")
+            # Görseller içerik-adresli: aynı nesneye bağlı kalan başka giriş varsa nesne ve türevleri silinmez
+            if original and firestore_service.storage_path_in_use(e.get("user_id"), original):
+                continue
+            paths.extend(media_storage_paths(e))
+        return self._cleanup({"vector_ids": entry_ids, "storage_paths": paths}, len(entry_ids))
+
+    def clear_user(self, user_id: str) -> Dict[str, Any]:
+        """Kullanıcının tüm girişlerini, vektörlerini ve medyasını siler"""
+        try:
+            entries = list(firestore_service.iter_diary_entries(user_id))
+        except Exception as e:
+            return {"success": False, "error": f"Failed to list diary entries: {str(e)}"}
+        result = firestore_service.delete_diary_entries_batch([e["id"] for e in entries])
+        if not result["success"]:
+            return result
+        paths = [path for e in entries for path in media_storage_paths(e)]
+        # Kullanıcı filtresiyle silmek, Firestore'da karşılığı kalmamış eski vektörleri de temizler
+        return self._cleanup({"vector_user_id": user_id, "storage_paths": paths}, len(entries))
+
+    def _cleanup(self, targets: Dict[str, Any], deleted_count: int) -> Dict[str, Any]:
+        pending = self.run_cleanup(targets)
+        response = {"success": True, "deleted_count": deleted_count, "cleanup_pending": bool(pending)}
+        if pending:
+            response["cleanup_job_id"] = job_queue.enqueue(self.CLEANUP_KIND, pending)
+            print(f"⚠️ Delete cleanup deferred to background job: {', '.join(pending['errors'])}")
+        return response
+
+    @staticmethod
+    def run_cleanup(targets: Dict[str, Any]) -> Dict[str, Any]:
+        """Vektör ve medya silmelerini dener; başarısız kalan hedefleri döndürür"""
+        pending: Dict[str, Any] = {}
+        errors: List[str] = []
+        if targets.get("vector_ids") or targets.get("vector_user_id"):
+            res = rag_coaching_service.delete_entries(
+                entry_ids=targets.get("vector_ids"), user_id=targets.get("vector_user_id")
+            )
+            if not res.get("success"):
+                pending["vector_ids"] = targets.get("vector_ids")
+                pending["vector_user_id"] = targets.get("vector_user_id")
+                errors.append(res.get("error", "vector delete failed"))
+        if targets.get("storage_paths"):
+            res = delete_images_from_storage(targets["storage_paths"])
+            if res.get("success"):
+                image_cache.invalidate_paths(targets["storage_paths"])
+                image_index.remove(targets["storage_paths"])
+            else:
+                pending["storage_paths"] = targets["storage_paths"]
+                errors.append(res.get("error", "storage delete failed"))
+        if pending:
+            pending["errors"] = errors
+        return pending
+
+    def handle_cleanup(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Kuyruk handler'ı: yarım kalan vektör/medya silmelerini tekrar dener"""
+        pending = self.run_cleanup(payload)
+        if pending:
+            raise RuntimeError("; ".join(pending["errors"]))
+        return {"vector_count": rag_coaching_service.count()}
+
+
+# Global instance
+diary_deletion_service = DiaryDeletionService()
+job_queue.register(DiaryDeletionService.CLEANUP_KIND, diary_deletion_service.handle_cleanup, concurrency=1, max_attempts=8)
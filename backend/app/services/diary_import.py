@@ -0,0 +1,218 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .firestore_service import firestore_service
+from .rag_coaching import rag_coaching_service
+from .analysis_router import analysis_router, routing_summary
+from .job_queue import job_queue
+
+# İçe aktarılan bir dosyada izin verilen en fazla giriş
+MAX_IMPORT_ENTRIES = int(os.getenv("APP_IMPORT_MAX_ENTRIES", "10000"))
+# Arka plan terapi analizi için dakika başına istek sınırı
+IMPORT_ANALYSIS_RPM = float(os.getenv("APP_IMPORT_ANALYSIS_RPM", "30"))
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def parse_import_payload(raw: bytes) -> List[Dict[str, Any]]:
+    """NDJSON veya JSON dizisi içeriğini giriş listesine çevirir
+
+    Export çıktısı (GET /api/v1/diary/export) doğrudan geri yüklenebilir; kayıtta
+    analysis ve analysis_v varsa yeniden analiz yapılmaz.
+    """
+    text = raw.decode("utf-8-sig").strip()
+    if not text:
+        return []
+
+    if text.startswith("["):
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ImportFormatError(f"Invalid JSON array: {e}")
+    else:
+        records = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ImportFormatError(f"Invalid JSON on line {line_no}: {e}")
+
+    if len(records) > MAX_IMPORT_ENTRIES:
+        raise ImportFormatError(f"At most {MAX_IMPORT_ENTRIES} entries can be imported at once")
+
+    entries: List[Dict[str, Any]] = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        content = record.get("content") or record.get("text") or record.get("body")
+        if not content or not isinstance(content, str):
+            continue
+        entry: Dict[str, Any] = {
+            "title": record.get("title") or content[:60],
+            "content": content,
+            "location": record.get("location"),
+            "mood": record.get("mood") or record.get("emotion"),
+        }
+        created_at = _parse_timestamp(record.get("created_at") or record.get("date"))
+        if created_at:
+            entry["created_at"] = created_at
+        if isinstance(record.get("analysis"), dict) and record.get("analysis_v"):
+            entry["analysis"] = record["analysis"]
+            entry["analysis_v"] = record["analysis_v"]
+        entries.append(entry)
+    return entries
+
+
+class DiaryImportService:
+    """Toplu günlük içe aktarma: batch yazma, batch embedding ve hız sınırlı analiz
+
+    Yazma ve indeksleme tek bir "diary_import" işi olarak, terapi analizi ise giriş
+    başına "diary_import_analysis" işleri olarak kalıcı kuyrukta yürür. Analiz
+    işlerinin hızı APP_IMPORT_ANALYSIS_RPM ile sınırlanır.
+    """
+
+    IMPORT_KIND = "diary_import"
+    ANALYSIS_KIND = "diary_import_analysis"
+
+    def start(self, user_id: str, entries: List[Dict[str, Any]], analyze: bool = True) -> Dict[str, Any]:
+        """İçe aktarma işini kaydeder ve kuyruğa ekler"""
+        pending_analysis = sum(1 for e in entries if analyze and "analysis" not in e)
+        result = firestore_service.create_import_job(user_id, {
+            "status": "queued",
+            "total": len(entries),
+            "written": 0,
+            "indexed": 0,
+            "analysis_total": pending_analysis,
+            "analyzed": 0,
+            "analysis_failed": 0,
+            "errors": [],
+        })
+        if not result.get("success"):
+            return result
+        serialized = [
+            {**e, "created_at": e["created_at"].isoformat()} if e.get("created_at") else e
+            for e in entries
+        ]
+        job_queue.enqueue(
+            self.IMPORT_KIND,
+            {"import_id": result["import_id"], "user_id": user_id, "entries": serialized, "analyze": analyze},
+            dedupe_key=f"{self.IMPORT_KIND}:{result['import_id']}",
+        )
+        return result
+
+    @staticmethod
+    def status_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Analiz sayaçları tamamlandıysa durumu "completed" olarak gösterir"""
+        view = dict(job)
+        if view.get("status") == "analyzing":
+            finished = (view.get("analyzed") or 0) + (view.get("analysis_failed") or 0)
+            if finished >= (view.get("analysis_total") or 0):
+                view["status"] = "completed"
+        return view
+
+    def handle_import(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import_id = payload["import_id"]
+        user_id = payload["user_id"]
+        analyze = payload.get("analyze", True)
+        entries = []
+        for e in payload["entries"]:
+            e = dict(e)
+            created_at = _parse_timestamp(e.get("created_at"))
+            if created_at:
+                e["created_at"] = created_at
+            else:
+                e.pop("created_at", None)
+            entries.append(e)
+
+        firestore_service.update_import_job(import_id, {"status": "writing"})
+        # Deterministik ID'ler sayesinde yeniden denemede kopya giriş oluşmaz
+        entry_ids = [f"{import_id}-{i:05d}" for i in range(len(entries))]
+        write_res = firestore_service.create_diary_entries_batch(user_id, entries, entry_ids=entry_ids)
+        if not write_res.get("success"):
+            raise RuntimeError(write_res.get("error"))
+        firestore_service.update_import_job(import_id, {"status": "indexing", "written": len(entry_ids)})
+
+        index_res = rag_coaching_service.add_diary_entries(
+            [
+                {
+                    "entry_id": entry_id,
+                    "content": entry["content"],
+                    "emotion": entry.get("mood") or "",
+                    "date": entry["created_at"].strftime('%Y-%m-%d') if entry.get("created_at") else None,
+                    "location": entry.get("location") or "",
+                }
+                for entry_id, entry in zip(entry_ids, entries)
+            ],
+            user_id=user_id,
+        )
+        firestore_service.update_import_job(
+            import_id,
+            {"status": "analyzing" if analyze else "completed", "indexed": index_res.get("indexed_count", 0),
+             "errors": index_res.get("errors", [])[:10]},
+        )
+        queued = 0
+        if analyze:
+            for entry_id, entry in zip(entry_ids, entries):
+                if "analysis" in entry:
+                    continue
+                job_queue.enqueue(
+                    self.ANALYSIS_KIND,
+                    {"import_id": import_id, "entry_id": entry_id},
+                    dedupe_key=f"{self.ANALYSIS_KIND}:{entry_id}",
+                )
+                queued += 1
+        return {"written": len(entry_ids), "indexed": index_res.get("indexed_count", 0), "analysis_queued": queued}
+
+    def handle_import_dead(self, payload: Dict[str, Any], error: str) -> None:
+        firestore_service.update_import_job(payload["import_id"], {"status": "failed", "errors": [error]})
+
+    def handle_analysis(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        entry_res = firestore_service.get_diary_entry(payload["entry_id"])
+        if not entry_res.get("success"):
+            firestore_service.update_import_job(payload["import_id"], {}, increments={"analysis_failed": 1})
+            return {"skipped": entry_res.get("error")}
+        analysis, version, decision = analysis_router.analyze(entry_res["entry"].get("content") or "")
+        firestore_service.update_diary_entry(payload["entry_id"], {
+            "analysis": analysis, "analysis_v": version, "analysis_routing": routing_summary(decision)
+        })
+        firestore_service.update_import_job(payload["import_id"], {}, increments={"analyzed": 1})
+        return {"entry_id": payload["entry_id"]}
+
+    def handle_analysis_dead(self, payload: Dict[str, Any], error: str) -> None:
+        firestore_service.update_import_job(payload["import_id"], {}, increments={"analysis_failed": 1})
+
+
+# Global instance
+diary_import_service = DiaryImportService()
+job_queue.register(
+    DiaryImportService.IMPORT_KIND,
+    diary_import_service.handle_import,
+    concurrency=1,
+    max_attempts=3,
+    visibility_timeout=1800,
+    on_dead=diary_import_service.handle_import_dead,
+)
+job_queue.register(
+    DiaryImportService.ANALYSIS_KIND,
+    diary_import_service.handle_analysis,
+    concurrency=2,
+    rate_per_minute=IMPORT_ANALYSIS_RPM,
+    on_dead=diary_import_service.handle_analysis_dead,
+)
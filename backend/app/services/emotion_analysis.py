@@ -7,7 +7,7 @@ from datetime import datetime
 
 # Gemini import
 try:
-    from .providers.llm_gemini import GeminiLLMProvider
+    from .providers.registry import provider_registry
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
@@ -50,8 +50,8 @@ def analyze_emotion_deep_gemini(text: str, user_context: Optional[Dict] = None)
         
         safe_text = _truncate_text(text, max_chars=3000)
         
-        # Gemini provider'ı başlat
-        llm = GeminiLLMProvider()
+        # Paylaşılan Gemini provider'ı al
+        llm = provider_registry.gemini_llm()
         
         # Detaylı analiz için prompt oluştur
         system_prompt = """Sen bir uzman psikolog ve duygu analizi uzmanısın. 
@@ -154,8 +154,8 @@ def analyze_emotion_comparative(text: str, previous_entries: Optional[List[Dict]
         
         safe_text = _truncate_text(text, max_chars=3000)
         
-        # Gemini provider'ı başlat
-        llm = GeminiLLMProvider()
+        # Paylaşılan Gemini provider'ı al
+        llm = provider_registry.gemini_llm()
         
         # Geçmiş girdileri hazırla
         context_text = ""
@@ -247,17 +247,41 @@ def get_emotion_summary(user_id: str, time_period: str = "week") -> dict:
         logging.error(f"Emotion summary error: {e}")
         return {"error": str(e)}
 
+def analyze_emotion_auto(text: str, user_context: Optional[Dict] = None) -> dict:
+    """
+    Katmanlı analiz: yönlendirici yerel sinyalleri yeterli görürse DistilBERT
+    sonucu döner, aksi halde Gemini derin analizine gidilir
+    """
+    from .analysis_router import analysis_router, routing_summary
+
+    decision = analysis_router.decide(text)
+    analysis_router.record(decision, text)
+    sentiment = decision["signals"].get("sentiment")
+    if decision["tier"] == "local" and sentiment and sentiment.get("label"):
+        result = {
+            "emotion": sentiment["label"],
+            "confidence": sentiment["score"],
+            "text": _truncate_text(text),
+            "analysis_type": "local_basic",
+        }
+    else:
+        result = analyze_emotion_deep_gemini(text, user_context)
+    result["routing"] = routing_summary(decision)
+    return result
+
 # Ana analiz fonksiyonu - kullanım kolaylığı için
-def analyze_emotion_enhanced(text: str, analysis_type: str = "deep", **kwargs) -> dict:
+def analyze_emotion_enhanced(text: str, analysis_type: str = "auto", **kwargs) -> dict:
     """
     Gelişmiş duygu analizi - farklı analiz türleri için wrapper
     
     Args:
         text: Analiz edilecek metin
-        analysis_type: "basic", "deep", "comparative"
+        analysis_type: "auto", "basic", "deep", "comparative"
         **kwargs: Ek parametreler (previous_entries, user_context vb.)
     """
-    if analysis_type == "basic":
+    if analysis_type == "auto":
+        return analyze_emotion_auto(text, kwargs.get("user_context"))
+    elif analysis_type == "basic":
         return analyze_emotion(text)
     elif analysis_type == "deep":
         return analyze_emotion_deep_gemini(text, kwargs.get("user_context"))
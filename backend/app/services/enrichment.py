@@ -0,0 +1,360 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .firestore_service import firestore_service, content_hash
+from .rag_coaching import rag_coaching_service
+from .text_analysis import (
+    analyze_diary_openai_stream, analysis_flight, finalize_analysis, should_generate_image, build_sd_prompt,
+    ANALYSIS_VERSION, LOCAL_ANALYSIS_VERSION
+)
+from .analysis_router import analysis_router, routing_summary
+from .image_generation import image_generation_service
+from .job_queue import job_queue
+from ..utils.broadcast import Broadcaster
+from ..utils.singleflight import flight_key
+
+ENRICHMENT_TERMINAL_STATES = ("completed", "failed")
+# Akış sırasında tamamlanan analiz alanları en fazla bu aralıkla Firestore'a yazılır
+ANALYSIS_FLUSH_SECONDS = float(os.getenv("APP_ANALYSIS_FLUSH_SECONDS", "0.5"))
+ANALYSIS_MODEL = "gpt-4o-mini"
+# Vektör metadata'sına yansıyan giriş alanları: Firestore alanı -> metadata anahtarı
+VECTOR_METADATA_FIELDS = {"mood": "emotion", "location": "location"}
+
+
+class StepSkipped(Exception):
+    """Adımın bu giriş için çalışmasına gerek olmadığını belirtir"""
+
+
+def primary_emotion_label(analysis: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Terapi analizinden geriye dönük uyumluluk için basit duygu etiketi çıkar"""
+    try:
+        pe = (analysis or {}).get("affect", {}).get("primary_emotions", [])
+        if isinstance(pe, list) and len(pe) > 0 and isinstance(pe[0], dict):
+            return pe[0].get("label")
+    except Exception:
+        pass
+    return None
+
+
+StepFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+async def run_step_graph(graph: Dict[str, Tuple[Tuple[str, ...], StepFn]]) -> Dict[str, Dict[str, Any]]:
+    """Bağımlılık grafiğindeki adımları mümkün olan en yüksek eşzamanlılıkla çalıştırır
+
+    graph: adım adı -> (bağımlılıklar, async fonksiyon). Her fonksiyon tamamlanmış
+    bağımlılıklarının sonuçlarını alır. Bağımlılığı başarısız olan adım "skipped"
+    olur. Her adım için durum ve süre (ms) kaydedilir.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+    report: Dict[str, Dict[str, Any]] = {}
+
+    async def _run(name: str) -> Any:
+        deps, fn = graph[name]
+        dep_results: Dict[str, Any] = {}
+        for dep in deps:
+            try:
+                dep_results[dep] = await tasks[dep]
+            except Exception:
+                report[name] = {"status": "skipped", "reason": f"dependency {dep} did not complete"}
+                raise StepSkipped(dep)
+        start = time.perf_counter()
+        try:
+            result = await fn(dep_results)
+            report[name] = {"status": "completed"}
+            return result
+        except StepSkipped as e:
+            report[name] = {"status": "skipped", "reason": str(e)}
+            raise
+        except Exception as e:
+            report[name] = {"status": "failed", "error": str(e)}
+            raise
+        finally:
+            report[name]["duration_ms"] = int((time.perf_counter() - start) * 1000)
+
+    for name in graph:
+        tasks[name] = asyncio.ensure_future(_run(name))
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return report
+
+
+class DiaryEnrichmentService:
+    """Günlük girişi oluşturulduktan sonra analiz, indeksleme ve görsel adımlarını yürütür
+
+    İş durumu girişin kendi dokümanındaki "enrichment" alanında tutulur; böylece
+    hangi worker çalıştırırsa çalıştırsın GET /api/v1/diary/{id}/enrichment aynı
+    durumu görür. Adımlar bir bağımlılık grafiği olarak eşzamanlı yürür: embedding
+    analizi beklemez, duygu etiketi analiz bitince vektör metadata'sına yamanır.
+    İşler kalıcı kuyrukta ("diary_enrichment") çalışır; başarısız adımlar yeniden
+    denenir, önceki denemede tamamlanan adımlar tekrar çalıştırılmaz.
+    """
+
+    JOB_KIND = "diary_enrichment"
+    METADATA_KIND = "diary_index_metadata"
+
+    @staticmethod
+    def new_job(completed_steps: Tuple[str, ...] = ()) -> Dict[str, Any]:
+        """Giriş ile aynı yazmada kaydedilecek başlangıç iş durumu
+
+        completed_steps içindeki adımlar tamamlanmış sayılır ve çalıştırılmaz.
+        """
+        return {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "steps": {name: {"status": "completed", "reason": "unchanged"} for name in completed_steps},
+            "queued_at": datetime.now(timezone.utc),
+        }
+
+    def enqueue(self, entry_id: str, user_id: str, job: Dict[str, Any], content_digest: Optional[str] = None) -> str:
+        payload = {"entry_id": entry_id, "user_id": user_id}
+        dedupe_key = f"{self.JOB_KIND}:{entry_id}"
+        if content_digest:
+            # Düzenleme sonrası iş, eski içerik için çalışan işle birleştirilmemeli
+            payload["content_hash"] = content_digest
+            dedupe_key = f"{dedupe_key}:{content_digest[:16]}"
+        return job_queue.enqueue(self.JOB_KIND, payload, job_id=job["job_id"], dedupe_key=dedupe_key)
+
+    @staticmethod
+    def plan_update(entry: Dict[str, Any], update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Güncellemeyi mevcut girişle karşılaştırıp gereken en az işi belirler
+
+        Yalnızca gerçekten değişen alanlar yazılır. İçerik değişmişse (saklanan
+        content_hash ile karşılaştırılır) yeniden analiz ve embedding gerekir; aksi
+        halde duygu/konum değişiklikleri sadece vektör metadata'sına yamanır,
+        başlık değişikliği vektöre hiç dokunmaz.
+        """
+        changes = {k: v for k, v in update_data.items() if entry.get(k) != v}
+        plan: Dict[str, Any] = {"changes": changes, "content_changed": False, "metadata": {}}
+        if "content" in changes:
+            digest = content_hash(changes["content"])
+            stored = entry.get("content_hash") or content_hash(entry.get("content"))
+            if digest != stored:
+                plan["content_changed"] = True
+                changes["content_hash"] = digest
+        if not plan["content_changed"]:
+            plan["metadata"] = {
+                key: changes[field] or "" for field, key in VECTOR_METADATA_FIELDS.items() if field in changes
+            }
+        return plan
+
+    def enqueue_metadata_patch(self, entry_id: str, metadata: Dict[str, Any]) -> str:
+        return job_queue.enqueue(self.METADATA_KIND, {"entry_id": entry_id, "metadata": metadata})
+
+    def handle_metadata_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Kuyruk handler'ı: embedding'i yeniden üretmeden vektör metadata'sını günceller"""
+        if not rag_coaching_service.get_vector_metadata([payload["entry_id"]]):
+            # Henüz indekslenmemiş; zenginleştirme işi güncel alanlarla indeksleyecek
+            return {"skipped": "vector not found"}
+        res = rag_coaching_service.update_entry_metadata(payload["entry_id"], payload["metadata"])
+        if not res.get("success"):
+            raise RuntimeError(res.get("error"))
+        return res
+
+    def stream_analysis(self, entry_id: str, content: str) -> Dict[str, Any]:
+        """Analizi akışla üretir; tamamlanan alanları yayınlar ve aralıklarla kaydeder
+
+        Her alan geldiği anda analysis_progress üzerinden aynı süreçteki SSE
+        abonelerine iletilir; Firestore'a ise ANALYSIS_FLUSH_SECONDS aralığıyla
+        "analysis_status": "streaming" olarak yazılır (diğer worker'lar ve yeniden
+        bağlanan istemciler için). Nihai analiz çağıranın tek güncellemesiyle yazılır.
+
+        Akış analyze_diary_openai ile aynı singleflight anahtarını kullanır: aynı
+        metnin eşzamanlı analizleri (ör. import kopyaları) tek çağrıyı paylaşır,
+        bekleyen girişlere alanlar sonuç gelince topluca yayınlanır. Akış yarıda
+        kalırsa kaydedilmiş yarım analiz silinir ve durum "failed" olur.
+        """
+        streamed = []
+
+        def _stream() -> Dict[str, Any]:
+            streamed.append(True)
+            start = time.time()
+            fields: Dict[str, Any] = {}
+            flushed = False
+            last_flush = time.monotonic()
+            try:
+                for field, value in analyze_diary_openai_stream(content, model=ANALYSIS_MODEL):
+                    fields[field] = value
+                    analysis_progress.publish(entry_id, {"field": field, "value": value})
+                    if time.monotonic() - last_flush >= ANALYSIS_FLUSH_SECONDS:
+                        firestore_service.update_diary_entry(
+                            entry_id, {"analysis": dict(fields), "analysis_status": "streaming"}
+                        )
+                        flushed = True
+                        last_flush = time.monotonic()
+            except Exception:
+                if flushed:
+                    firestore_service.update_diary_entry(entry_id, {"analysis": None, "analysis_status": "failed"})
+                raise
+            return finalize_analysis(fields, ANALYSIS_MODEL, int((time.time() - start) * 1000))
+
+        analysis = analysis_flight.do(flight_key(content, "tr", ANALYSIS_MODEL), _stream)
+        if not streamed:
+            for field, value in analysis.items():
+                if field != "provider_meta":
+                    analysis_progress.publish(entry_id, {"field": field, "value": value})
+        return analysis
+
+    async def run(self, entry_id: str, user_id: str, entry: Dict[str, Any], final_attempt: bool = True) -> Dict[str, Any]:
+        job = dict(entry.get("enrichment") or self.new_job())
+        previous_steps: Dict[str, Any] = job.get("steps") or {}
+        job["status"] = "running"
+        job["started_at"] = datetime.now(timezone.utc)
+        await asyncio.to_thread(firestore_service.update_diary_entry, entry_id, {"enrichment": job})
+
+        content = entry.get("content") or ""
+        update: Dict[str, Any] = {}
+
+        def _already_done(step: str) -> bool:
+            return (previous_steps.get(step) or {}).get("status") == "completed"
+
+        async def analysis_step(_: Dict[str, Any]) -> Dict[str, Any]:
+            if _already_done("analysis") and entry.get("analysis"):
+                return entry["analysis"]
+            # Kısa/düşük sinyalli girişler LLM'e gitmeden yerel analizle kapanır
+            decision = await asyncio.to_thread(analysis_router.decide, content)
+            await asyncio.to_thread(analysis_router.record, decision, content)
+            if decision["tier"] == "local":
+                analysis = analysis_router.local_analysis(content, decision)
+                for field, value in analysis.items():
+                    analysis_progress.publish(entry_id, {"field": field, "value": value})
+                update["analysis_v"] = LOCAL_ANALYSIS_VERSION
+            else:
+                try:
+                    analysis = await asyncio.to_thread(self.stream_analysis, entry_id, content)
+                except Exception:
+                    update["analysis_status"] = "failed"
+                    raise
+                update["analysis_v"] = ANALYSIS_VERSION
+            update["analysis"] = analysis
+            update["analysis_routing"] = routing_summary(decision)
+            update["analysis_status"] = "completed"
+            detected_emotion = primary_emotion_label(analysis)
+            if not entry.get("mood") and detected_emotion:
+                update["mood"] = detected_emotion
+            return analysis
+
+        async def index_step(_: Dict[str, Any]) -> Dict[str, Any]:
+            if _already_done("index"):
+                return {"success": True}
+            # Giriş iş sürerken silindiyse silme kaskadının kaldırdığı vektör geri eklenmez
+            current = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+            if not current.get("success"):
+                raise StepSkipped("entry deleted")
+            # Vector ID = Firestore doc ID; duygu analizi bitmeden geçici etiketle eklenir
+            created_at = entry.get("created_at")
+            rag_result = await asyncio.to_thread(
+                rag_coaching_service.add_diary_entry,
+                content=content,
+                emotion=(entry.get("mood") or "neutral"),
+                date=(created_at if isinstance(created_at, datetime) else datetime.utcnow()).strftime('%Y-%m-%d'),
+                location=(entry.get("location") or ""),
+                tags=[],
+                entry_id=entry_id,
+                user_id=user_id,
+            )
+            if not rag_result.get("success"):
+                raise RuntimeError(rag_result.get("error", "Unknown error"))
+            # Silme, kontrol ile ekleme arasına düştüyse kaskad vektörü kaçırmıştır; hayalet kayıt temizlenir
+            current = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+            if not current.get("success"):
+                await asyncio.to_thread(rag_coaching_service.delete_entries, entry_ids=[entry_id])
+                raise StepSkipped("entry deleted")
+            return rag_result
+
+        async def emotion_patch_step(deps: Dict[str, Any]) -> None:
+            detected_emotion = primary_emotion_label(deps["analysis"])
+            if _already_done("emotion_patch") or entry.get("mood") or not detected_emotion:
+                raise StepSkipped("emotion already set")
+            res = await asyncio.to_thread(rag_coaching_service.update_entry_metadata, entry_id, {"emotion": detected_emotion})
+            if not res.get("success"):
+                raise RuntimeError(res.get("error"))
+
+        async def image_step(deps: Dict[str, Any]) -> Dict[str, Any]:
+            if _already_done("image"):
+                raise StepSkipped("already generated")
+            analysis = deps["analysis"] or {}
+            if not should_generate_image(content, analysis):
+                raise StepSkipped("not a dream entry")
+            prompt = build_sd_prompt(content, analysis)
+            # Üretim ayrı kuyruk işinde yürür; zenginleştirme görseli beklemez
+            job_id = await asyncio.to_thread(
+                image_generation_service.enqueue, entry_id, user_id, prompt, entry.get("content_hash")
+            )
+            update["image_status"] = "queued"
+            return {"job_id": job_id}
+
+        started = time.perf_counter()
+        steps = await run_step_graph({
+            "analysis": ((), analysis_step),
+            "index": ((), index_step),
+            "emotion_patch": (("analysis", "index"), emotion_patch_step),
+            "image": (("analysis",), image_step),
+        })
+        # Önceki denemede tamamlanan adımların kaydını koru
+        for name, prev in previous_steps.items():
+            if (prev or {}).get("status") == "completed" and steps.get(name, {}).get("status") != "failed":
+                steps[name] = prev
+
+        # Tüm sonuçlar tek bir güncelleme ile birleştirilir
+        failed = [name for name, step in steps.items() if step.get("status") == "failed"]
+        job["steps"] = steps
+        job["duration_ms"] = int((time.perf_counter() - started) * 1000)
+        if not failed:
+            job["status"] = "completed"
+        elif final_attempt:
+            job["status"] = "failed"
+        else:
+            job["status"] = "retrying"
+        job["finished_at"] = datetime.now(timezone.utc)
+        update["enrichment"] = job
+        await asyncio.to_thread(firestore_service.update_diary_entry, entry_id, update)
+        if failed and not final_attempt:
+            raise RuntimeError(f"Enrichment steps failed: {', '.join(failed)}")
+        return job
+
+    async def handle_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Kuyruk handler'ı: girişi güncel haliyle okuyup zenginleştirmeyi çalıştırır"""
+        entry_id = payload["entry_id"]
+        result = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+        if not result["success"]:
+            # Giriş silinmişse yapılacak iş kalmadı
+            return {"skipped": result.get("error")}
+        expected_hash = payload.get("content_hash")
+        if expected_hash and result["entry"].get("content_hash") != expected_hash:
+            # İçerik tekrar düzenlenmiş; güncel içerik için ayrı bir iş kuyrukta
+            return {"skipped": "stale content"}
+        meta = payload.get("_job") or {}
+        job = await self.run(
+            entry_id,
+            payload["user_id"],
+            result["entry"],
+            final_attempt=meta.get("attempts", 1) >= meta.get("max_attempts", 1),
+        )
+        return {"status": job["status"], "duration_ms": job.get("duration_ms")}
+
+    def handle_dead(self, payload: Dict[str, Any], error: str) -> None:
+        firestore_service.update_diary_entry(payload["entry_id"], {
+            "enrichment.status": "failed",
+            "enrichment.error": error,
+        })
+
+
+# Global instance
+diary_enrichment_service = DiaryEnrichmentService()
+# Akan analiz alanları: konu = entry_id, olay = {"field", "value"}
+analysis_progress = Broadcaster()
+job_queue.register(
+    DiaryEnrichmentService.JOB_KIND,
+    diary_enrichment_service.handle_job,
+    concurrency=int(os.getenv("APP_ENRICHMENT_CONCURRENCY", "4")),
+    on_dead=diary_enrichment_service.handle_dead,
+)
+job_queue.register(
+    DiaryEnrichmentService.METADATA_KIND,
+    diary_enrichment_service.handle_metadata_job,
+    concurrency=2,
+)
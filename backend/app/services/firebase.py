@@ -2,7 +2,9 @@ import os
 import firebase_admin
 from firebase_admin import credentials, storage, messaging
 import uuid
-from datetime import datetime
+import hashlib
+from datetime import datetime, timedelta
+from google.api_core.exceptions import PreconditionFailed
 
 # Servis hesabı anahtarı dosyasının yolu
 FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "firebase-service-account.json")
@@ -59,6 +61,162 @@ def upload_image_to_storage(image_bytes, filename=None, folder="images"):
             "error": f"Upload failed: {str(e)}"
         }
 
+# İçeriği adından türetilen nesneler hiç değişmez; CDN/tarayıcı süresiz önbelleğe alabilir
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _upload_if_absent(path, data, content_type):
+    """
+    Nesne yoksa yükleyip herkese açar; (blob, zaten_vardı) döndürür
+    """
+    blob = storage.bucket().blob(path)
+    if blob.exists():
+        return blob, True
+    blob.cache_control = IMMUTABLE_CACHE_CONTROL
+    try:
+        blob.upload_from_string(data, content_type=content_type, if_generation_match=0)
+    except PreconditionFailed:
+        # Eşzamanlı başka bir yükleme aynı içeriği yazdı
+        return blob, True
+    blob.make_public()
+    return blob, False
+
+def upload_derivative(data, path, content_type, overwrite=False):
+    """
+    Türetilmiş görseli (küçük boyut/WebP) yoksa yükler; overwrite=True ise üzerine yazar
+    """
+    try:
+        if not firebase_admin._apps:
+            return {"success": False, "error": "Firebase not initialized"}
+        if overwrite:
+            blob = storage.bucket().blob(path)
+            blob.upload_from_string(data, content_type=content_type)
+            blob.make_public()
+            return {"success": True, "url": blob.public_url, "path": path, "deduplicated": False}
+        blob, deduplicated = _upload_if_absent(path, data, content_type)
+        return {"success": True, "url": blob.public_url, "path": path, "deduplicated": deduplicated}
+    except Exception as e:
+        return {"success": False, "error": f"Upload failed: {str(e)}"}
+
+def download_from_storage(file_path):
+    """
+    Storage'daki nesnenin baytlarını indirir
+    """
+    try:
+        if not firebase_admin._apps:
+            return {"success": False, "error": "Firebase not initialized"}
+        data = storage.bucket().blob(file_path).download_as_bytes()
+        return {"success": True, "data": data}
+    except Exception as e:
+        return {"success": False, "error": f"Download failed: {str(e)}"}
+
+def open_storage_writer(file_path, content_type, chunk_size):
+    """
+    Resumable yükleme için yazılabilir akış açar; (blob, writer) döndürür
+
+    Writer en fazla chunk_size baytı bellekte tutar (256 KB'nin katı olmalı).
+    """
+    blob = storage.bucket().blob(file_path)
+    writer = blob.open("wb", chunk_size=chunk_size, content_type=content_type)
+    return blob, writer
+
+def promote_upload(temp_path, final_path):
+    """
+    Geçici yüklemeyi içerik-adresli yoluna sunucu tarafında kopyalar
+
+    Hedef zaten varsa kopyalanmaz ("deduplicated": True); geçici nesne her durumda silinir.
+    """
+    try:
+        if not firebase_admin._apps:
+            return {"success": False, "error": "Firebase not initialized"}
+        bucket = storage.bucket()
+        temp_blob = bucket.blob(temp_path)
+        final_blob = bucket.blob(final_path)
+        deduplicated = final_blob.exists()
+        if not deduplicated:
+            try:
+                final_blob = bucket.copy_blob(temp_blob, bucket, final_path, if_generation_match=0)
+                final_blob.cache_control = IMMUTABLE_CACHE_CONTROL
+                final_blob.patch()
+                final_blob.make_public()
+            except PreconditionFailed:
+                deduplicated = True
+        temp_blob.delete()
+        return {
+            "success": True,
+            "url": final_blob.public_url,
+            "path": final_path,
+            "deduplicated": deduplicated
+        }
+    except Exception as e:
+        return {"success": False, "error": f"Upload failed: {str(e)}"}
+
+def upload_image_content_addressed(image_bytes, user_id, folder="images", content_type="image/png"):
+    """
+    Görseli SHA-256 özetiyle adlandırıp yükler: <folder>/user_<uid>_<sha256>.png
+
+    Aynı baytlar zaten yüklüyse yeniden yüklenmez ("deduplicated": True).
+    Eşzamanlı iki yükleme yarışırsa if_generation_match=0 ile yalnızca ilki yazar.
+    """
+    try:
+        if not firebase_admin._apps:
+            return {"success": False, "error": "Firebase not initialized"}
+
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        filename = f"user_{user_id}_{sha256}.png"
+        path = f"{folder}/{filename}"
+        blob, deduplicated = _upload_if_absent(path, image_bytes, content_type)
+
+        return {
+            "success": True,
+            "url": blob.public_url,
+            "filename": filename,
+            "path": path,
+            "sha256": sha256,
+            "deduplicated": deduplicated
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Upload failed: {str(e)}"
+        }
+
+def storage_object_exists(file_path):
+    """
+    Storage'da nesnenin var olup olmadığını döndürür (Firebase yoksa False)
+    """
+    try:
+        if not firebase_admin._apps:
+            return False
+        return storage.bucket().blob(file_path).exists()
+    except Exception:
+        return False
+
+def public_url_if_exists(file_path):
+    """
+    Nesne Storage'da varsa public URL'ini, yoksa None döndürür
+    """
+    try:
+        if not firebase_admin._apps:
+            return None
+        blob = storage.bucket().blob(file_path)
+        return blob.public_url if blob.exists() else None
+    except Exception:
+        return None
+
+def signed_url(file_path, expiration_seconds=3600):
+    """
+    Süreli (V4) imzalı indirme URL'i üretir; Firebase yoksa None
+    """
+    try:
+        if not firebase_admin._apps:
+            return None
+        blob = storage.bucket().blob(file_path)
+        return blob.generate_signed_url(version="v4", expiration=timedelta(seconds=expiration_seconds), method="GET")
+    except Exception as e:
+        print(f"⚠️ Signed URL failed for {file_path}: {str(e)}")
+        return None
+
 def delete_image_from_storage(file_path):
     """
     Firebase Storage'dan görsel siler
@@ -76,6 +234,24 @@ def delete_image_from_storage(file_path):
     except Exception as e:
         return {"success": False, "error": f"Delete failed: {str(e)}"}
 
+def delete_images_from_storage(file_paths):
+    """
+    Birden fazla görseli tek seferde siler; zaten silinmiş dosyalar başarı sayılır
+    """
+    try:
+        if not firebase_admin._apps:
+            return {"success": False, "error": "Firebase not initialized"}
+        if not file_paths:
+            return {"success": True, "deleted_count": 0}
+
+        bucket = storage.bucket()
+        bucket.delete_blobs([bucket.blob(path) for path in file_paths], on_error=lambda blob: None)
+
+        return {"success": True, "deleted_count": len(file_paths)}
+
+    except Exception as e:
+        return {"success": False, "error": f"Delete failed: {str(e)}"}
+
 def list_user_images(user_id, folder="images"):
     """
     Kullanıcının yüklediği görselleri listeler
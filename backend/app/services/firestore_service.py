@@ -1,8 +1,20 @@
 import os
+import hashlib
 import firebase_admin
 from firebase_admin import credentials, firestore
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterator
+
+# Firestore get_all çağrısı başına okunacak en fazla doküman
+BATCH_GET_CHUNK_SIZE = 100
+# Firestore batch başına izin verilen en fazla yazma
+BATCH_WRITE_LIMIT = 500
+
+
+def content_hash(content: Optional[str]) -> str:
+    """Giriş metninin sha256 özeti; güncellemede içerik değişimini tespit etmek için saklanır"""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
 
 class FirestoreService:
     def __init__(self):
@@ -127,19 +139,26 @@ class FirestoreService:
             return {"success": False, "error": f"Failed to update user: {str(e)}"}
 
     # Diary CRUD operations
-    def create_diary_entry(self, user_id: str, entry_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Günlük girişi oluştur"""
+    def create_diary_entry(self, user_id: str, entry_data: Dict[str, Any], entry_id: Optional[str] = None) -> Dict[str, Any]:
+        """Günlük girişi oluştur
+
+        Zenginleştirme alanları (analysis, media) entry_data içinde verilirse tek bir
+        yazma ile kaydedilir. entry_id verilmezse Firestore yeni bir ID üretir.
+        """
         try:
             if not self.db:
                 return {"success": False, "error": "Firestore not initialized"}
             
             # Timestamp ekle
-            entry_data['created_at'] = datetime.now(timezone.utc)
-            entry_data['updated_at'] = datetime.now(timezone.utc)
+            now = datetime.now(timezone.utc)
+            entry_data['created_at'] = now
+            entry_data['updated_at'] = now
             entry_data['user_id'] = user_id
+            entry_data.setdefault('content_hash', content_hash(entry_data.get('content')))
             
             # Firestore'a ekle
-            doc_ref = self.db.collection('diary_entries').document()
+            collection = self.db.collection('diary_entries')
+            doc_ref = collection.document(entry_id) if entry_id else collection.document()
             doc_ref.set(entry_data)
             
             return {
@@ -151,6 +170,39 @@ class FirestoreService:
         except Exception as e:
             return {"success": False, "error": f"Failed to create diary entry: {str(e)}"}
     
+    def create_diary_entries_batch(self, user_id: str, entries: List[Dict[str, Any]],
+                                   entry_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Birden fazla günlük girişini batch yazmalarla oluştur
+
+        Girişler BATCH_WRITE_LIMIT'lik batch'ler halinde commit edilir. Kaynakta
+        created_at varsa korunur (içe aktarma senaryosu). entry_ids verilirse
+        yazma idempotent olur; aynı ID'lerle tekrar çağrı kopya oluşturmaz.
+        """
+        try:
+            if not self.db:
+                return {"success": False, "error": "Firestore not initialized"}
+
+            collection = self.db.collection('diary_entries')
+            now = datetime.now(timezone.utc)
+            created_ids: List[str] = []
+            for start in range(0, len(entries), BATCH_WRITE_LIMIT):
+                batch = self.db.batch()
+                for offset, entry_data in enumerate(entries[start:start + BATCH_WRITE_LIMIT]):
+                    entry_data = dict(entry_data)
+                    entry_data.setdefault('created_at', now)
+                    entry_data['updated_at'] = now
+                    entry_data['user_id'] = user_id
+                    entry_data.setdefault('content_hash', content_hash(entry_data.get('content')))
+                    doc_ref = collection.document(entry_ids[start + offset]) if entry_ids else collection.document()
+                    batch.set(doc_ref, entry_data)
+                    created_ids.append(doc_ref.id)
+                batch.commit()
+
+            return {"success": True, "entry_ids": created_ids, "count": len(created_ids)}
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to batch create diary entries: {str(e)}"}
+    
     def get_diary_entries(self, user_id: str, limit: int = 10) -> Dict[str, Any]:
         """Kullanıcının günlük girişlerini getir"""
         try:
@@ -180,6 +232,34 @@ class FirestoreService:
         except Exception as e:
             return {"success": False, "error": f"Failed to get diary entries: {str(e)}"}
     
+    def iter_diary_entries(self, user_id: Optional[str], page_size: int = 200,
+                           start_after_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Günlük girişlerini doküman ID sırasıyla cursor ile sayfa sayfa dolaşır
+
+        user_id None ise tüm koleksiyon dolaşılır (backfill gibi bakım işleri).
+        start_after_id verilirse o ID'den sonrası okunur; kaldığı yerden devam
+        etmek için kullanılır. Bellekte en fazla bir sayfa tutulur. Firestore
+        hazır değilse RuntimeError fırlatır.
+        """
+        if not self.db:
+            raise RuntimeError("Firestore not initialized")
+
+        collection = self.db.collection('diary_entries')
+        base_query = collection.where('user_id', '==', user_id) if user_id else collection
+        base_query = base_query.order_by('__name__').limit(page_size)
+
+        last_doc: Any = {'__name__': collection.document(start_after_id)} if start_after_id else None
+        while True:
+            query = base_query.start_after(last_doc) if last_doc is not None else base_query
+            page = list(query.stream())
+            for doc in page:
+                entry_data = doc.to_dict()
+                entry_data['id'] = doc.id
+                yield entry_data
+            if len(page) < page_size:
+                return
+            last_doc = page[-1]
+    
     def get_diary_entries_count(self, user_id: str) -> Dict[str, Any]:
         """Kullanıcının günlük giriş sayısını getir"""
         try:
@@ -220,6 +300,68 @@ class FirestoreService:
         except Exception as e:
             return {"success": False, "error": f"Failed to get diary entry: {str(e)}"}
     
+    def get_diary_entries_by_ids(self, entry_ids: List[str], user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Birden fazla günlük girişini tek seferde getir
+
+        ID'ler BATCH_GET_CHUNK_SIZE'lık parçalar halinde get_all ile eşzamanlı okunur.
+        user_id verilirse sahiplik kontrolü aynı geçişte yapılır; başka kullanıcıya ait
+        girişler sonuçtan çıkarılıp "forbidden" listesine eklenir. Sonuç sırası
+        istenen ID sırasını korur.
+        """
+        try:
+            if not self.db:
+                return {"success": False, "error": "Firestore not initialized"}
+
+            # Sırayı koruyarak tekrar eden ve boş ID'leri at
+            unique_ids = [i for i in dict.fromkeys(entry_ids or []) if i]
+            if not unique_ids:
+                return {"success": True, "entries": [], "missing": [], "forbidden": [], "count": 0}
+
+            collection = self.db.collection('diary_entries')
+            chunks = [
+                unique_ids[i:i + BATCH_GET_CHUNK_SIZE]
+                for i in range(0, len(unique_ids), BATCH_GET_CHUNK_SIZE)
+            ]
+
+            def _fetch(chunk: List[str]) -> List[Any]:
+                return list(self.db.get_all([collection.document(i) for i in chunk]))
+
+            found: Dict[str, Dict[str, Any]] = {}
+            if len(chunks) == 1:
+                snapshots = [_fetch(chunks[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=min(len(chunks), 8)) as pool:
+                    snapshots = list(pool.map(_fetch, chunks))
+            for chunk_docs in snapshots:
+                for doc in chunk_docs:
+                    if doc.exists:
+                        entry_data = doc.to_dict()
+                        entry_data['id'] = doc.id
+                        found[doc.id] = entry_data
+
+            entries: List[Dict[str, Any]] = []
+            missing: List[str] = []
+            forbidden: List[str] = []
+            for entry_id in unique_ids:
+                entry_data = found.get(entry_id)
+                if entry_data is None:
+                    missing.append(entry_id)
+                elif user_id is not None and entry_data.get('user_id') != user_id:
+                    forbidden.append(entry_id)
+                else:
+                    entries.append(entry_data)
+
+            return {
+                "success": True,
+                "entries": entries,
+                "missing": missing,
+                "forbidden": forbidden,
+                "count": len(entries)
+            }
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to get diary entries by ids: {str(e)}"}
+    
     def update_diary_entry(self, entry_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
         """Günlük girişini güncelle"""
         try:
@@ -257,6 +399,40 @@ class FirestoreService:
         except Exception as e:
             return {"success": False, "error": f"Failed to delete diary entry: {str(e)}"}
 
+    def delete_diary_entries_batch(self, entry_ids: List[str]) -> Dict[str, Any]:
+        """Birden fazla günlük girişini BATCH_WRITE_LIMIT'lik batch'lerle sil"""
+        try:
+            if not self.db:
+                return {"success": False, "error": "Firestore not initialized"}
+
+            collection = self.db.collection('diary_entries')
+            for start in range(0, len(entry_ids), BATCH_WRITE_LIMIT):
+                batch = self.db.batch()
+                for entry_id in entry_ids[start:start + BATCH_WRITE_LIMIT]:
+                    batch.delete(collection.document(entry_id))
+                batch.commit()
+
+            return {"success": True, "deleted_count": len(entry_ids)}
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to batch delete diary entries: {str(e)}"}
+
+    def storage_path_in_use(self, user_id: str, storage_path: str) -> bool:
+        """Kullanıcının başka bir girişi aynı Storage nesnesine bağlı mı (içerik-adresli görseller)
+
+        Emin olunamazsa (Firestore hatası) True döner; paylaşılan nesne silinmez.
+        """
+        try:
+            if not self.db:
+                return True
+            query = (self.db.collection('diary_entries')
+                     .where('user_id', '==', user_id)
+                     .where('media.storage_path', '==', storage_path)
+                     .limit(1))
+            return any(True for _ in query.select([]).stream())
+        except Exception:
+            return True
+
     def clear_all_diary_entries(self, user_id: str) -> Dict[str, Any]:
         """Kullanıcının tüm günlük girişlerini temizle"""
         try:
@@ -265,22 +441,68 @@ class FirestoreService:
             
             # Kullanıcının tüm günlük girişlerini getir
             entries_ref = self.db.collection('diary_entries').where('user_id', '==', user_id)
-            docs = list(entries_ref.stream())
+            entry_ids = [doc.id for doc in entries_ref.select([]).stream()]
             
-            deleted_count = 0
-            for doc in docs:
-                doc.reference.delete()
-                deleted_count += 1
+            result = self.delete_diary_entries_batch(entry_ids)
+            if not result["success"]:
+                return result
             
             return {
                 "success": True,
                 "message": f"All diary entries cleared successfully",
-                "deleted_count": deleted_count
+                "deleted_count": len(entry_ids)
             }
             
         except Exception as e:
             return {"success": False, "error": f"Failed to clear diary entries: {str(e)}"}
 
+    # Bulk import job operations
+    def create_import_job(self, user_id: str, job_data: Dict[str, Any]) -> Dict[str, Any]:
+        """İçe aktarma ilerleme dokümanı oluştur"""
+        try:
+            if not self.db:
+                return {"success": False, "error": "Firestore not initialized"}
+            now = datetime.now(timezone.utc)
+            job_data = dict(job_data)
+            job_data['user_id'] = user_id
+            job_data['created_at'] = now
+            job_data['updated_at'] = now
+            doc_ref = self.db.collection('diary_imports').document()
+            doc_ref.set(job_data)
+            return {"success": True, "import_id": doc_ref.id}
+        except Exception as e:
+            return {"success": False, "error": f"Failed to create import job: {str(e)}"}
+
+    def update_import_job(self, import_id: str, update_data: Dict[str, Any],
+                          increments: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """İçe aktarma ilerlemesini güncelle; sayaçlar atomik olarak artırılır"""
+        try:
+            if not self.db:
+                return {"success": False, "error": "Firestore not initialized"}
+            update_data = dict(update_data or {})
+            for field, amount in (increments or {}).items():
+                if amount:
+                    update_data[field] = firestore.Increment(amount)
+            update_data['updated_at'] = datetime.now(timezone.utc)
+            self.db.collection('diary_imports').document(import_id).update(update_data)
+            return {"success": True}
+        except Exception as e:
+            return {"success": False, "error": f"Failed to update import job: {str(e)}"}
+
+    def get_import_job(self, import_id: str) -> Dict[str, Any]:
+        """İçe aktarma ilerleme dokümanını getir"""
+        try:
+            if not self.db:
+                return {"success": False, "error": "Firestore not initialized"}
+            doc = self.db.collection('diary_imports').document(import_id).get()
+            if not doc.exists:
+                return {"success": False, "error": "Import job not found"}
+            data = doc.to_dict()
+            data['id'] = doc.id
+            return {"success": True, "job": data}
+        except Exception as e:
+            return {"success": False, "error": f"Failed to get import job: {str(e)}"}
+
     def seed_demo_entries_for_user(self, user_id: str) -> Dict[str, Any]:
         """Yeni kullanıcı için demo günlük girdileri oluşturur"""
         try:
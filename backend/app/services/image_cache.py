@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..utils.database import get_local_db
+
+IMAGE_CACHE_ENABLED = os.getenv("APP_IMAGE_CACHE", "true").lower() not in ("0", "false", "no")
+IMAGE_CACHE_TTL = float(os.getenv("APP_IMAGE_CACHE_TTL", str(90 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_cache (
+    key TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    size TEXT NOT NULL,
+    storage_path TEXT NOT NULL,
+    url TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_image_cache_user ON image_cache (user_id);
+"""
+
+
+def prompt_hash(prompt: str) -> str:
+    # Boşluk farkları aynı istem sayılır
+    return hashlib.sha256(" ".join((prompt or "").split()).encode("utf-8")).hexdigest()
+
+
+def image_cache_key(user_id: str, provider: str, model: str, prompt: str, width: int, height: int) -> str:
+    raw = "\x1f".join([user_id, provider, model or "", prompt_hash(prompt), f"{width}x{height}"])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """(sağlayıcı, model, istem özeti, boyut) -> Storage nesnesi eşlemesi
+
+    Aynı istem için görsel yeniden üretilmez; kayıt, kullanıcının
+    içerik-adresli Storage nesnesine (generated_images/user_{uid}_{sha256}.png)
+    işaret eder. Kayıtlar kullanıcı başınadır: Storage yolu kullanıcıya aittir ve
+    kullanıcılar arası görsel paylaşımı istenmez. Nesnenin hâlâ var olduğunu
+    doğrulamak çağıranın işidir; silinmişse invalidate() ile kayıt düşürülür.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = IMAGE_CACHE_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "stale": 0}
+        get_local_db(self.db_path).executescript(_SCHEMA)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        db = get_local_db(self.db_path)
+        row = db.execute(
+            "SELECT * FROM image_cache WHERE key = ? AND created_at >= ?", (key, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        db.execute("UPDATE image_cache SET hits = hits + 1 WHERE key = ?", (key,))
+        self._count("hits")
+        return dict(row)
+
+    def put(self, key: str, user_id: str, provider: str, model: str, prompt: str, width: int, height: int,
+            storage_path: str, url: str, sha256: str) -> None:
+        get_local_db(self.db_path).execute(
+            "INSERT OR REPLACE INTO image_cache (key, user_id, provider, model, prompt_hash, size, storage_path, "
+            "url, sha256, created_at, hits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, user_id, provider, model or "", prompt_hash(prompt), f"{width}x{height}",
+             storage_path, url, sha256, time.time()),
+        )
+        self._count("stores")
+
+    def invalidate(self, key: str) -> None:
+        """Storage nesnesi artık yoksa kaydı düşürür (ör. giriş silinmiş)"""
+        get_local_db(self.db_path).execute("DELETE FROM image_cache WHERE key = ?", (key,))
+        self._count("stale")
+
+    def invalidate_paths(self, storage_paths) -> int:
+        """Silinen Storage nesnelerine işaret eden kayıtları düşürür"""
+        paths = list(storage_paths or [])
+        if not paths:
+            return 0
+        placeholders = ",".join("?" for _ in paths)
+        cur = get_local_db(self.db_path).execute(
+            f"DELETE FROM image_cache WHERE storage_path IN ({placeholders})", paths
+        )
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["entries"] = get_local_db(self.db_path).execute("SELECT COUNT(*) FROM image_cache").fetchone()[0]
+        stats["enabled"] = IMAGE_CACHE_ENABLED
+        return stats
+
+
+# Global instance
+image_cache = ImageCache()
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .firebase import download_from_storage, public_url_if_exists, upload_derivative
+from .firestore_service import firestore_service
+from .job_queue import job_queue
+from ..utils.image_renditions import available_formats, render_renditions
+
+# Liste/harita küçük görselleri ve mobil detay görünümü için standart genişlikler
+DERIVATIVE_WIDTHS = [int(w) for w in os.getenv("APP_IMAGE_DERIVATIVE_WIDTHS", "160,320,640").split(",") if w.strip()]
+# Galeri kartları (~1/3 genişlik) ve liste görünümü bu genişlikteki türevi kullanır
+THUMBNAIL_WIDTH = int(os.getenv("APP_IMAGE_THUMBNAIL_WIDTH", "320"))
+DERIVATIVE_PROCESSES = int(os.getenv("APP_IMAGE_DERIVATIVE_PROCESSES", "2"))
+# Türevler orijinalin yanında, galeri listesine (generated_images/user_*) karışmayan alt klasörde tutulur
+DERIVATIVES_FOLDER = "generated_images/derivatives"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: worker thread'leri olan süreçten fork etmek kilitleri kopyalayıp takılabilir
+            _pool = ProcessPoolExecutor(max_workers=DERIVATIVE_PROCESSES,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_derivative_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def derivative_path(user_id: str, sha256: str, width: int, fmt: str) -> str:
+    """Türev yolu orijinalin özetinden türetilir; aynı görselin türevleri bir kez üretilir"""
+    return f"{DERIVATIVES_FOLDER}/user_{user_id}_{sha256}_w{width}.{fmt}"
+
+
+def manifest_path(user_id: str, sha256: str) -> str:
+    """Üretilen türevlerin listesi; tüm türevler yüklendikten sonra en son yazılır"""
+    return f"{DERIVATIVES_FOLDER}/user_{user_id}_{sha256}.json"
+
+
+def thumbnail_url(derivatives: List[Dict[str, Any]], min_width: int = THUMBNAIL_WIDTH) -> Optional[str]:
+    """Liste ve harita görünümleri için min_width'e yetecek en küçük WebP türevinin URL'i"""
+    webp = sorted((d for d in derivatives if d.get("format") == "webp"), key=lambda d: d["width"])
+    if not webp:
+        return None
+    return next((d for d in webp if d["width"] >= min_width), webp[-1])["url"]
+
+
+class ImageDerivativeService:
+    """Üretilen görseller için WebP/AVIF küçük boyutlu türevler üretir
+
+    Görsel girişe eklendiğinde "image_derivatives" işi kuyruğa alınır. İş
+    orijinali Storage'dan indirir, Pillow ile DERIVATIVE_WIDTHS genişliklerinde
+    WebP (ve Pillow destekliyorsa AVIF) olarak süreç havuzunda kodlar, türevleri
+    orijinalin yanına yükler ve girişin media.derivatives / media.thumbnail_url
+    alanlarına yazar. Hangi genişliklerin üretildiği orijinalin boyutuna bağlı
+    olduğundan türev listesi bir manifest olarak saklanır; manifest varsa ve
+    istenen formatları kapsıyorsa (aynı görsel başka girişte) yeniden
+    kodlanmaz, yalnızca metadata yazılır.
+    """
+
+    JOB_KIND = "image_derivatives"
+
+    def enqueue(self, entry_id: str, user_id: str, storage_path: str, sha256: Optional[str] = None) -> str:
+        payload = {"entry_id": entry_id, "user_id": user_id, "storage_path": storage_path, "sha256": sha256}
+        return job_queue.enqueue(self.JOB_KIND, payload, dedupe_key=f"{self.JOB_KIND}:{entry_id}:{storage_path}")
+
+    @staticmethod
+    def _existing(user_id: str, sha256: str, formats: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """Manifest varsa ve istenen formatların hepsini içeriyorsa türev kayıtlarını döndürür"""
+        if not public_url_if_exists(manifest_path(user_id, sha256)):
+            return None
+        manifest = download_from_storage(manifest_path(user_id, sha256))
+        if not manifest["success"]:
+            return None
+        try:
+            derivatives = json.loads(manifest["data"])
+        except ValueError:
+            return None
+        if not derivatives or not set(formats) <= {d.get("format") for d in derivatives}:
+            return None
+        return derivatives
+
+    async def handle_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        entry_id = payload["entry_id"]
+        user_id = payload["user_id"]
+        result = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+        if not result["success"]:
+            return {"skipped": result.get("error")}
+        media = result["entry"].get("media") or {}
+        if media.get("storage_path") != payload["storage_path"]:
+            # Görsel değişmiş/silinmiş; güncel görsel için ayrı iş var
+            return {"skipped": "stale image"}
+
+        formats = available_formats()
+        sha256 = payload.get("sha256")
+        derivatives = None
+        if sha256:
+            derivatives = await asyncio.to_thread(self._existing, user_id, sha256, formats)
+
+        if derivatives is None:
+            download = await asyncio.to_thread(download_from_storage, payload["storage_path"])
+            if not download["success"]:
+                raise RuntimeError(download["error"])
+            original = download["data"]
+            sha256 = sha256 or hashlib.sha256(original).hexdigest()
+            loop = asyncio.get_running_loop()
+            renditions = await loop.run_in_executor(
+                _process_pool(), render_renditions, original, DERIVATIVE_WIDTHS, formats
+            )
+            derivatives = []
+            for rendition in renditions:
+                path = derivative_path(user_id, sha256, rendition["width"], rendition["format"])
+                upload = await asyncio.to_thread(upload_derivative, rendition["data"], path, rendition["content_type"])
+                if not upload["success"]:
+                    raise RuntimeError(upload["error"])
+                derivatives.append({
+                    "path": path,
+                    "url": upload["url"],
+                    "format": rendition["format"],
+                    "width": rendition["width"],
+                    "height": rendition["height"],
+                    "bytes": len(rendition["data"]),
+                })
+            manifest = json.dumps(derivatives).encode("utf-8")
+            # Format listesi genişlemiş olabilir (ör. AVIF desteği); eski manifest ezilir
+            upload = await asyncio.to_thread(
+                upload_derivative, manifest, manifest_path(user_id, sha256), "application/json", True
+            )
+            if not upload["success"]:
+                raise RuntimeError(upload["error"])
+
+        await asyncio.to_thread(firestore_service.update_diary_entry, entry_id, {
+            "media.derivatives": derivatives,
+            "media.thumbnail_url": thumbnail_url(derivatives),
+        })
+        return {"derivatives": len(derivatives), "formats": formats}
+
+
+# Global instance
+image_derivative_service = ImageDerivativeService()
+job_queue.register(
+    ImageDerivativeService.JOB_KIND,
+    image_derivative_service.handle_job,
+    concurrency=DERIVATIVE_PROCESSES,
+)
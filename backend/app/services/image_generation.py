@@ -0,0 +1,218 @@
+import asyncio
+import base64
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import requests
+
+from .firebase import delete_image_from_storage, storage_object_exists, upload_image_content_addressed
+from .firestore_service import firestore_service
+from .image_cache import IMAGE_CACHE_ENABLED, image_cache, image_cache_key
+from .image_derivatives import image_derivative_service
+from .image_index import image_index
+from .job_queue import job_queue
+from .providers.image_race import IMAGE_PROVIDERS, race_providers
+from .providers.registry import provider_registry
+
+# Üretilen görsellerin Storage klasörü (list_user_images ile aynı)
+GENERATED_IMAGES_FOLDER = "generated_images"
+# Sağlayıcı URL döndürdüğünde görselin indirilmesi için süre sınırı
+IMAGE_DOWNLOAD_TIMEOUT = 60
+IMAGE_WIDTH = 768
+IMAGE_HEIGHT = 512
+
+
+def _image_bytes(data: Dict[str, Any]) -> bytes:
+    """Sağlayıcı sonucundan (base64 veya URL) PNG baytlarını çıkarır"""
+    if data.get("image_base64"):
+        return base64.b64decode(data["image_base64"])
+    url = data.get("image_url") or data.get("url")
+    if not url:
+        raise RuntimeError("Provider returned no image data")
+    resp = requests.get(url, timeout=IMAGE_DOWNLOAD_TIMEOUT)
+    resp.raise_for_status()
+    return resp.content
+
+
+def _model_of(provider: Any) -> str:
+    """Önbellek anahtarı için sağlayıcının model/motor adı"""
+    return getattr(provider, "model", None) or getattr(provider, "model_name", None) or getattr(provider, "engine", "")
+
+
+class ImageGenerationService:
+    """Günlük görsellerini kalıcı kuyrukta üretir, Storage'a yükler ve girişe ekler
+
+    İstek thread'leri görsel üretimini hiç beklemez: zenginleştirme yalnızca
+    "image_generation" işini kuyruğa alır. İş, anahtarı tanımlı sağlayıcıları
+    maliyet politikasıyla yarıştırır (providers.image_race), kazanan görseli
+    Storage'a yükler ve girişin "media" alanına yazar. Sağlayıcı URL'leri geçici
+    olduğundan girişte her zaman Storage URL'i ve storage_path tutulur.
+
+    Aynı kullanıcı aynı istemi aynı boyutta daha önce ürettiyse (image_cache)
+    sağlayıcı çağrılmaz; yüklemeler SHA-256 ile adlandırıldığından aynı baytlar
+    ikinci kez yüklenmez. İkisi de yalnızca metadata işlemine dönüşür.
+    """
+
+    JOB_KIND = "image_generation"
+
+    def enqueue(self, entry_id: str, user_id: str, prompt: str, content_digest: Optional[str] = None) -> str:
+        payload = {"entry_id": entry_id, "user_id": user_id, "prompt": prompt}
+        if content_digest:
+            payload["content_hash"] = content_digest
+        return job_queue.enqueue(self.JOB_KIND, payload, dedupe_key=f"{self.JOB_KIND}:{entry_id}")
+
+    @staticmethod
+    def providers() -> Dict[str, Any]:
+        """Yapılandırılmış görsel sağlayıcıları (tercih sırasıyla); anahtarı olmayanlar atlanır"""
+        providers: Dict[str, Any] = {}
+        for name in IMAGE_PROVIDERS:
+            try:
+                providers[name] = provider_registry.image_provider(name)
+            except Exception as e:
+                print(f"⚠️ Image provider {name} unavailable: {str(e)}")
+        return providers
+
+    @staticmethod
+    def cached_image(user_id: str, prompt: str, models: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Sağlayıcılardan biri bu istemi aynı boyutta daha önce üretmişse kaydı döndürür"""
+        if not IMAGE_CACHE_ENABLED:
+            return None
+        for name, model in models.items():
+            key = image_cache_key(user_id, name, model, prompt, IMAGE_WIDTH, IMAGE_HEIGHT)
+            cached = image_cache.get(key)
+            if not cached:
+                continue
+            if storage_object_exists(cached["storage_path"]):
+                return cached
+            image_cache.invalidate(key)
+        return None
+
+    @staticmethod
+    async def _attach(entry_id: str, update: Dict[str, Any]) -> bool:
+        """Görseli girişe yazar; giriş iş sürerken silinmişse False döner"""
+        result = await asyncio.to_thread(firestore_service.update_diary_entry, entry_id, update)
+        if result.get("success"):
+            return True
+        current = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+        if current.get("success"):
+            # Giriş duruyor, yazma geçici olarak başarısız; iş yeniden denenir
+            raise RuntimeError(result.get("error"))
+        return False
+
+    @staticmethod
+    def _discard_orphan(user_id: str, upload: Dict[str, Any]) -> None:
+        """Silinmiş giriş için yüklenen nesneyi başka giriş kullanmıyorsa kaldırır"""
+        if upload.get("deduplicated") or firestore_service.storage_path_in_use(user_id, upload["path"]):
+            # Nesne bu işten önce de vardı veya paylaşılıyor
+            return
+        delete_image_from_storage(upload["path"])
+        image_cache.invalidate_paths([upload["path"]])
+
+    async def handle_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        entry_id = payload["entry_id"]
+        user_id = payload["user_id"]
+        prompt = payload["prompt"]
+        result = await asyncio.to_thread(firestore_service.get_diary_entry, entry_id)
+        if not result["success"]:
+            return {"skipped": result.get("error")}
+        entry = result["entry"]
+        expected_hash = payload.get("content_hash")
+        if expected_hash and entry.get("content_hash") != expected_hash:
+            return {"skipped": "stale content"}
+        if (entry.get("media") or {}).get("storage_path"):
+            return {"skipped": "already generated"}
+
+        providers = self.providers()
+        if not providers:
+            raise RuntimeError("No image provider configured")
+        models = {name: _model_of(provider) for name, provider in providers.items()}
+
+        # Aynı istem daha önce üretildiyse görsel yalnızca girişe bağlanır
+        cached = await asyncio.to_thread(self.cached_image, user_id, prompt, models)
+        if cached:
+            media = {
+                "image_url": cached["url"],
+                "storage_path": cached["storage_path"],
+                "prompt": prompt,
+                "image_provider": cached["provider"],
+                "sha256": cached["sha256"],
+                "cost_usd": 0.0,
+                "cached": True,
+                "generated_at": datetime.now(timezone.utc),
+            }
+            if not await self._attach(entry_id, {"media": media, "image_status": "completed"}):
+                return {"skipped": "entry deleted"}
+            image_derivative_service.enqueue(entry_id, user_id, cached["storage_path"], cached["sha256"])
+            await asyncio.to_thread(
+                image_index.record, user_id, cached["storage_path"], url=cached["url"], source="generated",
+                entry_id=entry_id
+            )
+            return {"provider": cached["provider"], "path": cached["storage_path"], "cached": True}
+
+        await asyncio.to_thread(firestore_service.update_diary_entry, entry_id, {"image_status": "generating"})
+        generators = {
+            name: (lambda p, provider=provider: provider.generate(p, width=IMAGE_WIDTH, height=IMAGE_HEIGHT))
+            for name, provider in providers.items()
+        }
+        winner = await race_providers(prompt, generators)
+
+        image_bytes = await asyncio.to_thread(_image_bytes, winner["data"])
+        upload = await asyncio.to_thread(upload_image_content_addressed, image_bytes, user_id, GENERATED_IMAGES_FOLDER)
+        if not upload.get("success"):
+            raise RuntimeError(upload.get("error"))
+
+        attached = await self._attach(entry_id, {
+            "media": {
+                "image_url": upload["url"],
+                "storage_path": upload["path"],
+                "prompt": prompt,
+                "image_provider": winner["provider"],
+                "sha256": upload["sha256"],
+                "cost_usd": winner["cost_usd"],
+                "race": winner["attempts"],
+                "generated_at": datetime.now(timezone.utc),
+            },
+            "image_status": "completed",
+        })
+        if not attached:
+            # Giriş silinmiş; galeri kaydı ve sahipsiz nesne bırakılmaz
+            await asyncio.to_thread(self._discard_orphan, user_id, upload)
+            return {"skipped": "entry deleted", "provider": winner["provider"], "cost_usd": winner["cost_usd"]}
+        if IMAGE_CACHE_ENABLED:
+            await asyncio.to_thread(
+                image_cache.put,
+                image_cache_key(user_id, winner["provider"], models[winner["provider"]], prompt, IMAGE_WIDTH, IMAGE_HEIGHT),
+                user_id, winner["provider"], models[winner["provider"]], prompt, IMAGE_WIDTH, IMAGE_HEIGHT,
+                upload["path"], upload["url"], upload["sha256"],
+            )
+        # Liste/harita görünümleri için küçük WebP/AVIF türevleri ayrı işte üretilir
+        image_derivative_service.enqueue(entry_id, user_id, upload["path"], upload["sha256"])
+        await asyncio.to_thread(
+            image_index.record, user_id, upload["path"], url=upload["url"], size=len(image_bytes),
+            source="generated", entry_id=entry_id
+        )
+        return {
+            "provider": winner["provider"],
+            "path": upload["path"],
+            "cost_usd": winner["cost_usd"],
+            "deduplicated": upload["deduplicated"],
+        }
+
+    def handle_dead(self, payload: Dict[str, Any], error: str) -> None:
+        firestore_service.update_diary_entry(payload["entry_id"], {
+            "image_status": "failed",
+            "image_error": error,
+        })
+
+
+# Global instance
+image_generation_service = ImageGenerationService()
+job_queue.register(
+    ImageGenerationService.JOB_KIND,
+    image_generation_service.handle_job,
+    concurrency=int(os.getenv("APP_IMAGE_CONCURRENCY", "2")),
+    # Her deneme sağlayıcı yarışını baştan başlatır (maliyet); daha az deneme yeterli
+    max_attempts=3,
+    on_dead=image_generation_service.handle_dead,
+)
@@ -0,0 +1,292 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.database import get_local_db
+
+# firestore: tüm instance'lar aynı indeksi görür; sqlite: tek makinelik kurulumlar
+IMAGE_INDEX_BACKEND = os.getenv("APP_IMAGE_INDEX_BACKEND", "firestore").lower()
+IMAGE_LIST_MAX_LIMIT = 100
+# public: kalıcı public URL kayıtta tutulur; signed: süreli imzalı URL üretilip önbelleğe alınır
+IMAGE_URL_MODE = os.getenv("APP_IMAGE_URL_MODE", "public").lower()
+SIGNED_URL_TTL = int(os.getenv("APP_SIGNED_URL_TTL", "3600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_index (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    url TEXT,
+    filename TEXT,
+    size INTEGER,
+    content_type TEXT,
+    source TEXT,
+    entry_id TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_image_index_user_created ON image_index (user_id, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS image_index_seeded (
+    user_id TEXT PRIMARY KEY,
+    seeded_at REAL NOT NULL
+);
+"""
+
+
+def image_record_id(path: str) -> str:
+    """Kayıt ID'si Storage yolundan türetilir; aynı nesne iki kez indekslenmez"""
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:40]
+
+
+def encode_cursor(created_at: float, record_id: str) -> str:
+    raw = json.dumps({"t": created_at, "id": record_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(data["t"]), str(data["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class SQLiteImageIndexBackend:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        get_local_db(self.db_path).executescript(_SCHEMA)
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        get_local_db(self.db_path).execute(
+            "INSERT INTO image_index (id, user_id, path, url, filename, size, content_type, source, entry_id, "
+            "created_at) VALUES (:id, :user_id, :path, :url, :filename, :size, :content_type, :source, :entry_id, "
+            ":created_at) ON CONFLICT(id) DO UPDATE SET url = excluded.url, "
+            "entry_id = COALESCE(excluded.entry_id, image_index.entry_id)",
+            record,
+        )
+
+    def remove(self, record_ids: List[str]) -> None:
+        placeholders = ",".join("?" for _ in record_ids)
+        get_local_db(self.db_path).execute(f"DELETE FROM image_index WHERE id IN ({placeholders})", record_ids)
+
+    def page(self, user_id: str, limit: int, after: Optional[Tuple[float, str]]) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM image_index WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if after:
+            sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            params += [after[0], after[0], after[1]]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in get_local_db(self.db_path).execute(sql, params).fetchall()]
+
+    def is_seeded(self, user_id: str) -> bool:
+        row = get_local_db(self.db_path).execute(
+            "SELECT 1 FROM image_index_seeded WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row is not None
+
+    def mark_seeded(self, user_id: str) -> None:
+        get_local_db(self.db_path).execute(
+            "INSERT OR REPLACE INTO image_index_seeded (user_id, seeded_at) VALUES (?, ?)", (user_id, time.time())
+        )
+
+
+class FirestoreImageIndexBackend:
+    """user_images koleksiyonu; (user_id, created_at desc) bileşik indeksi gerekir"""
+
+    COLLECTION = "user_images"
+    # Eski nesneleri taranmış kullanıcılar (doc ID = user_id)
+    SEEDED_COLLECTION = "user_images_seeded"
+
+    def __init__(self):
+        from .firestore_service import BATCH_WRITE_LIMIT, firestore_service
+        if not firestore_service.db:
+            raise RuntimeError("Firestore not initialized")
+        self.db = firestore_service.db
+        self.batch_limit = BATCH_WRITE_LIMIT
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        data = dict(record)
+        if data.get("entry_id") is None:
+            # Önbellekten gelen ikinci kayıt ilk girişin bağını silmesin
+            data.pop("entry_id")
+        data["created_at_ts"] = data.pop("created_at")
+        doc = self.db.collection(self.COLLECTION).document(record["id"])
+        # Aynı nesne yeniden yüklenirse sıralamadaki yeri (ilk yükleme zamanı) korunur
+        if doc.get(["created_at_ts"]).exists:
+            data = {k: v for k, v in data.items() if k in ("url", "entry_id")}
+        doc.set(data, merge=True)
+
+    def remove(self, record_ids: List[str]) -> None:
+        collection = self.db.collection(self.COLLECTION)
+        for start in range(0, len(record_ids), self.batch_limit):
+            batch = self.db.batch()
+            for record_id in record_ids[start:start + self.batch_limit]:
+                batch.delete(collection.document(record_id))
+            batch.commit()
+
+    def page(self, user_id: str, limit: int, after: Optional[Tuple[float, str]]) -> List[Dict[str, Any]]:
+        from firebase_admin import firestore
+
+        collection = self.db.collection(self.COLLECTION)
+        query = (collection.where("user_id", "==", user_id)
+                 .order_by("created_at_ts", direction=firestore.Query.DESCENDING)
+                 .order_by("__name__", direction=firestore.Query.DESCENDING))
+        if after:
+            query = query.start_after({"created_at_ts": after[0], "__name__": collection.document(after[1])})
+        records = []
+        for doc in query.limit(limit).stream():
+            data = doc.to_dict()
+            data["id"] = doc.id
+            data["created_at"] = data.pop("created_at_ts", 0.0)
+            records.append(data)
+        return records
+
+    def is_seeded(self, user_id: str) -> bool:
+        return self.db.collection(self.SEEDED_COLLECTION).document(user_id).get().exists
+
+    def mark_seeded(self, user_id: str) -> None:
+        self.db.collection(self.SEEDED_COLLECTION).document(user_id).set({"seeded_at": time.time()})
+
+
+class ImageIndex:
+    """Kullanıcı görsellerinin yükleme/silme anında tutulan indeksi
+
+    Listeleme Storage'da önek taraması yapmaz: her sayfa (created_at, id)
+    üzerinde tek bir indeksli sorgudur ve cursor ile devam eder. Kayıtta public
+    URL saklanır; imzalı URL modunda URL'ler süreleri dolana kadar bellekte
+    önbelleğe alınır. İndeks öncesi yüklenmiş nesneler kullanıcının ilk
+    listelemesinde bir kez taranıp indekse eklenir; tarandığı kalıcı bir
+    işaretle tutulur (indeksin boş olup olmamasına bakılmaz, deploy sonrası
+    yeni görsel eklemiş kullanıcıların eski görselleri de taranır).
+    """
+
+    def __init__(self, backend: Any = None, url_mode: str = IMAGE_URL_MODE):
+        self._backend = backend
+        self.url_mode = url_mode
+        self._lock = threading.Lock()
+        self._signed_urls: Dict[str, Tuple[str, float]] = {}
+        self._seeded: set = set()
+
+    @property
+    def backend(self) -> Any:
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = (SQLiteImageIndexBackend() if IMAGE_INDEX_BACKEND == "sqlite"
+                                     else FirestoreImageIndexBackend())
+        return self._backend
+
+    def record(self, user_id: str, path: str, url: Optional[str] = None, size: Optional[int] = None,
+               content_type: str = "image/png", source: str = "upload", entry_id: Optional[str] = None,
+               created_at: Optional[float] = None) -> bool:
+        try:
+            self.backend.upsert({
+                "id": image_record_id(path),
+                "user_id": user_id,
+                "path": path,
+                "url": url,
+                "filename": path.rsplit("/", 1)[-1],
+                "size": size,
+                "content_type": content_type,
+                "source": source,
+                "entry_id": entry_id,
+                "created_at": created_at if created_at is not None else time.time(),
+            })
+            return True
+        except Exception as e:
+            print(f"⚠️ Image index write failed for {path}: {str(e)}")
+            return False
+
+    def remove(self, paths: Iterable[str]) -> None:
+        paths = list(paths or [])
+        record_ids = [image_record_id(path) for path in paths]
+        if not record_ids:
+            return
+        try:
+            self.backend.remove(record_ids)
+        except Exception as e:
+            print(f"⚠️ Image index delete failed: {str(e)}")
+        with self._lock:
+            for path in paths:
+                self._signed_urls.pop(path, None)
+
+    def _url(self, record: Dict[str, Any]) -> Optional[str]:
+        if self.url_mode != "signed":
+            return record.get("url")
+        now = time.time()
+        with self._lock:
+            cached = self._signed_urls.get(record["path"])
+        if cached and cached[1] > now:
+            return cached[0]
+        from .firebase import signed_url
+        url = signed_url(record["path"], SIGNED_URL_TTL)
+        if url:
+            with self._lock:
+                # Süresinin son %20'sinde yenilenir; istemciye dolmak üzere URL verilmez
+                self._signed_urls[record["path"]] = (url, now + SIGNED_URL_TTL * 0.8)
+        return url
+
+    def list(self, user_id: str, limit: int = 24, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Tek indeksli sorguyla bir sayfa; next_cursor None ise son sayfa"""
+        limit = max(1, min(int(limit), IMAGE_LIST_MAX_LIMIT))
+        after = decode_cursor(cursor) if cursor else None
+        if after is None and user_id not in self._seeded:
+            self.ensure_seeded(user_id)
+        records = self.backend.page(user_id, limit + 1, after)
+        has_more = len(records) > limit
+        records = records[:limit]
+        images = [{
+            "filename": r.get("filename"),
+            "url": self._url(r),
+            "path": r["path"],
+            "created": datetime.fromtimestamp(r["created_at"], timezone.utc).isoformat(),
+            "size": r.get("size"),
+            "content_type": r.get("content_type"),
+            "entry_id": r.get("entry_id"),
+        } for r in records]
+        next_cursor = encode_cursor(records[-1]["created_at"], records[-1]["id"]) if has_more else None
+        return {"success": True, "images": images, "next_cursor": next_cursor}
+
+    def ensure_seeded(self, user_id: str) -> None:
+        """Kullanıcının eski nesneleri henüz taranmadıysa tarar ve kalıcı olarak işaretler"""
+        try:
+            if not self.backend.is_seeded(user_id):
+                if self.seed_from_storage(user_id) is None:
+                    # Tarama tamamlanmadı; sonraki listelemede yeniden denenir
+                    return
+                self.backend.mark_seeded(user_id)
+        except Exception as e:
+            print(f"⚠️ Image index seed failed for {user_id}: {str(e)}")
+            return
+        with self._lock:
+            self._seeded.add(user_id)
+
+    @staticmethod
+    def _legacy_images(user_id: str) -> Dict[str, Any]:
+        from .firebase import list_user_images
+
+        return list_user_images(user_id, "generated_images")
+
+    def seed_from_storage(self, user_id: str) -> Optional[int]:
+        """İndeks öncesi yüklenmiş görselleri indekse ekler; tarama başarısızsa None"""
+        legacy = self._legacy_images(user_id)
+        if not legacy.get("success"):
+            return None
+        written = 0
+        for image in legacy["images"]:
+            created = image.get("created")
+            written += self.record(
+                user_id, image["path"], url=image.get("url"), size=image.get("size"), source="legacy",
+                created_at=datetime.fromisoformat(created).timestamp() if created else None,
+            )
+        return written if written == len(legacy["images"]) else None
+
+
+# Global instance
+image_index = ImageIndex()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+import firebase_admin
+
+from .firebase import delete_image_from_storage, open_storage_writer, promote_upload
+from ..utils.upload_guard import UploadGuard
+
+# Tek görsel yüklemesi için üst sınır
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("APP_MAX_IMAGE_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Resumable yükleme parça boyutu (GCS gereği 256 KB'nin katı); yükleme başına bellek bununla sınırlı
+UPLOAD_CHUNK_SIZE = int(os.getenv("APP_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Akış önce bu klasöre yazılır, özet belli olunca içerik-adresli yola taşınır
+UPLOAD_STAGING_FOLDER = "uploads/staging"
+
+
+async def stream_image_upload(chunks: AsyncIterator[bytes], user_id: str, folder: str = "generated_images",
+                              declared_length: Optional[int] = None) -> Dict[str, Any]:
+    """İstek gövdesini parça parça Storage'a aktarır; base64 ve tam tampon yoktur
+
+    Tür ilk baytlardan (imza) belirlenir, boyut akarken sayılır; ihlalde
+    UploadRejected fırlatılır ve yarım kalan geçici nesne silinir. Akış
+    tamamlanınca içerik SHA-256 ile <folder>/user_<uid>_<sha256>.<ext> yoluna
+    sunucu tarafında kopyalanır; aynı görsel zaten varsa kopyalanmaz.
+    """
+    if not firebase_admin._apps:
+        return {"success": False, "error": "Firebase not initialized"}
+
+    guard = UploadGuard(MAX_IMAGE_UPLOAD_BYTES, declared_length)
+    temp_path = f"{UPLOAD_STAGING_FOLDER}/user_{user_id}_{uuid.uuid4().hex}"
+    writer = None
+    try:
+        async for chunk in chunks:
+            data = guard.feed(chunk)
+            if not data:
+                continue
+            if writer is None:
+                _, writer = await asyncio.to_thread(open_storage_writer, temp_path, guard.content_type, UPLOAD_CHUNK_SIZE)
+            await asyncio.to_thread(writer.write, data)
+        data = guard.finish()
+        if writer is None:
+            _, writer = await asyncio.to_thread(open_storage_writer, temp_path, guard.content_type, UPLOAD_CHUNK_SIZE)
+        if data:
+            await asyncio.to_thread(writer.write, data)
+        await asyncio.to_thread(writer.close)
+        writer = None
+    except BaseException:
+        if writer is not None:
+            # Kapatmak yüklemeyi tamamlar; geçici nesne hemen ardından silinir
+            await asyncio.to_thread(_discard, writer, temp_path)
+        raise
+
+    final_path = f"{folder}/user_{user_id}_{guard.sha256}.{guard.extension}"
+    result = await asyncio.to_thread(promote_upload, temp_path, final_path)
+    if result.get("success"):
+        result.update({
+            "filename": final_path.rsplit("/", 1)[-1],
+            "sha256": guard.sha256,
+            "size": guard.size,
+            "content_type": guard.content_type,
+        })
+    return result
+
+
+def _discard(writer: Any, temp_path: str) -> None:
+    try:
+        writer.close()
+    except Exception:
+        pass
+    delete_image_from_storage(temp_path)
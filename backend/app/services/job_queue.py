@@ -0,0 +1,379 @@
+import asyncio
+import inspect
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..utils.database import get_local_db
+from .providers.scheduler import BACKGROUND, scheduler_priority
+
+# Varsayılan görünürlük zaman aşımı: bu süre içinde bitmeyen iş başka worker'a geçer
+DEFAULT_VISIBILITY_TIMEOUT = int(os.getenv("APP_JOB_VISIBILITY_TIMEOUT", "300"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("APP_JOB_MAX_ATTEMPTS", "5"))
+BASE_BACKOFF_SECONDS = float(os.getenv("APP_JOB_BASE_BACKOFF", "5"))
+MAX_BACKOFF_SECONDS = float(os.getenv("APP_JOB_MAX_BACKOFF", "3600"))
+POLL_INTERVAL_SECONDS = 0.5
+# Tamamlanan işlerin saklanma süresi
+DONE_RETENTION_SECONDS = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    locked_until REAL,
+    locked_by TEXT,
+    dedupe_key TEXT,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(kind, status, available_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running');
+"""
+
+
+class JobRegistration:
+    def __init__(self, kind: str, handler: Callable[[Dict[str, Any]], Any], concurrency: int,
+                 max_attempts: int, visibility_timeout: int, rate_per_minute: Optional[float],
+                 on_dead: Optional[Callable[[Dict[str, Any], str], Any]]):
+        self.kind = kind
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.min_interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self.on_dead = on_dead
+        self.next_slot = 0.0
+        self.slot_lock = threading.Lock()
+
+    def wait_for_slot(self, stop: threading.Event) -> None:
+        """Tür bazlı dakika başına iş sınırını tüm thread'ler arasında uygular"""
+        if not self.min_interval:
+            return
+        with self.slot_lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.min_interval
+        if slot > now:
+            stop.wait(slot - now)
+
+
+class JobQueue:
+    """SQLite tabanlı kalıcı iş kuyruğu
+
+    İşler yeniden başlatmalarda kaybolmaz. Alınan iş görünürlük zaman aşımı boyunca
+    kilitlenir; worker çökerse süre dolunca tekrar alınır. Başarısız işler üstel
+    geri çekilme ile yeniden denenir, deneme hakkı bitince "dead" durumuna düşer.
+    Her iş türü için eşzamanlılık ve dakika başına hız sınırı ayrı ayarlanır.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.registrations: Dict[str, JobRegistration] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._init_schema()
+
+    def _db(self):
+        return get_local_db(self.db_path)
+
+    def _init_schema(self) -> None:
+        self._db().executescript(_SCHEMA)
+
+    # Registration
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any], concurrency: int = 2,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT,
+                 rate_per_minute: Optional[float] = None,
+                 on_dead: Optional[Callable[[Dict[str, Any], str], Any]] = None) -> None:
+        """İş türü için handler kaydeder; handler sync veya async olabilir"""
+        self.registrations[kind] = JobRegistration(
+            kind, handler, concurrency, max_attempts, visibility_timeout, rate_per_minute, on_dead
+        )
+
+    # Producer API
+    def enqueue(self, kind: str, payload: Dict[str, Any], delay: float = 0.0, job_id: Optional[str] = None,
+                dedupe_key: Optional[str] = None, max_attempts: Optional[int] = None) -> str:
+        """İşi kuyruğa ekler ve ID'sini döndürür
+
+        dedupe_key verilirse aynı anahtarla bekleyen/çalışan bir iş varsa yenisi
+        eklenmez, mevcut işin ID'si döner.
+        """
+        registration = self.registrations.get(kind)
+        if max_attempts is None:
+            max_attempts = registration.max_attempts if registration else DEFAULT_MAX_ATTEMPTS
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        db = self._db()
+        cur = db.execute(
+            "INSERT OR IGNORE INTO jobs (id, kind, payload, status, attempts, max_attempts, available_at, "
+            "dedupe_key, created_at, updated_at) VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload, default=str), max_attempts, now + delay, dedupe_key, now, now),
+        )
+        if cur.rowcount == 0 and dedupe_key:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')", (dedupe_key,)
+            ).fetchone()
+            if row:
+                self._count(kind, "deduplicated")
+                return row["id"]
+        self._count(kind, "enqueued")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def retry_dead(self, job_id: str) -> bool:
+        """Dead-letter'daki bir işi deneme sayacını sıfırlayarak tekrar kuyruğa alır
+
+        Aynı dedupe_key ile bekleyen/çalışan bir iş varsa dead iş canlandırılmaz
+        (o iş zaten aynı işi yapacak) ve False döner.
+        """
+        now = time.time()
+        cur = self._db().execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'dead' AND (dedupe_key IS NULL OR NOT EXISTS ("
+            "SELECT 1 FROM jobs AS live WHERE live.dedupe_key = jobs.dedupe_key "
+            "AND live.status IN ('queued', 'running')))",
+            (now, now, job_id),
+        )
+        return cur.rowcount > 0
+
+    # Worker API
+    def claim(self, kind: str) -> Optional[Dict[str, Any]]:
+        """Sıradaki işi atomik olarak alır ve görünürlük süresi boyunca kilitler"""
+        registration = self.registrations.get(kind)
+        visibility = registration.visibility_timeout if registration else DEFAULT_VISIBILITY_TIMEOUT
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND ("
+                "(status = 'queued' AND available_at <= ?) OR (status = 'running' AND locked_until < ?)"
+                ") ORDER BY available_at LIMIT 1",
+                (kind, now, now),
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            if row["status"] == "running" and row["attempts"] >= row["max_attempts"]:
+                # Görünürlük süresi dolan son deneme: dead-letter
+                db.execute(
+                    "UPDATE jobs SET status = 'dead', last_error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                    ("visibility timeout exceeded", now, now, row["id"]),
+                )
+                db.execute("COMMIT")
+                self._count(kind, "dead")
+                self._notify_dead(kind, self._row_to_dict(row), "visibility timeout exceeded")
+                return self.claim(kind)
+            if row["status"] == "running":
+                self._count(kind, "timed_out")
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ?, locked_by = ?, "
+                "updated_at = ? WHERE id = ?",
+                (now + visibility, self.worker_id, now, row["id"]),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        job = self._row_to_dict(row)
+        job["attempts"] += 1
+        job["status"] = "running"
+        return job
+
+    # Onaylar yalnızca işi hâlâ bu deneme tutuyorsa uygulanır; görünürlük süresi
+    # dolup iş başka worker'a (veya yeni denemeye) geçtiyse eski onay yok sayılır
+    _OWNED = "id = ? AND status = 'running' AND locked_by = ? AND attempts = ?"
+
+    def _owner(self, job: Dict[str, Any]) -> Tuple[str, str, int]:
+        return job["id"], self.worker_id, job["attempts"]
+
+    def complete(self, job: Dict[str, Any], result: Any = None) -> bool:
+        """İşi tamamlandı olarak işaretler; iş başka denemeye geçtiyse False döner"""
+        now = time.time()
+        cur = self._db().execute(
+            "UPDATE jobs SET status = 'done', result = ?, locked_until = NULL, updated_at = ?, finished_at = ? "
+            f"WHERE {self._OWNED}",
+            (json.dumps(result, default=str), now, now, *self._owner(job)),
+        )
+        if cur.rowcount == 0:
+            self._count(job["kind"], "stale_acks")
+            return False
+        return True
+
+    def fail(self, job: Dict[str, Any], error: str) -> str:
+        """Başarısız denemeyi kaydeder; yeniden dener veya dead-letter'a taşır
+
+        İş başka denemeye geçtiyse hiçbir şey yazılmaz ve "stale" döner.
+        """
+        now = time.time()
+        db = self._db()
+        if job["attempts"] >= job["max_attempts"]:
+            cur = db.execute(
+                "UPDATE jobs SET status = 'dead', last_error = ?, locked_until = NULL, updated_at = ?, "
+                f"finished_at = ? WHERE {self._OWNED}",
+                (error, now, now, *self._owner(job)),
+            )
+            if cur.rowcount == 0:
+                self._count(job["kind"], "stale_acks")
+                return "stale"
+            self._count(job["kind"], "dead")
+            self._notify_dead(job["kind"], job, error)
+            return "dead"
+        backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** (job["attempts"] - 1)))
+        backoff *= random.uniform(0.5, 1.0)  # jitter
+        cur = db.execute(
+            "UPDATE jobs SET status = 'queued', last_error = ?, available_at = ?, locked_until = NULL, "
+            f"updated_at = ? WHERE {self._OWNED}",
+            (error, now + backoff, now, *self._owner(job)),
+        )
+        if cur.rowcount == 0:
+            self._count(job["kind"], "stale_acks")
+            return "stale"
+        self._count(job["kind"], "retried")
+        return "queued"
+
+    def _notify_dead(self, kind: str, job: Dict[str, Any], error: str) -> None:
+        registration = self.registrations.get(kind)
+        if registration and registration.on_dead:
+            try:
+                registration.on_dead(job["payload"], error)
+            except Exception as e:
+                print(f"⚠️ on_dead hook failed for {kind}: {str(e)}")
+
+    def _execute(self, registration: JobRegistration, job: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        try:
+            payload = dict(job["payload"])
+            payload["_job"] = {"id": job["id"], "attempts": job["attempts"], "max_attempts": job["max_attempts"]}
+            # Kuyruk işlerinin dış API çağrıları etkileşimli isteklerin arkasında sıralanır
+            with scheduler_priority(BACKGROUND):
+                if inspect.iscoroutinefunction(registration.handler):
+                    result = asyncio.run(registration.handler(payload))
+                else:
+                    result = registration.handler(payload)
+            if self.complete(job, result):
+                self._count(job["kind"], "completed")
+        except Exception as e:
+            self.fail(job, f"{type(e).__name__}: {str(e)}")
+            self._count(job["kind"], "failed")
+        finally:
+            self._count(job["kind"], "busy_seconds", time.perf_counter() - start)
+
+    def _worker_loop(self, registration: JobRegistration) -> None:
+        while not self._stop.is_set():
+            try:
+                registration.wait_for_slot(self._stop)
+                job = self.claim(registration.kind)
+            except Exception as e:
+                print(f"⚠️ Job claim failed for {registration.kind}: {str(e)}")
+                job = None
+            if job is None:
+                self._stop.wait(POLL_INTERVAL_SECONDS)
+                continue
+            self._execute(registration, job)
+
+    def start(self) -> None:
+        """Kayıtlı her iş türü için eşzamanlılık sınırı kadar worker thread başlatır"""
+        if self._threads:
+            return
+        self._stop.clear()
+        self.purge_finished()
+        for registration in self.registrations.values():
+            for i in range(registration.concurrency):
+                thread = threading.Thread(
+                    target=self._worker_loop, args=(registration,),
+                    name=f"job-{registration.kind}-{i}", daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def purge_finished(self, older_than: float = DONE_RETENTION_SECONDS) -> int:
+        cur = self._db().execute(
+            "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?", (time.time() - older_than,)
+        )
+        return cur.rowcount
+
+    # Observability
+    def _count(self, kind: str, name: str, amount: float = 1.0) -> None:
+        with self._stats_lock:
+            self._counters[kind][name] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        """Kuyruk derinliği, yeniden deneme ve verim istatistikleri"""
+        db = self._db()
+        now = time.time()
+        depth: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for row in db.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status"):
+            depth[row["kind"]][row["status"]] = row["n"]
+        retries: Dict[str, int] = {}
+        for row in db.execute(
+            "SELECT kind, SUM(attempts - 1) AS n FROM jobs WHERE attempts > 1 GROUP BY kind"
+        ):
+            retries[row["kind"]] = row["n"] or 0
+        throughput: Dict[str, int] = {}
+        for row in db.execute(
+            "SELECT kind, COUNT(*) AS n FROM jobs WHERE status = 'done' AND finished_at >= ? GROUP BY kind",
+            (now - 60,),
+        ):
+            throughput[row["kind"]] = row["n"]
+        oldest = {
+            row["kind"]: round(now - row["t"], 1)
+            for row in db.execute(
+                "SELECT kind, MIN(created_at) AS t FROM jobs WHERE status = 'queued' GROUP BY kind"
+            )
+        }
+        with self._stats_lock:
+            counters = {kind: dict(values) for kind, values in self._counters.items()}
+        return {
+            "worker_id": self.worker_id,
+            "depth": dict(depth),
+            "retries": retries,
+            "completed_last_minute": throughput,
+            "oldest_queued_age_seconds": oldest,
+            "process_counters": counters,
+            "workers": {
+                kind: {"concurrency": r.concurrency, "rate_per_minute": (60.0 / r.min_interval) if r.min_interval else None}
+                for kind, r in self.registrations.items()
+            },
+        }
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        data = dict(row)
+        data["payload"] = json.loads(data["payload"]) if data.get("payload") else {}
+        if data.get("result"):
+            try:
+                data["result"] = json.loads(data["result"])
+            except ValueError:
+                pass
+        return data
+
+
+# Global instance
+job_queue = JobQueue()
@@ -1,6 +1,8 @@
 import os
 from typing import List
 
+from .scheduler import provider_scheduler
+
 try:
     from openai import OpenAI
 except Exception:  # pragma: no cover
@@ -8,19 +10,22 @@ except Exception:  # pragma: no cover
 
 
 class OpenAIEmbeddingsProvider:
-    def __init__(self, api_key: str | None = None, model: str = "text-embedding-3-small"):
+    def __init__(self, api_key: str | None = None, model: str = "text-embedding-3-small", http_client=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY is required for OpenAI embeddings provider")
         if OpenAI is None:
             raise RuntimeError("openai package is not available")
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = OpenAI(api_key=self.api_key, http_client=http_client) if http_client else OpenAI(api_key=self.api_key)
         self.model = model
 
     def embed(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
-        resp = self.client.embeddings.create(model=self.model, input=texts)
+        estimate = sum(len(t) for t in texts) // 4
+        with provider_scheduler.slot("openai", self.model, estimate) as slot:
+            resp = self.client.embeddings.create(model=self.model, input=texts)
+            slot.record_usage(int(getattr(getattr(resp, "usage", None), "total_tokens", 0) or 0))
         return [d.embedding for d in resp.data]
 
 
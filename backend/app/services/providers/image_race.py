@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .resilience import BreakerRegistry, model_breakers
+from .scheduler import measure_queue_wait
+
+# Denenecek görsel sağlayıcıları (tercih sırası); anahtarı olmayanlar atlanır
+IMAGE_PROVIDERS = [p.strip() for p in os.getenv("APP_IMAGE_PROVIDERS", "fal,gemini,stability").split(",") if p.strip()]
+# Görsel başına tahmini maliyet (USD); APP_IMAGE_PROVIDER_COSTS='{"fal": 0.05}' ile ezilebilir
+DEFAULT_IMAGE_COSTS: Dict[str, float] = {"fal": 0.04, "gemini": 0.039, "stability": 0.01}
+# Aynı anda yarışan sağlayıcıların toplam maliyet tavanı; 0 ile yarış kapanır (sıralı fallback)
+IMAGE_RACE_BUDGET = float(os.getenv("APP_IMAGE_RACE_BUDGET", "0.06"))
+# Aynı anda en fazla kaç sağlayıcı yarışır
+IMAGE_RACE_WIDTH = int(os.getenv("APP_IMAGE_RACE_WIDTH", "2"))
+
+
+class ImageRaceError(RuntimeError):
+    def __init__(self, message: str, attempts: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+def load_costs() -> Dict[str, float]:
+    costs = dict(DEFAULT_IMAGE_COSTS)
+    raw = os.getenv("APP_IMAGE_PROVIDER_COSTS")
+    if raw:
+        try:
+            costs.update({name: float(cost) for name, cost in json.loads(raw).items()})
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"⚠️ APP_IMAGE_PROVIDER_COSTS ignored: {str(e)}")
+    return costs
+
+
+def plan_race(candidates: List[str], costs: Dict[str, float], budget: float = IMAGE_RACE_BUDGET,
+              width: int = IMAGE_RACE_WIDTH) -> Tuple[List[str], List[str]]:
+    """Maliyet politikasına göre (ilk dalgada yarışanlar, yedekler) döndürür
+
+    Adaylar ucuzdan pahalıya sıralanır (eşit maliyette tercih sırası korunur).
+    İlk dalgaya en ucuz aday her zaman girer; diğerleri toplam maliyet bütçeyi ve
+    genişliği aşmadığı sürece eklenir. Kalanlar yalnızca yarışanların hepsi
+    başarısız olursa sırayla denenir.
+    """
+    ordered = sorted(candidates, key=lambda name: (costs.get(name, float("inf")), candidates.index(name)))
+    racers: List[str] = []
+    spent = 0.0
+    for name in ordered:
+        cost = costs.get(name, float("inf"))
+        if not racers or (len(racers) < width and spent + cost <= budget):
+            racers.append(name)
+            spent += cost
+    return racers, [name for name in ordered if name not in racers]
+
+
+def _breaker_name(provider: str) -> str:
+    return f"image:{provider}"
+
+
+async def race_providers(prompt: str, generators: Dict[str, Callable[[str], Dict[str, Any]]],
+                         costs: Optional[Dict[str, float]] = None, budget: float = IMAGE_RACE_BUDGET,
+                         width: int = IMAGE_RACE_WIDTH,
+                         breakers: BreakerRegistry = model_breakers) -> Dict[str, Any]:
+    """Sağlayıcıları maliyet politikasıyla yarıştırır; ilk başarılı sonuç kazanır
+
+    generators: sağlayıcı adı -> bloklayan generate(prompt) ({"success", "data"}).
+    Çağrılar yarışa ait ayrı bir thread havuzunda yürür; kazanan belli olunca
+    diğer görevler iptal edilir, havuz beklenmeden kapatılır ve (HTTP isteği
+    zaten yoldaysa) sonuçları yok sayılır. Varsayılan executor kullanılmadığı
+    için asyncio.run kaybedenlerin bitmesini beklemez. Devresi açık
+    sağlayıcılar plana alınmaz; hiç çalışmayan (ihtiyaç duyulmayan yedek veya
+    başlamadan iptal edilen) sağlayıcıların half-open probe hakkı geri verilir.
+    Dönen sözlük: provider, data, cost_usd, attempts.
+    """
+    costs = costs if costs is not None else load_costs()
+    available = [name for name in generators if breakers.get(_breaker_name(name)).allow()]
+    attempts: List[Dict[str, Any]] = [
+        {"provider": name, "status": "circuit_open"} for name in generators if name not in available
+    ]
+    if not available:
+        raise ImageRaceError("No image provider available", attempts)
+    racers, fallbacks = plan_race(available, costs, budget, width)
+
+    ran: Set[str] = set()
+
+    def _call(name: str) -> Dict[str, Any]:
+        ran.add(name)
+        breaker = breakers.get(_breaker_name(name))
+        with measure_queue_wait() as queued:
+            start = time.monotonic()
+            try:
+                result = generators[name](prompt) or {}
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+        if queued.timed_out and not result.get("success"):
+            # Yerel kota beklemesi aşıldı; sağlayıcı hatası sayılmaz
+            breaker.release()
+        else:
+            breaker.record(bool(result.get("success")), time.monotonic() - start - queued.seconds)
+        return result
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=len(racers) + len(fallbacks), thread_name_prefix="image-race")
+    started: Dict[asyncio.Future, Tuple[str, float]] = {}
+
+    def _launch(name: str) -> None:
+        task = loop.run_in_executor(executor, _call, name)
+        started[task] = (name, time.monotonic())
+
+    for name in racers:
+        _launch(name)
+    winner: Optional[Dict[str, Any]] = None
+    try:
+        while started and winner is None:
+            done, _ = await asyncio.wait(list(started), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name, t0 = started.pop(task)
+                result = task.result()
+                attempt = {"provider": name, "latency_ms": int((time.monotonic() - t0) * 1000)}
+                if result.get("success") and winner is None:
+                    attempt["status"] = "won"
+                    winner = {"provider": name, "data": result.get("data") or {}}
+                elif result.get("success"):
+                    attempt["status"] = "discarded"
+                else:
+                    attempt.update({"status": "failed", "error": str(result.get("error"))[:300]})
+                attempts.append(attempt)
+            if winner is None and not started and fallbacks:
+                _launch(fallbacks.pop(0))
+    finally:
+        for task, (name, _) in started.items():
+            task.cancel()
+            attempts.append({"provider": name, "status": "cancelled"})
+        # Yoldaki HTTP çağrıları durdurulamaz; thread'leri arka planda biter, iş beklemez
+        executor.shutdown(wait=False, cancel_futures=True)
+        for name in available:
+            if name not in ran:
+                # allow() ile alınan probe hakkı sonuç kaydedilmeyeceği için bırakılır
+                breakers.get(_breaker_name(name)).release()
+
+    if winner is None:
+        raise ImageRaceError(
+            "; ".join(f"{a['provider']}: {a.get('error', a['status'])}" for a in attempts), attempts
+        )
+    # Başlatılan her çağrı (kaybedenler dahil) faturalanmış sayılır
+    launched = [a["provider"] for a in attempts if a["status"] != "circuit_open"]
+    winner["cost_usd"] = round(sum(costs.get(name, 0.0) for name in launched), 4)
+    winner["attempts"] = attempts
+    return winner
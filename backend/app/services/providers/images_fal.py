@@ -2,6 +2,8 @@ import os
 from typing import Dict, Any
 import requests
 
+from .scheduler import provider_scheduler, retry_after_seconds
+
 
 class FalImageProvider:
     def __init__(self, api_key: str | None = None, model: str | None = None):
@@ -38,7 +40,10 @@ class FalImageProvider:
 
             # Submit request to queue for the selected model
             submit_url = f"{self.rest_base}/{self.model}"
-            resp = requests.post(submit_url, json={"input": payload}, headers=headers, timeout=90)
+            with provider_scheduler.slot("fal", self.model):
+                resp = requests.post(submit_url, json={"input": payload}, headers=headers, timeout=90)
+            if resp.status_code == 429:
+                provider_scheduler.penalize("fal", None, retry_after_seconds(resp.headers))
             if resp.status_code != 200:
                 return {"success": False, "error": f"{resp.status_code}: {resp.text}"}
             data = resp.json() or {}
@@ -1,6 +1,8 @@
 import os
 from typing import Dict, Any
 
+from .scheduler import provider_scheduler
+
 # New client (preferred for image gen)
 try:  # pragma: no cover
     from google import genai as ggenai
@@ -21,7 +23,11 @@ class GeminiImageProvider:
         if ggenai is None or gtypes is None:
             raise RuntimeError("google-genai package is required for Gemini image generation. Run: pip install google-genai")
         # Preferred: new client
-        self.client = ggenai.Client(api_key=self.api_key)
+        base_url = os.getenv("GEMINI_BASE_URL", "")
+        if base_url:
+            self.client = ggenai.Client(api_key=self.api_key, http_options={"base_url": base_url})
+        else:
+            self.client = ggenai.Client(api_key=self.api_key)
         self.model = None
         self.model_name = model_name or "gemini-2.0-flash-preview-image-generation"
         # Prefer only image-capable Gemini models via public API
@@ -39,13 +45,14 @@ class GeminiImageProvider:
                 if not m:
                     continue
                 try:
-                    response = self.client.models.generate_content(
-                        model=m,
-                        contents=prompt + size_hint,
-                        config=gtypes.GenerateContentConfig(
-                            response_modalities=["IMAGE"],
-                        ),
-                    )
+                    with provider_scheduler.slot("gemini_image", m):
+                        response = self.client.models.generate_content(
+                            model=m,
+                            contents=prompt + size_hint,
+                            config=gtypes.GenerateContentConfig(
+                                response_modalities=["IMAGE"],
+                            ),
+                        )
                     self.model_name = m
                     break
                 except Exception as e:
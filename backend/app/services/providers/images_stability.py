@@ -2,6 +2,8 @@ import os
 from typing import Dict, Any
 import requests
 
+from .scheduler import provider_scheduler, retry_after_seconds
+
 
 class StabilityImageProvider:
     def __init__(self, api_key: str | None = None):
@@ -9,7 +11,9 @@ class StabilityImageProvider:
         if not self.api_key:
             raise ValueError("STABILITY_API_KEY is required for Stability image provider")
         # v1 text-to-image endpoint (compatible/stable)
-        self.url = "https://api.stability.ai/v1/generation/stable-diffusion-v1-5/text-to-image"
+        api_base = os.getenv("STABILITY_API_BASE", "https://api.stability.ai").rstrip("/")
+        self.engine = "stable-diffusion-v1-5"
+        self.url = f"{api_base}/v1/generation/{self.engine}/text-to-image"
 
     def generate(self, prompt: str, width: int = 768, height: int = 512, steps: int = 30) -> Dict[str, Any]:
         headers = {
@@ -26,7 +30,10 @@ class StabilityImageProvider:
             "samples": 1,
             "steps": steps,
         }
-        resp = requests.post(self.url, headers=headers, json=payload, timeout=120)
+        with provider_scheduler.slot("stability"):
+            resp = requests.post(self.url, headers=headers, json=payload, timeout=120)
+        if resp.status_code == 429:
+            provider_scheduler.penalize("stability", None, retry_after_seconds(resp.headers))
         if resp.status_code != 200:
             return {"success": False, "error": f"{resp.status_code}: {resp.text}"}
         data = resp.json()
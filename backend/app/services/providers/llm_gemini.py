@@ -1,12 +1,34 @@
 import os
 import json
+import threading
 from typing import Any, Dict, List, Optional
 
+from .response_cache import cached_call
+from .scheduler import estimate_tokens, provider_scheduler
+
 try:
     import google.generativeai as genai
 except Exception:  # pragma: no cover
     genai = None  # type: ignore
 
+# GEMINI_BASE_URL verilirse istekler REST üzerinden bu adrese gider (ör. yerel mock sunucu)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
+# genai.configure global durumu değiştirir; aynı anahtarla tekrar çağrılmaz
+_configure_lock = threading.Lock()
+_configured_key: Optional[str] = None
+
+
+def _ensure_configured(api_key: str) -> None:
+    global _configured_key
+    with _configure_lock:
+        if _configured_key != api_key:
+            if GEMINI_BASE_URL:
+                genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_BASE_URL})
+            else:
+                genai.configure(api_key=api_key)
+            _configured_key = api_key
+
 
 class GeminiLLMProvider:
     """Light wrapper around Google Gemini Chat Completions for text and JSON responses."""
@@ -18,8 +40,15 @@ class GeminiLLMProvider:
         if genai is None:
             raise RuntimeError("google-generativeai package is not available")
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        _ensure_configured(self.api_key)
+        self._models: Dict[str, Any] = {}
+        self.model = self._model_for('gemini-1.5-flash')
+
+    def _model_for(self, model: str) -> Any:
+        """Model nesnesini model adı başına bir kez oluşturur"""
+        if model not in self._models:
+            self._models[model] = genai.GenerativeModel(model)
+        return self._models[model]
 
     def chat_text(
         self,
@@ -27,7 +56,14 @@ class GeminiLLMProvider:
         model: str = "gemini-1.5-flash",
         temperature: float = 0.2,
         max_tokens: int = 600,
+        cache_ttl: Optional[float] = None,
     ) -> str:
+        return cached_call(
+            "gemini", model, messages, temperature, max_tokens, None, cache_ttl,
+            lambda: self._generate(messages, model, temperature, max_tokens),
+        )
+
+    def _generate(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int):
         try:
             # Convert OpenAI format to Gemini format
             gemini_messages = []
@@ -52,15 +88,20 @@ class GeminiLLMProvider:
                 gemini_messages[0] = f"{system_content}\n\n{gemini_messages[0]}"
             
             # Generate response
-            response = self.model.generate_content(
-                gemini_messages[-1] if gemini_messages else "Hello",
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature,
-                    max_output_tokens=max_tokens,
+            model = model or 'gemini-1.5-flash'
+            with provider_scheduler.slot("gemini", model, estimate_tokens(messages, max_tokens)) as slot:
+                response = self._model_for(model).generate_content(
+                    gemini_messages[-1] if gemini_messages else "Hello",
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=temperature,
+                        max_output_tokens=max_tokens,
+                    )
                 )
-            )
+                usage = getattr(response, "usage_metadata", None)
+                tokens = int(getattr(usage, "total_token_count", 0) or 0)
+                slot.record_usage(tokens)
             
-            return response.text or ""
+            return response.text or "", tokens
             
         except Exception as e:
             raise RuntimeError(f"Gemini chat failed: {e}")
@@ -72,10 +113,11 @@ class GeminiLLMProvider:
         model: str = "gemini-1.5-flash",
         temperature: float = 0.2,
         max_tokens: int = 800,
+        cache_ttl: Optional[float] = None,
     ) -> Dict[str, Any]:
         try:
             # Get text response first
-            text_response = self.chat_text(messages, model, temperature, max_tokens)
+            text_response = self.chat_text(messages, model, temperature, max_tokens, cache_ttl=cache_ttl)
             
             # Try to parse as JSON
             try:
@@ -1,23 +1,44 @@
 import os
 import json
-from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from .resilience import CircuitOpenError, call_with_fallback, model_breakers
+from .response_cache import cached_call
+from .scheduler import RateLimitTimeout, estimate_tokens, provider_scheduler
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, OpenAI
 except Exception:  # pragma: no cover
     OpenAI = None  # type: ignore
+    AsyncOpenAI = None  # type: ignore
 
 
 class OpenAILLMProvider:
     """Light wrapper around OpenAI Chat Completions for text and JSON responses."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http_client: Any = None, async_http_client: Any = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY is required for OpenAI provider")
         if OpenAI is None:
             raise RuntimeError("openai package is not available")
-        self.client = OpenAI(api_key=self.api_key)
+        # http_client verilirse (registry) bağlantı havuzu paylaşılır
+        self.client = OpenAI(api_key=self.api_key, http_client=http_client) if http_client else OpenAI(api_key=self.api_key)
+        # Akışlı (stream) çağrılar için async istemci; uygulamanın event loop'unda kullanılır
+        if async_http_client:
+            self.async_client = AsyncOpenAI(api_key=self.api_key, http_client=async_http_client)
+        else:
+            self.async_client = AsyncOpenAI(api_key=self.api_key)
+        # allow fallback models via env comma list (read once)
+        fallback_env = os.getenv("APP_OPENAI_CHAT_MODELS", "")
+        self.fallback_models = [m.strip() for m in fallback_env.split(",") if m.strip()]
+        # add sane defaults as ultimate fallbacks
+        for m in ["gpt-4o", "gpt-4o-mini"]:
+            if m not in self.fallback_models:
+                self.fallback_models.append(m)
+        self.hedge = os.getenv("APP_OPENAI_HEDGE", "false").lower() in ("1", "true", "yes")
 
     def chat_text(
         self,
@@ -25,35 +46,156 @@ class OpenAILLMProvider:
         model: str = "gpt-4o-mini",
         temperature: float = 0.2,
         max_tokens: int = 600,
+        hedge: Optional[bool] = None,
+        cache_ttl: Optional[float] = None,
     ) -> str:
-        # allow fallback models via env comma list
-        fallback_env = os.getenv("APP_OPENAI_CHAT_MODELS", "")
-        model_candidates = [model]
-        if fallback_env:
-            for m in [m.strip() for m in fallback_env.split(",") if m.strip()]:
-                if m not in model_candidates:
-                    model_candidates.append(m)
-        # add sane defaults as ultimate fallbacks
-        for m in ["gpt-4o", "gpt-4o-mini"]:
-            if m not in model_candidates:
-                model_candidates.append(m)
+        """Aday modelleri devre kesicilerle dener; hedge=True ise yedeği p95 gecikmesinde paralel başlatır
 
-        last_err: Exception | None = None
-        for m in model_candidates:
-            try:
+        cache_ttl (saniye) verilirse birebir aynı istek bu süre boyunca önbellekten döner.
+        """
+        model_candidates = [model] + [m for m in self.fallback_models if m != model]
+
+        def _call(m: str):
+            with provider_scheduler.slot("openai", m, estimate_tokens(messages, max_tokens)) as slot:
                 resp = self.client.chat.completions.create(
                     model=m,
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_tokens,
                 )
-                return resp.choices[0].message.content or ""
-            except Exception as e:  # try next
-                last_err = e
+                slot.record_usage(self._total_tokens(resp))
+            return resp.choices[0].message.content or "", self._total_tokens(resp)
+
+        def _produce():
+            try:
+                result, _ = call_with_fallback(
+                    model_candidates, _call, model_breakers, hedge=self.hedge if hedge is None else hedge
+                )
+                return result
+            except Exception as e:
+                # if all failed
+                raise RuntimeError(f"OpenAI chat failed for models {model_candidates}: {e}")
+
+        return cached_call("openai", model, messages, temperature, max_tokens, None, cache_ttl, _produce)
+
+    async def stream_text(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.2,
+        max_tokens: int = 600,
+    ) -> AsyncIterator[str]:
+        """Yanıtı üretildikçe parça parça döndürür
+
+        Aday modeller devre kesicilerle sırayla denenir; ilk parça gelmeden
+        oluşan hatada sıradaki modele geçilir, sonrasında hata çağırana iletilir.
+        """
+        model_candidates = [model] + [m for m in self.fallback_models if m != model]
+        errors: List[str] = []
+        for m in model_candidates:
+            breaker = model_breakers.get(m)
+            if not breaker.allow():
+                errors.append(f"{m}: circuit open")
                 continue
-        
-        # if all failed
-        raise RuntimeError(f"OpenAI chat failed for models {model_candidates}: {last_err}")
+            start = time.monotonic()
+            started = False
+            try:
+                async with provider_scheduler.aslot("openai", m, estimate_tokens(messages, max_tokens)) as slot:
+                    # Gecikme slot alındıktan sonra ölçülür; kuyruk beklemesi p95'e girmez
+                    start = time.monotonic()
+                    stream = await self.async_client.chat.completions.create(
+                        model=m,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                    async for chunk in stream:
+                        if getattr(chunk, "usage", None):
+                            slot.record_usage(self._total_tokens(chunk))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            yield chunk.choices[0].delta.content
+            except (GeneratorExit, asyncio.CancelledError):
+                # İstemci bağlantıyı kesti; model hatası sayılmaz
+                breaker.record(True, time.monotonic() - start)
+                raise
+            except RateLimitTimeout as e:
+                breaker.release()
+                errors.append(f"{m}: {e}")
+                continue
+            except Exception as e:
+                breaker.record(False, time.monotonic() - start)
+                if started:
+                    raise
+                errors.append(f"{m}: {e}")
+                continue
+            breaker.record(True, time.monotonic() - start)
+            return
+        raise RuntimeError(f"OpenAI stream failed for models {model_candidates}: {'; '.join(errors)}")
+
+    def stream_json_sync(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Optional[Dict[str, Any]] = None,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.2,
+        max_tokens: int = 800,
+    ) -> Iterator[str]:
+        """Yapılandırılmış çıktıyı ham JSON metin parçaları olarak akıtır (senkron istemci)
+
+        Worker thread'lerinden (iş kuyruğu) kullanılır; async istemci uygulamanın
+        event loop'una bağlı olduğundan orada paylaşılamaz. Yedek modele geçiş
+        yapılmaz; çağıran gerekirse chat_json'a döner.
+        """
+        breaker = model_breakers.get(model)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{model}: circuit open")
+        start = time.monotonic()
+        try:
+            with provider_scheduler.slot("openai", model, estimate_tokens(messages, max_tokens)) as slot:
+                start = time.monotonic()
+                stream = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format=self._response_format(schema),
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        slot.record_usage(self._total_tokens(chunk))
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except GeneratorExit:
+            breaker.record(True, time.monotonic() - start)
+            raise
+        except RateLimitTimeout:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record(False, time.monotonic() - start)
+            raise
+        breaker.record(True, time.monotonic() - start)
+
+    async def achat_text(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.2,
+        max_tokens: int = 600,
+    ) -> str:
+        """chat_text'in thread bloklamayan karşılığı (akışı birleştirir)"""
+        parts = [delta async for delta in self.stream_text(messages, model, temperature, max_tokens)]
+        return "".join(parts)
+
+    @staticmethod
+    def _total_tokens(resp: Any) -> int:
+        usage = getattr(resp, "usage", None)
+        return int(getattr(usage, "total_tokens", 0) or 0)
     
     def _generate_fallback_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate a fallback response when OpenAI quota is exceeded"""
@@ -127,11 +269,28 @@ Size en iyi şekilde yardımcı olmak için, lütfen yaşadığınız durumu det
         model: str = "gpt-4o-mini",
         temperature: float = 0.2,
         max_tokens: int = 800,
+        cache_ttl: Optional[float] = None,
     ) -> Dict[str, Any]:
-        response_format: Dict[str, Any]
+        def _produce():
+            with provider_scheduler.slot("openai", model, estimate_tokens(messages, max_tokens)) as slot:
+                resp = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format=self._response_format(schema),
+                )
+                slot.record_usage(self._total_tokens(resp))
+            return self._parse_json_content(resp.choices[0].message.content), self._total_tokens(resp)
+
+        return cached_call("openai", model, messages, temperature, max_tokens, schema or {"type": "json_object"},
+                           cache_ttl, _produce)
+
+    @staticmethod
+    def _response_format(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         if schema:
             # Use JSON schema mode if available
-            response_format = {
+            return {
                 "type": "json_schema",
                 "json_schema": {
                     "name": "structured_output",
@@ -139,21 +298,95 @@ Size en iyi şekilde yardımcı olmak için, lütfen yaşadığınız durumu det
                     "strict": True,
                 },
             }
-        else:
-            response_format = {"type": "json_object"}
-
-        resp = self.client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            response_format=response_format,
-        )
-        content = resp.choices[0].message.content or "{}"
+        return {"type": "json_object"}
+
+    @staticmethod
+    def _parse_json_content(content: Optional[str]) -> Dict[str, Any]:
+        content = content or "{}"
         try:
             return json.loads(content)
         except Exception:
             # Fallback: return raw string in a wrapper
             return {"raw": content}
 
+    # Batch API: gecikmeye duyarsız toplu işler (ör. analiz backfill) için ~%50 daha ucuz
+    def build_json_request(
+        self,
+        custom_id: str,
+        messages: List[Dict[str, str]],
+        schema: Optional[Dict[str, Any]] = None,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.2,
+        max_tokens: int = 800,
+    ) -> Dict[str, Any]:
+        """chat_json ile aynı gövdeye sahip bir Batch API satırı oluşturur"""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "response_format": self._response_format(schema),
+            },
+        }
+
+    def submit_batch(self, requests: List[Dict[str, Any]], metadata: Optional[Dict[str, str]] = None) -> str:
+        """İstekleri JSONL olarak yükleyip bir Batch işi başlatır; batch ID döner"""
+        if not requests:
+            raise ValueError("Batch must contain at least one request")
+        payload = "\n".join(json.dumps(r, ensure_ascii=False) for r in requests).encode("utf-8")
+        upload = self.client.files.create(file=("batch.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata=metadata or None,
+        )
+        return batch.id
+
+    def get_batch(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        return {
+            "id": batch.id,
+            "status": batch.status,
+            "output_file_id": getattr(batch, "output_file_id", None),
+            "error_file_id": getattr(batch, "error_file_id", None),
+            "request_counts": {
+                "total": getattr(counts, "total", None),
+                "completed": getattr(counts, "completed", None),
+                "failed": getattr(counts, "failed", None),
+            },
+        }
+
+    def fetch_batch_results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """Tamamlanmış batch çıktısını custom_id -> ayrıştırılmış JSON olarak döndürür
+
+        Başarısız satırlar {"error": ...} olarak döner.
+        """
+        info = self.get_batch(batch_id)
+        results: Dict[str, Dict[str, Any]] = {}
+        for file_id in (info.get("output_file_id"), info.get("error_file_id")):
+            if not file_id:
+                continue
+            text = self.client.files.content(file_id).text
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                response = row.get("response") or {}
+                if row.get("error") or response.get("status_code") != 200:
+                    results[row["custom_id"]] = {"error": row.get("error") or response.get("body")}
+                    continue
+                body = response.get("body") or {}
+                content = ((body.get("choices") or [{}])[0].get("message") or {}).get("content")
+                results[row["custom_id"]] = {
+                    "data": self._parse_json_content(content),
+                    "usage": body.get("usage"),
+                }
+        return results
+
 
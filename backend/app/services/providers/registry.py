@@ -0,0 +1,156 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import httpx
+except Exception:  # pragma: no cover
+    httpx = None  # type: ignore
+
+from .llm_openai import OpenAILLMProvider
+from .llm_gemini import GeminiLLMProvider
+from .embed_openai import OpenAIEmbeddingsProvider
+from .resilience import model_breakers
+
+# Paylaşılan HTTP bağlantı havuzu ayarları
+HTTP_MAX_CONNECTIONS = int(os.getenv("APP_HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("APP_HTTP_MAX_KEEPALIVE", "32"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("APP_HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("APP_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("APP_HTTP_READ_TIMEOUT", "120"))
+
+
+class ProviderRegistry:
+    """Uzun ömürlü LLM ve embedding istemcilerini süreç başına bir kez oluşturur
+
+    Her sağlayıcı/yapılandırma için tek bir istemci tutulur; OpenAI istemcileri
+    keep-alive açık tek bir httpx bağlantı havuzunu paylaşır. Handler'lar istemci
+    oluşturmak yerine buradan ödünç alır, böylece istek başına TLS el sıkışması
+    ve bağlantı kurulumu maliyeti ortadan kalkar. Sağlayıcı kurulamıyorsa
+    (anahtar/paket yok) hata, doğrudan kurulumdaki gibi çağırana iletilir.
+    """
+
+    def __init__(self):
+        # Fabrikalar kilit altında http_client()'ı çağırır; kilit yeniden girilebilir olmalı
+        self._lock = threading.RLock()
+        self._instances: Dict[Tuple[Any, ...], Any] = {}
+        self._http_client: Any = None
+        self._async_http_client: Any = None
+
+    def http_client(self) -> Any:
+        """OpenAI istemcilerinin paylaştığı httpx.Client (httpx yoksa None)"""
+        if httpx is None:
+            return None
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                )
+            return self._http_client
+
+    def async_http_client(self) -> Any:
+        """Akışlı çağrıların paylaştığı httpx.AsyncClient (httpx yoksa None)"""
+        if httpx is None:
+            return None
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                )
+            return self._async_http_client
+
+    def _get(self, key: Tuple[Any, ...], factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if key not in self._instances:
+                self._instances[key] = factory()
+            return self._instances[key]
+
+    def openai_llm(self, api_key: Optional[str] = None) -> OpenAILLMProvider:
+        api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        return self._get(
+            ("openai_llm", api_key),
+            lambda: OpenAILLMProvider(api_key=api_key, http_client=self.http_client(),
+                                      async_http_client=self.async_http_client()),
+        )
+
+    def gemini_llm(self, api_key: Optional[str] = None) -> GeminiLLMProvider:
+        api_key = api_key or os.getenv("GEMINI_API_KEY", "")
+        return self._get(("gemini_llm", api_key), lambda: GeminiLLMProvider(api_key=api_key))
+
+    def openai_embeddings(self, model: str = "text-embedding-3-small",
+                          api_key: Optional[str] = None) -> OpenAIEmbeddingsProvider:
+        api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        return self._get(
+            ("openai_embeddings", api_key, model),
+            lambda: OpenAIEmbeddingsProvider(api_key=api_key, model=model, http_client=self.http_client()),
+        )
+
+    def image_provider(self, name: str) -> Any:
+        """Görsel sağlayıcısı ("fal", "gemini", "stability"); anahtar yoksa ValueError"""
+        if name == "fal":
+            from .images_fal import FalImageProvider
+            factory: Callable[[], Any] = FalImageProvider
+        elif name == "gemini":
+            from .images_gemini import GeminiImageProvider
+            factory = GeminiImageProvider
+        elif name == "stability":
+            from .images_stability import StabilityImageProvider
+            factory = StabilityImageProvider
+        else:
+            raise ValueError(f"Unknown image provider: {name}")
+        return self._get(("image", name), factory)
+
+    def warm(self) -> Dict[str, str]:
+        """Başlangıçta istemcileri oluşturur; yapılandırılmamış sağlayıcılar atlanır"""
+        status: Dict[str, str] = {}
+        for name, factory in (("openai", self.openai_llm), ("gemini", self.gemini_llm),
+                              ("openai_embeddings", self.openai_embeddings)):
+            try:
+                factory()
+                status[name] = "ready"
+            except Exception as e:
+                status[name] = f"unavailable: {str(e)}"
+        return status
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": sorted(key[0] for key in self._instances),
+            "http_pool": {
+                "max_connections": HTTP_MAX_CONNECTIONS,
+                "max_keepalive": HTTP_MAX_KEEPALIVE,
+                "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+            } if self._http_client is not None else None,
+            "breakers": model_breakers.snapshot(),
+        }
+
+    async def aclose(self) -> None:
+        """Async bağlantı havuzunu event loop içinden kapatır, ardından close() çağırır"""
+        with self._lock:
+            async_client, self._async_http_client = self._async_http_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._instances.clear()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+
+# Global instance
+provider_registry = ProviderRegistry()
@@ -0,0 +1,235 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .scheduler import RateLimitTimeout, measure_queue_wait
+
+# Devre kesici ayarları (model başına)
+BREAKER_WINDOW = int(os.getenv("APP_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("APP_BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("APP_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("APP_BREAKER_SLOW_MS", "15000")) / 1000
+BREAKER_SLOW_RATE = float(os.getenv("APP_BREAKER_SLOW_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("APP_BREAKER_OPEN_SECONDS", "30"))
+# Hedge: yedek model, birincil modelin p95 gecikmesi kadar beklendikten sonra başlatılır
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("APP_HEDGE_DEFAULT_DELAY_MS", "8000")) / 1000
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("APP_HEDGE_MIN_DELAY_MS", "250")) / 1000
+HEDGE_MAX_WORKERS = int(os.getenv("APP_HEDGE_MAX_WORKERS", "16"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Hata oranı ve yavaş çağrı oranına göre açılan devre kesici
+
+    Son BREAKER_WINDOW çağrı izlenir. En az BREAKER_MIN_CALLS çağrıdan sonra hata
+    oranı veya eşikten yavaş çağrı oranı sınırı aşarsa devre açılır ve
+    BREAKER_OPEN_SECONDS boyunca çağrılar hiç denenmeden atlanır. Süre dolunca
+    tek bir deneme (half-open probe) geçirilir; başarılıysa devre kapanır.
+    """
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 slow_rate: float = BREAKER_SLOW_RATE, open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._latencies: Deque[float] = deque(maxlen=max(window, 50))
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        """Çağrının yapılıp yapılamayacağını söyler; half-open'da tek probe'a izin verir"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record(self, success: bool, latency: float) -> None:
+        with self._lock:
+            if success:
+                self._latencies.append(latency)
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success and latency < self.slow_call_seconds:
+                    self.state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            self._calls.append((success, latency))
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                total = len(self._calls)
+                failures = sum(1 for ok, _ in self._calls if not ok)
+                slow = sum(1 for _, lat in self._calls if lat >= self.slow_call_seconds)
+                if failures / total >= self.error_rate or slow / total >= self.slow_rate:
+                    self._open()
+
+    def release(self) -> None:
+        """Sonucu sayılmayan çağrı (ör. yerel kota zaman aşımı) half-open probe hakkını geri verir"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+
+    def p95(self) -> Optional[float]:
+        """Başarılı çağrıların p95 gecikmesi (saniye); yeterli örnek yoksa None"""
+        with self._lock:
+            if len(self._latencies) < self.min_calls:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        with self._lock:
+            total = len(self._calls)
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            return {
+                "state": self.state,
+                "calls": total,
+                "error_rate": round(failures / total, 3) if total else 0.0,
+                "p95_ms": int(p95 * 1000) if p95 is not None else None,
+                "short_circuited": self.short_circuited,
+            }
+
+
+class BreakerRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {name: breaker.snapshot() for name, breaker in breakers}
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+def _timed(breaker: CircuitBreaker, call: Callable[[str], Any], candidate: str) -> Any:
+    """Çağrıyı devre kesiciye kaydeder; zamanlayıcı kuyruğunda geçen süre gecikmeye sayılmaz"""
+    with measure_queue_wait() as queued:
+        start = time.monotonic()
+        try:
+            result = call(candidate)
+        except RateLimitTimeout:
+            # Kendi kotamızın dolması modelin hatası değildir
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record(False, time.monotonic() - start - queued.seconds)
+            raise
+    breaker.record(True, time.monotonic() - start - queued.seconds)
+    return result
+
+
+def hedge_delay(breaker: CircuitBreaker) -> float:
+    p95 = breaker.p95()
+    return max(HEDGE_MIN_DELAY_SECONDS, p95 if p95 is not None else HEDGE_DEFAULT_DELAY_SECONDS)
+
+
+def _raise_exhausted(errors: List[str]) -> None:
+    if all(e.endswith("circuit open") for e in errors):
+        raise CircuitOpenError("; ".join(errors) or "no candidates")
+    raise RuntimeError("; ".join(errors))
+
+
+def call_with_fallback(candidates: List[str], call: Callable[[str], Any], breakers: BreakerRegistry,
+                       hedge: bool = False) -> Tuple[Any, str]:
+    """Adayları devre kesicilerden geçirerek dener; (sonuç, kullanılan aday) döner
+
+    Açık devresi olan aday beklemeden atlanır. hedge=True ise her aday kendi p95
+    gecikmesi kadar beklenir; yanıt gelmemişse sıradaki aday paralel başlatılır
+    ve ilk başarılı yanıt kullanılır (geç kalan çağrının sonucu yok sayılır).
+    """
+    errors: List[str] = []
+    remaining = list(candidates)
+
+    if not hedge:
+        for candidate in remaining:
+            breaker = breakers.get(candidate)
+            if not breaker.allow():
+                errors.append(f"{candidate}: circuit open")
+                continue
+            try:
+                return _timed(breaker, call, candidate), candidate
+            except Exception as e:
+                errors.append(f"{candidate}: {e}")
+        _raise_exhausted(errors)
+
+    pending: Dict[Future, str] = {}
+
+    def _launch_next() -> Optional[str]:
+        while remaining:
+            candidate = remaining.pop(0)
+            breaker = breakers.get(candidate)
+            if breaker.allow():
+                # Context kopyalanır: çağıranın zamanlayıcı önceliği hedge thread'inde de geçerli olur
+                future = _executor().submit(contextvars.copy_context().run, _timed, breaker, call, candidate)
+                pending[future] = candidate
+                return candidate
+            errors.append(f"{candidate}: circuit open")
+        return None
+
+    latest = _launch_next()
+    while pending:
+        timeout = hedge_delay(breakers.get(latest)) if remaining and latest else None
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            candidate = pending.pop(future)
+            if future.exception() is None:
+                return future.result(), candidate
+            errors.append(f"{candidate}: {future.exception()}")
+        if not done or not pending:
+            # Gecikme eşiği aşıldı (hedge) veya uçuştaki tüm çağrılar başarısız oldu
+            launched = _launch_next()
+            latest = launched or latest
+    _raise_exhausted(errors)
+
+
+# Süreç genelinde model başına devre kesiciler
+model_breakers = BreakerRegistry()
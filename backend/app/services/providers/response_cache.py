@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ...utils.database import get_local_db
+from ...utils.singleflight import SingleFlight
+
+# Bellek içi LRU katmanının kapasitesi (süreç başına)
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("APP_LLM_CACHE_MEMORY_ENTRIES", "1024"))
+# APP_LLM_CACHE=false ile önbellek tamamen kapatılır
+RESPONSE_CACHE_ENABLED = os.getenv("APP_LLM_CACHE", "true").lower() not in ("0", "false", "no")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires ON llm_response_cache(expires_at);
+"""
+
+
+def cache_key(provider: str, model: str, messages: List[Dict[str, Any]], temperature: float,
+              max_tokens: int, schema: Optional[Dict[str, Any]] = None) -> str:
+    """İsteğin kanonik biçiminden (sıralı anahtarlar, sabit ayraçlar) sha256 anahtarı üretir"""
+    canonical_messages = [
+        {"role": m.get("role", ""), "content": (m.get("content") or "").strip()} for m in messages
+    ]
+    schema_hash = hashlib.sha256(
+        json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest() if schema else ""
+    payload = json.dumps(
+        [provider, model, canonical_messages, round(float(temperature), 3), int(max_tokens), schema_hash],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Birebir aynı LLM istekleri için iki katmanlı yanıt önbelleği
+
+    İlk katman süreç içi LRU'dur (mikrosaniye düzeyinde yanıt); ikinci katman
+    yerel SQLite'tır ve aynı makinedeki tüm worker'lar arasında paylaşılır.
+    Bellekte de değerin JSON hali tutulur ve her isabette yeni bir kopya
+    döner; çağıranlar sonucu yerinde değiştirse de önbellek etkilenmez.
+    Önbellek çağrı başına isteğe bağlıdır: provider çağrılarına cache_ttl
+    verilmedikçe hiçbir şey saklanmaz. İsabet eden isteklerin orijinal token
+    kullanımı "tokens_saved" olarak sayılır.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "sqlite_hits": 0, "misses": 0, "stores": 0, "tokens_saved": 0}
+        get_local_db(self.db_path).executescript(_SCHEMA)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(bulundu mu, değer) döndürür; süresi dolmuş kayıtlar yok sayılır"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, serialized, tokens = item
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    self._stats["tokens_saved"] += tokens
+                    return True, json.loads(serialized)
+                del self._memory[key]
+
+        db = get_local_db(self.db_path)
+        row = db.execute(
+            "SELECT value, tokens, expires_at FROM llm_response_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return False, None
+        db.execute("UPDATE llm_response_cache SET hits = hits + 1 WHERE key = ?", (key,))
+        self._remember(key, row["expires_at"], row["value"], row["tokens"])
+        self._count("sqlite_hits")
+        self._count("tokens_saved", row["tokens"])
+        return True, json.loads(row["value"])
+
+    def set(self, key: str, value: Any, ttl: float, provider: str = "", model: str = "", tokens: int = 0) -> None:
+        now = time.time()
+        expires_at = now + ttl
+        serialized = json.dumps(value, ensure_ascii=False)
+        self._remember(key, expires_at, serialized, tokens)
+        get_local_db(self.db_path).execute(
+            "INSERT OR REPLACE INTO llm_response_cache (key, provider, model, value, tokens, hits, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+            (key, provider, model, serialized, tokens, now, expires_at),
+        )
+        self._count("stores")
+
+    def _remember(self, key: str, expires_at: float, serialized: str, tokens: int) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, serialized, tokens)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        cur = get_local_db(self.db_path).execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (time.time(),))
+        return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        get_local_db(self.db_path).execute("DELETE FROM llm_response_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["sqlite_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["sqlite_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+def is_unparsed_fallback(value: Any) -> bool:
+    """chat_json'un JSON çözülemediğinde döndürdüğü {"raw": ...} sarmalayıcısı mı"""
+    return isinstance(value, dict) and set(value) == {"raw"}
+
+
+def cached_call(provider: str, model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int,
+                schema: Optional[Dict[str, Any]], cache_ttl: Optional[float], produce) -> Any:
+    """cache_ttl verilmişse önbellekten döner, yoksa produce() -> (değer, token) çağırıp saklar
+
+    Önbelleğe alınmasa bile aynı anda uçuşta olan özdeş istekler tek çağrıyı paylaşır.
+    Çözülemeyen yanıtlar ({"raw": ...}) saklanmaz; sonraki istek modeli yeniden çağırır.
+    """
+    key = cache_key(provider, model, messages, temperature, max_tokens, schema)
+    if not cache_ttl or not RESPONSE_CACHE_ENABLED:
+        return llm_flight.do(key, produce)[0]
+    found, value = response_cache.get(key)
+    if found:
+        return value
+
+    def _produce_and_store():
+        value, tokens = produce()
+        if is_unparsed_fallback(value):
+            return value, tokens
+        response_cache.set(key, value, cache_ttl, provider=provider, model=model, tokens=tokens)
+        return value, tokens
+
+    return llm_flight.do(key, _produce_and_store)[0]
+
+
+# Global instance
+response_cache = ResponseCache()
+llm_flight = SingleFlight("llm")
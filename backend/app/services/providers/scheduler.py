@@ -0,0 +1,460 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from ...utils.database import get_local_db
+
+# Öncelik sınıfları: küçük değer önce servis edilir
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Dakika başına istek (rpm) ve token (tpm) sınırları; APP_PROVIDER_LIMITS ile
+# JSON olarak ezilebilir. Anahtar "sağlayıcı" veya "sağlayıcı:model" olabilir:
+# {"openai": {"rpm": 3500, "tpm": 2000000}, "openai:gpt-4o": {"tpm": 450000}}
+DEFAULT_PROVIDER_LIMITS: Dict[str, Dict[str, float]] = {
+    "openai": {"rpm": 500, "tpm": 200000},
+    "gemini": {"rpm": 60, "tpm": 1000000},
+    "gemini_image": {"rpm": 10},
+    "fal": {"rpm": 60},
+    "stability": {"rpm": 30},
+}
+SCHEDULER_BACKEND = os.getenv("APP_SCHEDULER_BACKEND", "memory").lower()
+# Kovaların anlık patlama kapasitesi, dakikalık sınırın bu oranıdır
+SCHEDULER_BURST = float(os.getenv("APP_SCHEDULER_BURST", "0.25"))
+# Arka plan işleri kovanın bu oranını etkileşimli trafiğe bırakır (süreçler arası da geçerli)
+SCHEDULER_BACKGROUND_RESERVE = float(os.getenv("APP_SCHEDULER_BACKGROUND_RESERVE", "0.2"))
+SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("APP_SCHEDULER_MAX_WAIT", "60"))
+# 429 yanıtında Retry-After yoksa uygulanacak bekleme
+SCHEDULER_DEFAULT_BACKOFF_SECONDS = float(os.getenv("APP_SCHEDULER_DEFAULT_BACKOFF", "5"))
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("scheduler_priority", default=INTERACTIVE)
+_wait_meter: contextvars.ContextVar[Optional["QueueWaitMeter"]] = contextvars.ContextVar(
+    "scheduler_wait_meter", default=None
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduler_buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scheduler_blocks (
+    scope TEXT PRIMARY KEY,
+    until REAL NOT NULL
+);
+"""
+
+# (kova adı, kapasite, saniye başına dolum, maliyet, korunacak taban)
+Demand = Tuple[str, float, float, float, float]
+
+
+class RateLimitTimeout(RuntimeError):
+    pass
+
+
+class QueueWaitMeter:
+    """Bir çağrının yerel kovalarda beklediği süre; devre kesici gecikmesinden düşülür"""
+
+    __slots__ = ("seconds", "timed_out")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.timed_out = False
+
+
+@contextmanager
+def measure_queue_wait() -> Iterator[QueueWaitMeter]:
+    """Blok içindeki slot beklemelerini (ve RateLimitTimeout'u) ölçer"""
+    meter = QueueWaitMeter()
+    token = _wait_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _wait_meter.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def scheduler_priority(level: int) -> Iterator[None]:
+    """Bu blok içinde (ve kopyalanan context'lerde) yapılan çağrıların önceliğini belirler"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def load_limits() -> Dict[str, Dict[str, float]]:
+    limits = {key: dict(value) for key, value in DEFAULT_PROVIDER_LIMITS.items()}
+    raw = os.getenv("APP_PROVIDER_LIMITS", "")
+    if raw:
+        try:
+            for key, value in json.loads(raw).items():
+                limits.setdefault(key, {}).update(value)
+        except Exception as e:
+            print(f"⚠️ APP_PROVIDER_LIMITS could not be parsed: {str(e)}")
+    return limits
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int = 0) -> int:
+    """İstek için kaba token tahmini (~4 karakter/token) artı yanıt üst sınırı"""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + int(max_tokens)
+
+
+def _header(headers: Any, name: str) -> Optional[str]:
+    if headers is None:
+        return None
+    try:
+        value = headers.get(name)
+    except Exception:
+        return None
+    if value is None and isinstance(headers, Mapping):
+        for key, candidate in headers.items():
+            if str(key).lower() == name:
+                return candidate
+    return value
+
+
+def retry_after_seconds(headers: Any, default: float = SCHEDULER_DEFAULT_BACKOFF_SECONDS) -> float:
+    """retry-after-ms / retry-after (saniye veya HTTP tarihi) başlığından bekleme süresi"""
+    value = _header(headers, "retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = _header(headers, "retry-after")
+    if value is not None:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except Exception:
+                pass
+    return default
+
+
+def throttle_delay(exc: BaseException) -> Optional[float]:
+    """Hata bir 429 ise uyulması gereken bekleme süresini, değilse None döndürür"""
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code  # google api_core / google-genai hataları
+    if status != 429:
+        return None
+    return retry_after_seconds(getattr(response, "headers", None))
+
+
+class MemoryBucketBackend:
+    """Süreç içi kova durumu (varsayılan)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels: Dict[str, Tuple[float, float]] = {}
+        self._blocks: Dict[str, float] = {}
+
+    def try_acquire(self, demands: List[Demand], scopes: List[str]) -> float:
+        """Tüm kovalardan birlikte düşer ve 0 döner; yetmiyorsa beklenmesi gereken süreyi döner"""
+        now = time.time()
+        with self._lock:
+            blocked = max((self._blocks.get(scope, 0.0) for scope in scopes), default=0.0)
+            if blocked > now:
+                return blocked - now
+            levels = {}
+            wait = 0.0
+            for name, capacity, rate, cost, floor in demands:
+                level, updated = self._levels.get(name, (capacity, now))
+                level = min(capacity, level + (now - updated) * rate)
+                levels[name] = level
+                if level - cost < floor:
+                    wait = max(wait, (cost + floor - level) / rate)
+            if wait > 0:
+                return wait
+            for name, _, _, cost, _ in demands:
+                self._levels[name] = (levels[name] - cost, now)
+            return 0.0
+
+    def adjust(self, name: str, capacity: float, rate: float, delta: float) -> None:
+        now = time.time()
+        with self._lock:
+            level, updated = self._levels.get(name, (capacity, now))
+            level = min(capacity, level + (now - updated) * rate)
+            self._levels[name] = (min(capacity, level + delta), now)
+
+    def block(self, scope: str, until: float) -> None:
+        with self._lock:
+            self._blocks[scope] = max(until, self._blocks.get(scope, 0.0))
+
+    def blocked(self) -> Dict[str, float]:
+        now = time.time()
+        with self._lock:
+            return {scope: round(until - now, 2) for scope, until in self._blocks.items() if until > now}
+
+
+class SQLiteBucketBackend:
+    """Kova durumunu yerel SQLite'ta tutar; aynı makinedeki tüm worker'lar aynı kotayı paylaşır"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        get_local_db(self.db_path).executescript(_SCHEMA)
+
+    def try_acquire(self, demands: List[Demand], scopes: List[str]) -> float:
+        db = get_local_db(self.db_path)
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if scopes:
+                row = db.execute(
+                    f"SELECT MAX(until) AS until FROM scheduler_blocks WHERE scope IN ({','.join('?' * len(scopes))})",
+                    scopes,
+                ).fetchone()
+                if row["until"] is not None and row["until"] > now:
+                    db.execute("COMMIT")
+                    return row["until"] - now
+            levels = {}
+            wait = 0.0
+            for name, capacity, rate, cost, floor in demands:
+                row = db.execute("SELECT level, updated_at FROM scheduler_buckets WHERE name = ?", (name,)).fetchone()
+                level = capacity if row is None else min(capacity, row["level"] + (now - row["updated_at"]) * rate)
+                levels[name] = level
+                if level - cost < floor:
+                    wait = max(wait, (cost + floor - level) / rate)
+            if wait == 0:
+                for name, _, _, cost, _ in demands:
+                    db.execute(
+                        "INSERT OR REPLACE INTO scheduler_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                        (name, levels[name] - cost, now),
+                    )
+            db.execute("COMMIT")
+            return wait
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def adjust(self, name: str, capacity: float, rate: float, delta: float) -> None:
+        db = get_local_db(self.db_path)
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT level, updated_at FROM scheduler_buckets WHERE name = ?", (name,)).fetchone()
+            level = capacity if row is None else min(capacity, row["level"] + (now - row["updated_at"]) * rate)
+            db.execute(
+                "INSERT OR REPLACE INTO scheduler_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                (name, min(capacity, level + delta), now),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def block(self, scope: str, until: float) -> None:
+        get_local_db(self.db_path).execute(
+            "INSERT INTO scheduler_blocks (scope, until) VALUES (?, ?) "
+            "ON CONFLICT(scope) DO UPDATE SET until = MAX(until, excluded.until)",
+            (scope, until),
+        )
+
+    def blocked(self) -> Dict[str, float]:
+        now = time.time()
+        rows = get_local_db(self.db_path).execute(
+            "SELECT scope, until FROM scheduler_blocks WHERE until > ?", (now,)
+        ).fetchall()
+        return {row["scope"]: round(row["until"] - now, 2) for row in rows}
+
+
+class _Lane:
+    """Aynı sağlayıcı/model için bekleyenlerin (öncelik, geliş sırası) kuyruğu"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap: List[Tuple[int, int]] = []
+
+
+class SchedulerSlot:
+    def __init__(self, scheduler: "ProviderScheduler", token_buckets: List[Tuple[str, float, float]], estimate: int):
+        self._scheduler = scheduler
+        self._token_buckets = token_buckets
+        self._estimate = estimate
+
+    def record_usage(self, tokens: int) -> None:
+        """Gerçek token kullanımını bildirir; tahminle farkı kovalara iade/borç olarak yansır"""
+        if not tokens or not self._token_buckets:
+            return
+        delta = self._estimate - int(tokens)
+        for name, capacity, rate in self._token_buckets:
+            self._scheduler.backend.adjust(name, capacity, rate, delta)
+        self._estimate = int(tokens)
+
+
+class ProviderScheduler:
+    """Dış LLM ve görsel çağrıları için sağlayıcı/model bazlı token-bucket zamanlayıcı
+
+    Her çağrı önce sağlayıcının (ve tanımlıysa modelin) istek ve token kovalarından
+    pay alır. Aynı sağlayıcı/model için bekleyenler (öncelik, geliş sırası) ile
+    sıralanır ve yalnızca kuyruğun başı kovayı dener; böylece etkileşimli istekler
+    arka plan işlerinin önüne geçer ve kimse aç kalmaz. Arka plan işleri ayrıca
+    kovanın bir kısmını etkileşimli trafiğe bırakır. 429 alındığında Retry-After
+    süresi boyunca kapsam (model veya sağlayıcı) tamamen bloklanır. Kova durumu
+    bellek (varsayılan) veya SQLite backend'inde tutulur; SQLite ile aynı
+    makinedeki tüm worker'lar tek kotayı paylaşır.
+    """
+
+    def __init__(self, backend: Any = None, limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_wait: float = SCHEDULER_MAX_WAIT_SECONDS):
+        if backend is None:
+            backend = SQLiteBucketBackend() if SCHEDULER_BACKEND == "sqlite" else MemoryBucketBackend()
+        self.backend = backend
+        self.limits = limits if limits is not None else load_limits()
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._lanes: Dict[str, _Lane] = {}
+        self._seq = itertools.count()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _count(self, provider: str, name: str, amount: float = 1) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                provider, {"acquired": 0, "waited_seconds": 0.0, "timeouts": 0, "throttled": 0}
+            )
+            stats[name] += amount
+
+    def _lane(self, key: str) -> _Lane:
+        with self._lock:
+            if key not in self._lanes:
+                self._lanes[key] = _Lane()
+            return self._lanes[key]
+
+    def _buckets(self, provider: str, model: Optional[str], unit: str) -> List[Tuple[str, float, float]]:
+        """(kova adı, kapasite, saniye başına dolum) listesi"""
+        buckets = []
+        for key in (provider, f"{provider}:{model}" if model else None):
+            per_minute = (self.limits.get(key) or {}).get(unit) if key else None
+            if per_minute:
+                capacity = max(1.0, per_minute * SCHEDULER_BURST)
+                buckets.append((f"{unit}:{key}", capacity, per_minute / 60.0))
+        return buckets
+
+    def _demands(self, provider: str, model: Optional[str], tokens: int, priority: int) -> List[Demand]:
+        reserve = SCHEDULER_BACKGROUND_RESERVE if priority > INTERACTIVE else 0.0
+        # Rezerv en fazla capacity - 1 olur; küçük kovalarda arka plan işleri dolu kovadan yine pay alır
+        demands = [
+            (name, cap, rate, 1.0, min(cap * reserve, cap - 1.0))
+            for name, cap, rate in self._buckets(provider, model, "rpm")
+        ]
+        if tokens:
+            for name, cap, rate in self._buckets(provider, model, "tpm"):
+                # Kapasiteden büyük istekler kovayı tamamen boşaltır ama sonsuza dek beklemez
+                cost = min(float(tokens), cap * (1 - reserve))
+                demands.append((name, cap, rate, cost, cap * reserve))
+        return demands
+
+    @staticmethod
+    def _scopes(provider: str, model: Optional[str]) -> List[str]:
+        return [provider, f"{provider}:{model}"] if model else [provider]
+
+    def acquire(self, provider: str, model: Optional[str] = None, tokens: int = 0,
+                priority: Optional[int] = None) -> SchedulerSlot:
+        """Kovalardan pay alınana kadar bekler; max_wait aşılırsa RateLimitTimeout"""
+        priority = current_priority() if priority is None else priority
+        demands = self._demands(provider, model, tokens, priority)
+        scopes = self._scopes(provider, model)
+        lane = self._lane(f"{provider}:{model or ''}")
+        ticket = (priority, next(self._seq))
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        with lane.cond:
+            heapq.heappush(lane.heap, ticket)
+            try:
+                while True:
+                    wait = None
+                    if lane.heap[0] == ticket:
+                        wait = self.backend.try_acquire(demands, scopes)
+                        if wait <= 0:
+                            break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count(provider, "timeouts")
+                        self._meter_wait(time.monotonic() - start, timed_out=True)
+                        raise RateLimitTimeout(
+                            f"{provider}{':' + model if model else ''} rate limit wait exceeded {self.max_wait:.0f}s"
+                        )
+                    lane.cond.wait(min(wait, remaining) if wait is not None else remaining)
+            finally:
+                lane.heap.remove(ticket)
+                heapq.heapify(lane.heap)
+                lane.cond.notify_all()
+        waited = time.monotonic() - start
+        self._count(provider, "acquired")
+        self._count(provider, "waited_seconds", waited)
+        self._meter_wait(waited)
+        return SchedulerSlot(self, [(n, c, r) for n, c, r, _, _ in demands if n.startswith("tpm:")], tokens)
+
+    @staticmethod
+    def _meter_wait(seconds: float, timed_out: bool = False) -> None:
+        meter = _wait_meter.get()
+        if meter is not None:
+            meter.seconds += seconds
+            meter.timed_out = meter.timed_out or timed_out
+
+    def penalize(self, provider: str, model: Optional[str] = None, seconds: float = SCHEDULER_DEFAULT_BACKOFF_SECONDS) -> None:
+        """Sağlayıcı 429 döndürdüğünde kapsamı verilen süre boyunca bloklar"""
+        scope = f"{provider}:{model}" if model else provider
+        self.backend.block(scope, time.time() + seconds)
+        self._count(provider, "throttled")
+        print(f"⏳ {scope} throttled by provider, pausing {seconds:.1f}s")
+
+    @contextmanager
+    def slot(self, provider: str, model: Optional[str] = None, tokens: int = 0,
+             priority: Optional[int] = None) -> Iterator[SchedulerSlot]:
+        """Çağrıyı kovalardan geçirir; blok içinden 429 hatası çıkarsa Retry-After'a uyar"""
+        slot = self.acquire(provider, model, tokens, priority)
+        try:
+            yield slot
+        except Exception as e:
+            delay = throttle_delay(e)
+            if delay is not None:
+                self.penalize(provider, model, delay)
+            raise
+
+    @asynccontextmanager
+    async def aslot(self, provider: str, model: Optional[str] = None, tokens: int = 0,
+                    priority: Optional[int] = None):
+        """slot()'un async karşılığı; bekleme event loop'u bloklamadan thread'de yapılır"""
+        slot = await asyncio.to_thread(self.acquire, provider, model, tokens, priority)
+        try:
+            yield slot
+        except Exception as e:
+            delay = throttle_delay(e)
+            if delay is not None:
+                self.penalize(provider, model, delay)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = {name: dict(values) for name, values in self._stats.items()}
+            waiting = {key: len(lane.heap) for key, lane in self._lanes.items() if lane.heap}
+        for values in providers.values():
+            values["waited_seconds"] = round(values["waited_seconds"], 3)
+        return {
+            "backend": type(self.backend).__name__,
+            "providers": providers,
+            "waiting": waiting,
+            "blocked": self.backend.blocked(),
+        }
+
+
+# Global instance
+provider_scheduler = ProviderScheduler()
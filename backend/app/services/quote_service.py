@@ -1,12 +1,15 @@
 import os
 import random
 from typing import Dict, List, Optional
-from .providers.llm_gemini import GeminiLLMProvider
+from .providers.registry import provider_registry
+
+# Aynı duygu ve günlük içeriği için üretilen söz bu süre boyunca tekrar kullanılır
+QUOTE_CACHE_TTL = 3600
 
 class QuoteService:
     def __init__(self):
         try:
-            self.llm = GeminiLLMProvider()
+            self.llm = provider_registry.gemini_llm()
             self.llm_available = True
         except (ValueError, RuntimeError):
             # If Gemini API key is not available, use fallback mode
@@ -90,7 +93,7 @@ class QuoteService:
             prompt = self._create_quote_prompt(emotion_category, diary_content)
             
             # Generate quote using Gemini
-            response = self.llm.chat(
+            response = self.llm.chat_text(
                 model="gemini-1.5-flash",
                 messages=[
                     {
@@ -103,7 +106,8 @@ class QuoteService:
                     }
                 ],
                 temperature=0.7,
-                max_tokens=150
+                max_tokens=150,
+                cache_ttl=QUOTE_CACHE_TTL
             )
             
             # Parse the response to extract quote and author
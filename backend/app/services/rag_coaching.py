@@ -5,10 +5,17 @@ from typing import List, Dict, Optional
 from datetime import datetime
 import uuid
 from sentence_transformers import SentenceTransformer
-from .providers.embed_openai import OpenAIEmbeddingsProvider
+from .providers.registry import provider_registry
+from ..utils.database import get_local_db
+from ..utils.singleflight import SingleFlight, flight_key
 import numpy as np
 # Explainable AI import'u lazy loading ile yapılacak
 
+# Aynı anda gelen özdeş embedding/retrieval/analiz istekleri tek hesaplamayı paylaşır
+embedding_flight = SingleFlight("embeddings")
+retrieval_flight = SingleFlight("retrieval")
+coaching_flight = SingleFlight("coaching")
+
 class RAGCoachingService:
     def __init__(self):
         """RAG tabanlı coaching servisi başlatıcısı"""
@@ -17,7 +24,7 @@ class RAGCoachingService:
         # Prefer OpenAI embeddings if available; fallback to local SBERT
         self.embedding_provider = None
         try:
-            self.embedding_provider = OpenAIEmbeddingsProvider()
+            self.embedding_provider = provider_registry.openai_embeddings()
         except Exception:
             self.embedding_provider = None
         self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2') if self.embedding_provider is None else None
@@ -31,6 +38,11 @@ class RAGCoachingService:
                 metadata={"description": "Günlük girdileri için vektör veritabanı"}
             )
         
+        # Kullanıcı başına indeks nesli: kullanıcının vektörleri her değiştiğinde artar
+        get_local_db().execute(
+            "CREATE TABLE IF NOT EXISTS vector_index_generations (user_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+        
         # Demo verileri yükle
         self._load_demo_data()
     
@@ -135,6 +147,83 @@ class RAGCoachingService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def index_generation(self, user_id: str) -> int:
+        """Kullanıcının indeks nesli; buna bağlı önbellekler değişimde geçersiz olur"""
+        row = get_local_db().execute(
+            "SELECT generation FROM vector_index_generations WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row["generation"] if row else 0
+
+    def _bump_generation(self, *user_ids: str) -> None:
+        for user_id in {u for u in user_ids if u}:
+            get_local_db().execute(
+                "INSERT INTO vector_index_generations (user_id, generation) VALUES (?, 1) "
+                "ON CONFLICT(user_id) DO UPDATE SET generation = generation + 1",
+                (user_id,),
+            )
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Metin listesini tek çağrıda vektörleştirir (OpenAI veya yerel SBERT)"""
+        if not texts:
+            return []
+        return embedding_flight.do(flight_key(texts), self._compute_embeddings, texts)
+
+    def _compute_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self.embedding_provider is not None:
+            return self.embedding_provider.embed(texts)
+        return self.embedding_model.encode(texts).tolist()
+
+    @staticmethod
+    def _build_metadata(emotion: str, date: str, location: str, tags: List[str], user_id: str) -> Dict:
+        return {
+            "emotion": emotion,
+            "date": date,
+            "location": location,
+            "tags": json.dumps(tags or []),
+            "created_at": datetime.now().isoformat(),
+            "user_id": user_id
+        }
+
+    def add_diary_entries(self, entries: List[Dict], user_id: str, batch_size: int = 64) -> Dict:
+        """Birden fazla günlük girdisini toplu embedding ile vektör veritabanına ekler
+
+        Her giriş: entry_id, content, emotion, date, location, tags alanlarını içerir.
+        Embedding'ler batch_size'lık gruplar halinde tek istekte üretilir.
+        """
+        indexed = 0
+        errors: List[str] = []
+        items = [e for e in entries if e.get("content")]
+        for start in range(0, len(items), batch_size):
+            chunk = items[start:start + batch_size]
+            try:
+                embeddings = self._embed_texts([e["content"] for e in chunk])
+                self.collection.upsert(
+                    embeddings=embeddings,
+                    documents=[e["content"] for e in chunk],
+                    metadatas=[
+                        self._build_metadata(
+                            e.get("emotion") or "",
+                            e.get("date") or datetime.now().strftime('%Y-%m-%d'),
+                            e.get("location") or "",
+                            e.get("tags") or [],
+                            user_id,
+                        )
+                        for e in chunk
+                    ],
+                    ids=[e.get("entry_id") or str(uuid.uuid4()) for e in chunk]
+                )
+                indexed += len(chunk)
+            except Exception as e:
+                errors.append(f"Toplu ekleme hatası ({len(chunk)} girdi): {str(e)}")
+
+        if indexed:
+            self._bump_generation(user_id)
+        return {
+            "success": not errors,
+            "indexed_count": indexed,
+            "errors": errors
+        }
+
     def add_diary_entry(self, content: str, emotion: str, date: str, 
                        location: str = "", tags: List[str] = None, entry_id: str = None, user_id: str = "demo_user") -> Dict:
         """Yeni günlük girdisini vektör veritabanına ekler"""
@@ -146,28 +235,19 @@ class RAGCoachingService:
                 tags = []
             
             # Metadata oluştur
-            metadata = {
-                "emotion": emotion,
-                "date": date,
-                "location": location,
-                "tags": json.dumps(tags),
-                "created_at": datetime.now().isoformat(),
-                "user_id": user_id
-            }
+            metadata = self._build_metadata(emotion, date, location, tags, user_id)
             
             # Embedding oluştur
-            if self.embedding_provider is not None:
-                embedding = self.embedding_provider.embed([content])[0]
-            else:
-                embedding = self.embedding_model.encode(content).tolist()
+            embedding = self._embed_texts([content])[0]
             
-            # ChromaDB'ye ekle
-            self.collection.add(
+            # ChromaDB'ye ekle; aynı ID varsa (içerik düzenlemesi) vektör değiştirilir
+            self.collection.upsert(
                 embeddings=[embedding],
                 documents=[content],
                 metadatas=[metadata],
                 ids=[entry_id]
             )
+            self._bump_generation(user_id)
             
             return {
                 "success": True,
@@ -181,14 +261,23 @@ class RAGCoachingService:
                 "error": f"Günlük girdisi eklenirken hata: {str(e)}"
             }
     
-    def query_diary(self, question: str, top_k: int = 5, user_id: Optional[str] = None) -> Dict:
-        """Kullanıcı sorusuna göre günlük girdilerini sorgular"""
+    def query_diary(self, question: str, top_k: int = 5, user_id: Optional[str] = None,
+                    query_embedding: Optional[List[float]] = None) -> Dict:
+        """Kullanıcı sorusuna göre günlük girdilerini sorgular
+
+        query_embedding verilirse soru tekrar vektörleştirilmez.
+        """
+        # Aynı soru aynı embedding'i üreteceğinden anahtara embedding eklenmez
+        return retrieval_flight.do(
+            flight_key("query", question, top_k, user_id), self._query_diary, question, top_k, user_id, query_embedding
+        )
+
+    def _query_diary(self, question: str, top_k: int, user_id: Optional[str],
+                     query_embedding: Optional[List[float]]) -> Dict:
         try:
             # Soruyu vektörleştir
-            if self.embedding_provider is not None:
-                query_embedding = self.embedding_provider.embed([question])[0]
-            else:
-                query_embedding = self.embedding_model.encode(question).tolist()
+            if query_embedding is None:
+                query_embedding = self._embed_texts([question])[0]
             
             # Benzer girdileri bul
             where_filter = {"user_id": user_id} if user_id else None
@@ -203,6 +292,7 @@ class RAGCoachingService:
             formatted_results = []
             for i in range(len(results['documents'][0])):
                 formatted_results.append({
+                    "id": results['ids'][0][i],
                     "content": results['documents'][0][i],
                     "metadata": results['metadatas'][0][i],
                     "similarity_score": 1 - results['distances'][0][i]  # Mesafeyi benzerlik skoruna çevir
@@ -220,6 +310,45 @@ class RAGCoachingService:
                 "error": f"Sorgu sırasında hata: {str(e)}"
             }
 
+    def get_entries(self, entry_ids: List[str]) -> List[Dict]:
+        """ID'leri verilen vektör kayıtlarını query_diary sonuç biçiminde, verilen sırayla döndürür"""
+        if not entry_ids:
+            return []
+        records = self.collection.get(ids=list(entry_ids), include=["documents", "metadatas"])
+        by_id = {
+            rid: {"id": rid, "content": doc, "metadata": meta or {}}
+            for rid, doc, meta in zip(records.get('ids', []), records.get('documents', []), records.get('metadatas', []))
+        }
+        return [by_id[rid] for rid in entry_ids if rid in by_id]
+
+    def get_vector_metadata(self, entry_ids: List[str]) -> Dict[str, Dict]:
+        """Verilen ID'ler için vektör veritabanındaki metadata'yı döndürür (ID -> metadata)"""
+        if not entry_ids:
+            return {}
+        try:
+            records = self.collection.get(ids=list(entry_ids), include=["metadatas"])
+            return {
+                rid: (meta or {})
+                for rid, meta in zip(records.get('ids', []), records.get('metadatas', []))
+            }
+        except Exception as e:
+            print(f"⚠️ Vector metadata lookup failed: {str(e)}")
+            return {}
+
+    def update_entry_metadata(self, entry_id: str, updates: Dict) -> Dict:
+        """Mevcut vektörün metadata'sını embedding'e dokunmadan günceller"""
+        try:
+            existing = self.collection.get(ids=[entry_id], include=["metadatas"])
+            if not existing.get('ids'):
+                return {"success": False, "error": "Vektör bulunamadı"}
+            metadata = dict(existing['metadatas'][0] or {})
+            metadata.update(updates)
+            self.collection.update(ids=[entry_id], metadatas=[metadata])
+            self._bump_generation(metadata.get("user_id"))
+            return {"success": True, "entry_id": entry_id}
+        except Exception as e:
+            return {"success": False, "error": f"Metadata güncellenirken hata: {str(e)}"}
+
     def sync_user_diaries_from_firestore(self, user_id: str) -> Dict:
         """Firestore'daki kullanıcının günlüklerini ChromaDB'ye indeksler."""
         try:
@@ -268,6 +397,9 @@ class RAGCoachingService:
     
     def get_emotional_insights(self, user_id: str = None) -> Dict:
         """Kullanıcının duygu durumu analizini yapar"""
+        return coaching_flight.do(flight_key("insights", user_id), self._get_emotional_insights, user_id)
+
+    def _get_emotional_insights(self, user_id: Optional[str]) -> Dict:
         try:
             # Tüm girdileri al
             if user_id:
@@ -320,6 +452,9 @@ class RAGCoachingService:
     
     def generate_personalized_advice(self, question: str) -> Dict:
         """Kullanıcı sorusuna göre kişiselleştirilmiş tavsiye üretir"""
+        return coaching_flight.do(flight_key("advice", question), self._generate_personalized_advice, question)
+
+    def _generate_personalized_advice(self, question: str) -> Dict:
         try:
             # İlgili günlük girdilerini bul
             relevant_entries = self.query_diary(question, top_k=3)
@@ -385,6 +520,28 @@ class RAGCoachingService:
         else:
             return "Günlük girdilerinizi analiz ederek size özel tavsiyeler sunmaya çalışıyorum. Daha spesifik sorular sorarsanız, size daha detaylı öneriler verebilirim."
 
+    def delete_entries(self, entry_ids: Optional[List[str]] = None, user_id: Optional[str] = None) -> Dict:
+        """Vektörleri ID listesiyle veya kullanıcının tümünü siler; olmayan ID'ler yok sayılır"""
+        try:
+            if entry_ids:
+                owners = [meta.get("user_id") for meta in self.get_vector_metadata(entry_ids).values()]
+                self.collection.delete(ids=list(entry_ids))
+                self._bump_generation(*owners)
+            elif user_id:
+                self.collection.delete(where={"user_id": user_id})
+                self._bump_generation(user_id)
+            else:
+                return {"success": False, "error": "entry_ids veya user_id gerekli"}
+            return {"success": True}
+        except Exception as e:
+            return {"success": False, "error": f"Vektör silinirken hata: {str(e)}"}
+
+    def count(self) -> int:
+        try:
+            return self.collection.count()
+        except Exception:
+            return -1
+
     def clear_demo_data(self) -> Dict:
         """Demo verilerini temizler"""
         try:
@@ -392,6 +549,7 @@ class RAGCoachingService:
             self.collection.delete(
                 where={"user_id": "demo_user"}
             )
+            self._bump_generation("demo_user")
             return {"success": True, "message": "Demo data cleared successfully"}
         except Exception as e:
             return {"success": False, "error": f"Failed to clear demo data: {str(e)}"}
@@ -1,7 +1,11 @@
+import os
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from .providers.llm_openai import OpenAILLMProvider
+from .providers.registry import provider_registry
+from .providers.response_cache import RESPONSE_CACHE_ENABLED, cache_key, response_cache
+from ..utils.json_stream import JsonObjectStream
+from ..utils.singleflight import SingleFlight, flight_key
 
 
 THERAPY_SCHEMA: Dict[str, Any] = {
@@ -90,9 +94,15 @@ THERAPY_SCHEMA: Dict[str, Any] = {
 }
 
 
-def analyze_diary_openai(text: str, locale: str = "tr", model: str = "gpt-4o-mini") -> Dict[str, Any]:
-    start = time.time()
-    llm = OpenAILLMProvider()
+# Güncel terapi analizi şema sürümü; girişlerde "analysis_v" alanına yazılır
+ANALYSIS_VERSION = "v2_therapy"
+# Yönlendirici LLM'e gerek görmediğinde yazılan yerel (DistilBERT + sezgisel) analiz sürümü
+LOCAL_ANALYSIS_VERSION = "v2_local"
+# Aynı metnin terapi analizi (ör. yeniden denemeler, import kopyaları) bu süre önbellekten döner
+ANALYSIS_CACHE_TTL = float(os.getenv("APP_ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def build_therapy_messages(text: str, locale: str = "tr") -> List[Dict[str, str]]:
     system_prompt = (
         "Kısa, empatik ve kanıta dayalı bir terapist gibi analiz yap. Klinisyen değilsin; teşhis koyma. "
         "Her iddiayı metinden bir kanıt cümlesiyle ilişkilendir. Risk ipuçları varsa nazikçe işaret et."
@@ -100,21 +110,76 @@ def analyze_diary_openai(text: str, locale: str = "tr", model: str = "gpt-4o-min
     user_prompt = (
         f"Dil: {locale}. Aşağıdaki günlük/rüya metnini analiz et ve şemaya tam uyan JSON döndür:\n\n{text}"
     )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+analysis_flight = SingleFlight("analysis")
+
+
+def analyze_diary_openai(text: str, locale: str = "tr", model: str = "gpt-4o-mini") -> Dict[str, Any]:
+    # Aynı metin için eşzamanlı analizler (ör. import kopyaları) tek çağrıyı paylaşır
+    return analysis_flight.do(flight_key(text, locale, model), _analyze_diary_openai, text, locale, model)
 
+
+def _analyze_diary_openai(text: str, locale: str, model: str) -> Dict[str, Any]:
+    start = time.time()
+    llm = provider_registry.openai_llm()
     data = llm.chat_json(
         model=model,
         schema=THERAPY_SCHEMA,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=build_therapy_messages(text, locale),
         temperature=0.2,
         max_tokens=900,
+        cache_ttl=ANALYSIS_CACHE_TTL,
     )
     latency_ms = int((time.time() - start) * 1000)
+    return finalize_analysis(data, model, latency_ms)
+
+
+def analyze_diary_openai_stream(text: str, locale: str = "tr", model: str = "gpt-4o-mini") -> Iterator[Tuple[str, Any]]:
+    """Terapi analizinin tepe seviye alanlarını tamamlandıkça (alan, değer) olarak üretir
+
+    Alanlar şema sırasıyla gelir (önce affect, sonra themes, ...). Önbellekte
+    aynı metnin analizi varsa alanlar doğrudan oradan döner; tamamlanan akış
+    analyze_diary_openai ile aynı anahtarla önbelleğe yazılır. Akış ilk alandan
+    önce başarısız olursa yedek modelli normal çağrıya geri dönülür.
+    """
+    messages = build_therapy_messages(text, locale)
+    key = cache_key("openai", model, messages, 0.2, 900, THERAPY_SCHEMA)
+    if RESPONSE_CACHE_ENABLED:
+        found, cached = response_cache.get(key)
+        if found and isinstance(cached, dict):
+            yield from cached.items()
+            return
+
+    parser = JsonObjectStream()
+    fields: Dict[str, Any] = {}
+    try:
+        for delta in provider_registry.openai_llm().stream_json_sync(
+            messages, schema=THERAPY_SCHEMA, model=model, temperature=0.2, max_tokens=900
+        ):
+            for field, value in parser.feed(delta):
+                fields[field] = value
+                yield field, value
+    except Exception as e:
+        if fields:
+            raise
+        print(f"⚠️ Streaming analysis failed, falling back: {str(e)}")
+        yield from analyze_diary_openai(text, locale, model).items()
+        return
+
+    if RESPONSE_CACHE_ENABLED and all(field in fields for field in THERAPY_SCHEMA["required"]):
+        response_cache.set(key, fields, ANALYSIS_CACHE_TTL, provider="openai", model=model)
+
+
+def finalize_analysis(data: Any, model: str, latency_ms: Optional[int] = None) -> Any:
+    # Girdi önbellekten/paylaşılan çağrıdan gelebilir; yerinde değiştirilmez
     if isinstance(data, dict):
-        data.setdefault("provider_meta", {})
-        data["provider_meta"].update({"model": model, "latency_ms": latency_ms})
+        meta = {**(data.get("provider_meta") or {}), "model": model, "latency_ms": latency_ms}
+        return {**data, "provider_meta": meta}
     return data
 
 
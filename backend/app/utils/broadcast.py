@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class Broadcaster:
+    """Thread'lerden yayınlanan olayları event loop'taki abonelere ileten süreç içi pub/sub
+
+    Abone, kendi event loop'unda subscribe() ile bir asyncio.Queue alır;
+    publish() herhangi bir thread'den (ör. iş kuyruğu worker'ı) çağrılabilir ve
+    olayı call_soon_threadsafe ile her abonenin kuyruğuna bırakır. Olaylar
+    saklanmaz: abone yokken yayınlananlar kaybolur (kalıcı durum ayrıca yazılmalı).
+    """
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def subscribe(self, topic: str) -> Tuple[asyncio.Queue, Callable[[], None]]:
+        """(kuyruk, aboneliği bitiren fonksiyon) döndürür; event loop içinden çağrılmalı"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.max_queue))
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(subscriber)
+
+        def _unsubscribe() -> None:
+            with self._lock:
+                subscribers = self._subscribers.get(topic) or []
+                if subscriber in subscribers:
+                    subscribers.remove(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(topic, None)
+
+        return subscriber[1], _unsubscribe
+
+    def publish(self, topic: str, event: Any) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic) or [])
+        delivered = 0
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+                delivered += 1
+            except RuntimeError:
+                # Abonenin event loop'u kapanmış
+                pass
+        return delivered
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: Any) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
@@ -1 +1,33 @@
-# Bu dosya Firestore/Firebase tabanlı projede gereksizdir, içeriği kaldırıldı. 
\ No newline at end of file
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+# Yerel (süreç dışına taşan ama makineye özel) durum için SQLite dosyası:
+# iş kuyruğu, önbellekler vb. Aynı makinedeki tüm worker'lar bu dosyayı paylaşır.
+LOCAL_DB_PATH = os.getenv("APP_LOCAL_DB_PATH", "./memorymap_local.sqlite3")
+
+_thread_local = threading.local()
+
+
+def get_local_db(path: Optional[str] = None) -> sqlite3.Connection:
+    """Thread başına tekrar kullanılan bir SQLite bağlantısı döndürür
+
+    WAL modu birden çok süreçten eşzamanlı okuma/yazmaya izin verir;
+    busy_timeout kilit çekişmesinde hemen hata vermek yerine bekletir.
+    """
+    path = path or LOCAL_DB_PATH
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        connections[path] = conn
+    return conn
@@ -0,0 +1,59 @@
+import io
+from typing import Any, Dict, List, Sequence
+
+try:
+    from PIL import Image, features
+except Exception:  # pragma: no cover
+    Image = None  # type: ignore
+    features = None  # type: ignore
+
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+# Kodlayıcı kaliteleri: AVIF aynı görsel kalitede daha düşük değerle yetinir
+QUALITY = {"webp": 80, "avif": 55}
+
+
+def avif_supported() -> bool:
+    """Pillow AVIF kodlayıcısıyla derlenmişse (Pillow >= 11.2) True"""
+    if features is None:
+        return False
+    try:
+        return bool(features.check("avif"))
+    except Exception:
+        return False
+
+
+def available_formats() -> List[str]:
+    return ["webp", "avif"] if avif_supported() else ["webp"]
+
+
+def render_renditions(image_bytes: bytes, widths: Sequence[int], formats: Sequence[str]) -> List[Dict[str, Any]]:
+    """Görseli verilen genişliklere küçültüp her formatta kodlar
+
+    Süreç havuzunda çalışacak şekilde saf bir fonksiyondur (yalnızca bayt alır
+    ve döndürür). Orijinalden geniş olmayan hedefler üretilmez; en küçük hedef
+    bile orijinalden genişse orijinal genişlikte tek bir rendition üretilir.
+    Dönen her eleman: format, width, height, content_type, data.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required for image derivatives. Run: pip install pillow")
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source.load()
+        has_alpha = source.mode in ("RGBA", "LA") or (source.mode == "P" and "transparency" in source.info)
+        image = source.convert("RGBA" if has_alpha else "RGB")
+
+    targets = sorted({w for w in widths if 0 < w < image.width}) or [image.width]
+    renditions: List[Dict[str, Any]] = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=QUALITY.get(fmt, 80))
+            renditions.append({
+                "format": fmt,
+                "width": width,
+                "height": height,
+                "content_type": CONTENT_TYPES.get(fmt, f"image/{fmt}"),
+                "data": buffer.getvalue(),
+            })
+    return renditions
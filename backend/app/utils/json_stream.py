@@ -0,0 +1,99 @@
+import json
+from typing import Any, List, Tuple
+
+
+class _TopLevelStream:
+    """Parça parça gelen JSON metninde tepe seviyedeki üyeleri ayırıcılarına göre keser
+
+    Açılış karakterinden (dizi için '[', nesne için '{') önceki metin (ör. ```json
+    çiti) yok sayılır. Tepe seviyede ',' veya kapanış görüldüğü anda o üyenin
+    ham metni _parse()'a verilir; ayrıştırılamayan üyeler atlanır. done True
+    olduktan sonra gelen metin dikkate alınmaz.
+    """
+
+    OPEN = "["
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = 0
+        self.done = False
+        self.count = 0
+
+    def feed(self, text: str) -> List[Any]:
+        if self.done or not text:
+            return []
+        self.buffer += text
+        items: List[Any] = []
+        buf = self.buffer
+        while self._pos < len(buf):
+            ch = buf[self._pos]
+            if not self._started:
+                if ch == self.OPEN:
+                    self._started = True
+                    self._depth = 1
+                    self._item_start = self._pos + 1
+                self._pos += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._item_start:self._pos], items)
+                    self.done = True
+                    self._pos += 1
+                    break
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._item_start:self._pos], items)
+                self._item_start = self._pos + 1
+            self._pos += 1
+        return items
+
+    def _emit(self, raw: str, items: List[Any]) -> None:
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            items.append(self._parse(raw))
+            self.count += 1
+        except ValueError:
+            pass
+
+    def _parse(self, raw: str) -> Any:
+        return json.loads(raw)
+
+
+class JsonArrayStream(_TopLevelStream):
+    """Bir JSON dizisinin tamamlanan elemanlarını sırayla çıkarır (ör. LLM'in soru listesi)"""
+
+    OPEN = "["
+
+
+class JsonObjectStream(_TopLevelStream):
+    """Bir JSON nesnesinin tamamlanan tepe seviye alanlarını (anahtar, değer) olarak çıkarır
+
+    Yapılandırılmış çıktı akışında alanlar şemadaki sırayla tamamlandıkça
+    kullanılabilir; iç içe nesneler ancak tamamen kapandığında döner.
+    """
+
+    OPEN = "{"
+
+    def _parse(self, raw: str) -> Tuple[str, Any]:
+        member = json.loads("{" + raw + "}")
+        if len(member) != 1:
+            raise ValueError("expected a single member")
+        return next(iter(member.items()))
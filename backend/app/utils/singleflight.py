@@ -0,0 +1,111 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+_groups: Dict[str, "SingleFlight"] = {}
+_groups_lock = threading.Lock()
+
+
+def flight_key(*parts: Any) -> str:
+    """Argümanlardan kararlı bir anahtar üretir (uzun metinler için özetlenir)"""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _private(result: Any) -> Any:
+    """Bekleyenlere sonucun kendi kopyası verilir; biri yerinde değiştirse diğerleri etkilenmez"""
+    return copy.deepcopy(result) if isinstance(result, (dict, list)) else result
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "owner")
+
+    def __init__(self):
+        self.owner = threading.get_ident()
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Aynı anahtarla eşzamanlı gelen çağrıların tek bir hesaplamayı paylaşmasını sağlar
+
+    İlk çağıran (lider) işi yürütür; iş sürerken gelen aynı anahtarlı çağrılar
+    yeni iş başlatmak yerine liderin sonucunu (veya hatasını) bekler; dict/list
+    sonuçlar bekleyenlere kopya olarak döner. Sonuç saklanmaz; iş bitince
+    anahtar serbest kalır. Lider kendi işinin içinden aynı anahtarla tekrar
+    çağırırsa (ör. akış hatasında yedek çağrı) beklemeden doğrudan yürütülür. Thread'lerden do(), async
+    koddan do_async() kullanılır; async tarafta paylaşım aynı event loop içindedir.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+        with _groups_lock:
+            _groups[name] = self
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            # Aynı thread'de iç içe çağrı: kendini beklemek kilitlenme olurdu
+            nested = call is not None and call.owner == threading.get_ident()
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            elif not nested:
+                self._stats["coalesced"] += 1
+
+        if nested:
+            return fn(*args, **kwargs)
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return _private(call.result)
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            self._stats["calls"] += 1
+            task = self._tasks.get(loop_key)
+            if task is not None and not task.done():
+                self._stats["coalesced"] += 1
+            else:
+                task = asyncio.ensure_future(fn(*args, **kwargs))
+                self._tasks[loop_key] = task
+                task.add_done_callback(lambda t, k=loop_key: self._release(k, t))
+        # shield: bekleyenlerden biri iptal edilirse ortak iş diğerleri için sürer
+        return _private(await asyncio.shield(task))
+
+    def _release(self, loop_key: Tuple[int, Hashable], task: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(loop_key) is task:
+                del self._tasks[loop_key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls) + len(self._tasks)}
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,84 @@
+import hashlib
+from typing import Optional
+
+# Dosya başı imzası -> (content type, uzantı)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+)
+# Türü belirlemek için gereken en az bayt (WebP: RIFF....WEBP)
+SNIFF_BYTES = 12
+
+
+class UploadRejected(ValueError):
+    """Yükleme akış sırasında reddedildi; status_code HTTP yanıtı için"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_image_type(head: bytes) -> Optional[tuple]:
+    """İlk baytlardan (content type, uzantı) döndürür; desteklenmiyorsa None"""
+    for signature, content_type, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, ext
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    return None
+
+
+class UploadGuard:
+    """Akan yüklemeyi parça parça doğrular ve özetler
+
+    İlk SNIFF_BYTES bayt biriktiğinde imza kontrol edilir; desteklenmeyen tür
+    415, max_bytes aşımı 413 ile UploadRejected fırlatır. feed() yazılmaya hazır
+    baytları döndürür: tür belirlenene kadar baştaki baytlar tutulur, sonrasında
+    parçalar olduğu gibi geçer. Bellekte parça dışında yalnızca sha256 durumu kalır.
+    """
+
+    def __init__(self, max_bytes: int, declared_length: Optional[int] = None):
+        if declared_length is not None and declared_length > max_bytes:
+            raise UploadRejected(f"Image exceeds {max_bytes} bytes", 413)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self.extension: Optional[str] = None
+        self._head = b""
+        self._sha256 = hashlib.sha256()
+
+    def feed(self, chunk: bytes) -> bytes:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(f"Image exceeds {self.max_bytes} bytes", 413)
+        self._sha256.update(chunk)
+        if self.content_type is not None:
+            return chunk
+        self._head += chunk
+        if len(self._head) < SNIFF_BYTES:
+            return b""
+        self._detect()
+        head, self._head = self._head, b""
+        return head
+
+    def finish(self) -> bytes:
+        """Akış bitti; tür hâlâ belirlenmediyse (çok kısa dosya) son kontrolü yapar"""
+        if self.size == 0:
+            raise UploadRejected("Empty upload", 400)
+        if self.content_type is not None:
+            return b""
+        self._detect()
+        head, self._head = self._head, b""
+        return head
+
+    def _detect(self) -> None:
+        detected = sniff_image_type(self._head)
+        if detected is None:
+            raise UploadRejected("Unsupported image type (expected PNG, JPEG, WebP or GIF)", 415)
+        self.content_type, self.extension = detected
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Re-run diary analysis for entries whose analysis is missing or was produced
+by an older analysis version. Progress is checkpointed locally, so the script
+can be stopped and resumed with the same --name.
+"""
+
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+load_dotenv()
+
+from app.services.analysis_backfill import AnalysisBackfillRunner
+from app.services.job_queue import job_queue
+from app.services.text_analysis import ANALYSIS_VERSION
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill diary analysis to the current analysis version")
+    parser.add_argument("--name", default="default", help="Checkpoint name (reuse to resume)")
+    parser.add_argument("--target-version", default=ANALYSIS_VERSION)
+    parser.add_argument("--mode", choices=["sync", "batch"], default="sync",
+                        help="sync: rate-limited live calls, batch: OpenAI Batch API")
+    parser.add_argument("--rpm", type=float, default=30.0, help="Requests per minute in sync mode")
+    parser.add_argument("--token-budget", type=int, default=None, help="Stop this run after this many estimated tokens (the checkpoint keeps the lifetime total)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--user-id", default=None, help="Only backfill this user's entries")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most N entries in this run")
+    parser.add_argument("--dry-run", action="store_true", help="Only count candidates and estimated tokens")
+    parser.add_argument("--reset", action="store_true", help="Discard the checkpoint and start over")
+    parser.add_argument("--collect", action="store_true", help="Wait for submitted batches and write results")
+    parser.add_argument("--status", action="store_true", help="Show checkpoint and batch status")
+    parser.add_argument("--enqueue", action="store_true", help="Run in the API's background job queue instead")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    print("🔁 Analysis Backfill Utility")
+    print("=" * 40)
+
+    options = {
+        "name": args.name,
+        "target_version": args.target_version,
+        "requests_per_minute": args.rpm,
+        "token_budget": args.token_budget,
+        "mode": args.mode,
+        "batch_size": args.batch_size,
+        "user_id": args.user_id,
+        "limit": args.limit,
+        "dry_run": args.dry_run,
+    }
+
+    if args.enqueue:
+        job_id = job_queue.enqueue("analysis_backfill", options, dedupe_key=f"analysis_backfill:{args.name}")
+        print(f"✅ Backfill job queued: {job_id}")
+        return
+
+    runner = AnalysisBackfillRunner(**options)
+    if args.reset:
+        runner.reset()
+        print(f"🧹 Checkpoint '{args.name}' cleared")
+    if args.status:
+        print(runner.status())
+        return
+    if args.collect:
+        print("⏳ Waiting for submitted batches...")
+        print(f"✅ {runner.collect_batches(wait=True)}")
+        return
+
+    try:
+        result = runner.run()
+    except KeyboardInterrupt:
+        print("⏸️ Interrupted; rerun with the same --name to resume")
+        return
+    print(f"✅ Status: {result['status']}")
+    print(f"   scanned={result['scanned']} analyzed={result['analyzed']} failed={result['failed']} "
+          f"processed_this_run={result['processed_this_run']} tokens_this_run≈{result['tokens_this_run']} "
+          f"tokens_total≈{result['tokens_used']}")
+    if result.get("batches"):
+        print(f"   batches: {result['batches']}")
+
+
+if __name__ == "__main__":
+    main()
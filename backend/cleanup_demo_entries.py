@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.services.firestore_service import firestore_service
+from app.services.diary_deletion import diary_deletion_service
 from app.utils.auth import hash_password
 from datetime import datetime, timezone, timedelta
 
@@ -43,7 +44,7 @@ def cleanup_and_create_demo_entries():
     print(f"✅ Demo user found/created: {user_id}")
     
     # Clear all existing entries
-    clear_result = firestore_service.clear_all_diary_entries(user_id)
+    clear_result = diary_deletion_service.clear_user(user_id)
     if clear_result.get("success"):
         print(f"✅ Cleared {clear_result.get('deleted_count', 0)} existing entries")
     else:
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Local mock of the OpenAI, Gemini, Fal and Stability APIs for offline load tests.
+
+Responses are deterministic for a given request body: chat completions return
+stable text, structured-output requests return a JSON instance that validates
+against the requested schema (e.g. THERAPY_SCHEMA), embeddings are stable
+bag-of-words vectors (similar texts -> similar vectors), and image endpoints
+return a solid-colour PNG. Latency, streaming speed and error/429 rates are
+configurable from the command line or at runtime through /mock/config.
+
+Usage:
+    python mock_providers.py --port 8900 --latency-ms 400 --latency-dist lognormal --throttle-rate 0.02
+
+Point the backend at it:
+    OPENAI_BASE_URL=http://localhost:8900/v1
+    GEMINI_BASE_URL=http://localhost:8900
+    FAL_REST_BASE=http://localhost:8900/fal
+    STABILITY_API_BASE=http://localhost:8900
+    OPENAI_API_KEY=mock GEMINI_API_KEY=mock FAL_KEY=mock STABILITY_API_KEY=mock
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import time
+import uuid
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+app = FastAPI(title="MemoryMap Mock Providers")
+
+CONFIG: Dict[str, Any] = {
+    "latency_ms": 300.0,
+    "latency_dist": "lognormal",  # fixed | uniform | lognormal
+    "latency_jitter": 0.5,  # uniform: ±oran, lognormal: sigma
+    "stream_chunk_ms": 20.0,
+    "error_rate": 0.0,
+    "throttle_rate": 0.0,
+    "retry_after": 2.0,
+    "embedding_dim": 1536,
+}
+STATS: Dict[str, int] = {"requests": 0, "errors": 0, "throttled": 0, "streams": 0}
+
+_SENTENCES = [
+    "Yazdıklarında kendine karşı dürüst olman çok değerli.",
+    "Bugün hissettiklerin, ihtiyaçların hakkında önemli ipuçları veriyor.",
+    "Küçük bir mola vermek ve nefesine odaklanmak iyi gelebilir.",
+    "Bu durumda kendine bir arkadaşına davranacağın kadar şefkatle yaklaşabilirsin.",
+    "Benzer anlarda sana neyin iyi geldiğini not etmek faydalı olur.",
+    "Gününü birkaç küçük ve ulaşılabilir adıma bölmeyi deneyebilirsin.",
+    "Duygularını adlandırmak onların yoğunluğunu azaltmaya yardımcı olur.",
+    "Kendine ayırdığın zaman, enerjini yeniden toplamanı sağlar.",
+]
+_LABELS = ["stres", "umut", "yorgunluk", "aile", "iş", "dinlenme", "merak", "özlem", "kaygı", "huzur"]
+# Bu adlardaki metin alanları cümleyle, diğerleri kısa etiketle doldurulur
+_PROSE_FIELDS = {"summary", "reframe", "self_compassion", "evidence", "text", "description", "coping_plan"}
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _seed(*parts: Any) -> int:
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return int(hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _latency_seconds() -> float:
+    mean = CONFIG["latency_ms"] / 1000
+    dist = CONFIG["latency_dist"]
+    jitter = CONFIG["latency_jitter"]
+    if mean <= 0:
+        return 0.0
+    if dist == "uniform":
+        return random.uniform(mean * max(0.0, 1 - jitter), mean * (1 + jitter))
+    if dist == "lognormal":
+        # Ortanca latency_ms olacak şekilde; sağa çarpık kuyruk gerçek API'lere benzer
+        return random.lognormvariate(math.log(mean), jitter)
+    return mean
+
+
+def _injected_error(style: str) -> Optional[Response]:
+    """Yapılandırılmış oranlarda 429 veya 500 yanıtı üretir (style: openai | google)"""
+    roll = random.random()
+    if roll < CONFIG["throttle_rate"]:
+        STATS["throttled"] += 1
+        headers = {"retry-after": str(CONFIG["retry_after"]),
+                   "retry-after-ms": str(int(CONFIG["retry_after"] * 1000))}
+        if style == "google":
+            body = {"error": {"code": 429, "message": "Resource has been exhausted (mock)", "status": "RESOURCE_EXHAUSTED"}}
+        else:
+            body = {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}}
+        return JSONResponse(body, status_code=429, headers=headers)
+    if roll < CONFIG["throttle_rate"] + CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        if style == "google":
+            body = {"error": {"code": 500, "message": "Internal error (mock)", "status": "INTERNAL"}}
+        else:
+            body = {"error": {"message": "The server had an error (mock)", "type": "server_error", "code": None}}
+        return JSONResponse(body, status_code=500)
+    return None
+
+
+async def _begin(style: str) -> Optional[Response]:
+    STATS["requests"] += 1
+    await asyncio.sleep(_latency_seconds())
+    return _injected_error(style)
+
+
+def _text(seed: int, max_tokens: int) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    budget = max(8, min(int(max_tokens or 200), 400))
+    while _count_tokens(" ".join(sentences)) < budget * 0.6:
+        sentences.append(rng.choice(_SENTENCES))
+    return " ".join(sentences)
+
+
+def schema_instance(schema: Dict[str, Any], rng: random.Random, name: str = "value") -> Any:
+    """JSON şemasına uyan deterministik bir örnek üretir (tüm özellikler doldurulur)"""
+    for key in ("anyOf", "oneOf", "allOf"):
+        if schema.get(key):
+            return schema_instance(schema[key][0], rng, name)
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {
+            prop: schema_instance(sub, rng, prop) for prop, sub in (schema.get("properties") or {}).items()
+        }
+    if kind == "array":
+        low = schema.get("minItems", 0)
+        high = schema.get("maxItems", max(low, 3))
+        count = rng.randint(max(low, min(2, high)), max(low, min(3, high)))
+        return [schema_instance(schema.get("items") or {"type": "string"}, rng, name) for _ in range(count)]
+    if kind in ("number", "integer"):
+        low = schema.get("minimum", 0)
+        high = schema.get("maximum", low + 100)
+        if kind == "integer":
+            return rng.randint(int(math.ceil(low)), int(math.floor(high)))
+        return round(rng.uniform(low, high), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    if name in _PROSE_FIELDS:
+        return rng.choice(_SENTENCES)
+    return rng.choice(_LABELS)
+
+
+@lru_cache(maxsize=50000)
+def _word_vector(word: str, dim: int) -> tuple:
+    rng = random.Random(_seed("word", word))
+    return tuple(rng.gauss(0, 1) for _ in range(dim))
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    vector = [0.0] * dim
+    words = _WORD_RE.findall(text.lower()) or [text]
+    for word in words:
+        for i, value in enumerate(_word_vector(word, dim)):
+            vector[i] += value
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _png(seed: int, width: int, height: int) -> bytes:
+    """Tohuma göre renklendirilmiş düz bir PNG üretir (Pillow gerektirmez)"""
+    rng = random.Random(seed)
+    pixel = bytes(rng.randrange(256) for _ in range(3))
+    row = b"\x00" + pixel * width
+    raw = zlib.compress(row * height, 9)
+
+    def _chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", header) + _chunk(b"IDAT", raw) + _chunk(b"IEND", b"")
+
+
+def _sse(payload: Any) -> str:
+    return f"data: {payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _chunks(text: str, size: int = 12) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+# --- OpenAI -----------------------------------------------------------------
+
+def _chat_content(body: Dict[str, Any], seed: int) -> str:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = (response_format.get("json_schema") or {}).get("schema") or {}
+        return json.dumps(schema_instance(schema, random.Random(seed)), ensure_ascii=False)
+    if response_format.get("type") == "json_object":
+        return json.dumps({"response": _text(seed, body.get("max_tokens") or 200)}, ensure_ascii=False)
+    return _text(seed, body.get("max_tokens") or body.get("max_completion_tokens") or 200)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = await _begin("openai")
+    if error:
+        return error
+    messages = body.get("messages") or []
+    model = body.get("model", "gpt-4o-mini")
+    seed = _seed(model, messages, body.get("response_format"), body.get("temperature"))
+    content = _chat_content(body, seed)
+    prompt_tokens = _count_tokens("".join(str(m.get("content") or "") for m in messages))
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _count_tokens(content),
+        "total_tokens": prompt_tokens + _count_tokens(content),
+    }
+    completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    STATS["streams"] += 1
+    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+    async def _events():
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        yield _sse({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+        for piece in _chunks(content):
+            await asyncio.sleep(CONFIG["stream_chunk_ms"] / 1000)
+            yield _sse({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        yield _sse({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if include_usage:
+            yield _sse({**base, "choices": [], "usage": usage})
+        yield _sse("[DONE]")
+
+    return StreamingResponse(_events(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    error = await _begin("openai")
+    if error:
+        return error
+    inputs = body.get("input")
+    texts = [inputs] if isinstance(inputs, str) else [str(i) for i in inputs or []]
+    dim = int(body.get("dimensions") or CONFIG["embedding_dim"])
+    data = []
+    for index, text in enumerate(texts):
+        vector = _embedding(text, dim)
+        if body.get("encoding_format") == "base64":
+            # openai-python varsayılan olarak base64 (float32, little-endian) ister
+            vector = base64.b64encode(struct.pack(f"<{dim}f", *vector)).decode("ascii")
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+    tokens = sum(_count_tokens(t) for t in texts)
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "text-embedding-3-small"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+# --- Gemini -----------------------------------------------------------------
+
+def _gemini_response(body: Dict[str, Any], model: str, text: Optional[str] = None) -> Dict[str, Any]:
+    contents = body.get("contents") or []
+    config = body.get("generationConfig") or body.get("generation_config") or {}
+    seed = _seed(model, contents, config)
+    modalities = [str(m).upper() for m in config.get("responseModalities") or []]
+    if "IMAGE" in modalities:
+        parts = [{"inlineData": {"mimeType": "image/png", "data": base64.b64encode(_png(seed, 512, 512)).decode("ascii")}}]
+    else:
+        if text is None:
+            schema = config.get("responseSchema") or config.get("responseJsonSchema")
+            if schema:
+                text = json.dumps(schema_instance(schema, random.Random(seed)), ensure_ascii=False)
+            else:
+                text = _text(seed, config.get("maxOutputTokens") or 200)
+        parts = [{"text": text}]
+    prompt_tokens = _count_tokens(json.dumps(contents, ensure_ascii=False))
+    output_tokens = sum(_count_tokens(p.get("text", "")) for p in parts) or 258
+    return {
+        "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+        "modelVersion": model,
+    }
+
+
+@app.post("/{version}/models/{target}")
+async def gemini_models(version: str, target: str, request: Request):
+    body = await request.json()
+    error = await _begin("google")
+    if error:
+        return error
+    model, _, method = target.partition(":")
+    if method == "generateContent":
+        return _gemini_response(body, model)
+    if method == "streamGenerateContent":
+        STATS["streams"] += 1
+        full = _gemini_response(body, model)
+        text = full["candidates"][0]["content"]["parts"][0].get("text")
+        pieces = _chunks(text, 40) if text is not None else [None]
+
+        async def _events():
+            for piece in pieces:
+                await asyncio.sleep(CONFIG["stream_chunk_ms"] / 1000)
+                yield _sse(full if piece is None else _gemini_response(body, model, piece))
+
+        if request.query_params.get("alt") == "sse":
+            return StreamingResponse(_events(), media_type="text/event-stream")
+        return [full if piece is None else _gemini_response(body, model, piece) for piece in pieces]
+    if method == "embedContent":
+        text = " ".join(p.get("text", "") for p in (body.get("content") or {}).get("parts", []))
+        return {"embedding": {"values": _embedding(text, int(body.get("outputDimensionality") or 768))}}
+    return JSONResponse({"error": {"code": 404, "message": f"Unknown method {method}", "status": "NOT_FOUND"}},
+                        status_code=404)
+
+
+# --- Görsel sağlayıcıları ----------------------------------------------------
+
+@app.get("/mock-images/{seed}.png")
+async def mock_image(seed: int, w: int = 768, h: int = 512):
+    return Response(_png(seed, max(1, min(w, 2048)), max(1, min(h, 2048))), media_type="image/png")
+
+
+@app.post("/v1/generation/{engine}/text-to-image")
+async def stability_text_to_image(engine: str, request: Request):
+    body = await request.json()
+    error = await _begin("openai")
+    if error:
+        return error
+    seed = _seed(engine, body.get("text_prompts"))
+    image = _png(seed, int(body.get("width") or 512), int(body.get("height") or 512))
+    return {"artifacts": [{"base64": base64.b64encode(image).decode("ascii"), "seed": seed % 2**32,
+                           "finishReason": "SUCCESS"}]}
+
+
+@app.post("/fal/{model_path:path}")
+async def fal_run(model_path: str, request: Request):
+    body = await request.json()
+    error = await _begin("openai")
+    if error:
+        return error
+    payload = body.get("input") or body
+    ratio = str(payload.get("aspect_ratio") or "1:1").split(":")
+    try:
+        width, height = 1024, int(1024 * int(ratio[1]) / int(ratio[0]))
+    except Exception:
+        width, height = 1024, 1024
+    seed = _seed(model_path, payload.get("prompt"))
+    url = f"{str(request.base_url).rstrip('/')}/mock-images/{seed % 2**53}.png?w={width}&h={height}"
+    return {"images": [{"url": url, "width": width, "height": height, "content_type": "image/png"}],
+            "seed": seed % 2**32}
+
+
+# --- Yönetim ------------------------------------------------------------------
+
+@app.get("/mock/config")
+async def get_config():
+    return {"config": CONFIG, "stats": STATS}
+
+
+@app.post("/mock/config")
+async def update_config(request: Request):
+    """Çalışırken gecikme/hata ayarlarını değiştirir (ör. yük testinde 429 fırtınası senaryosu)"""
+    updates = await request.json()
+    for key, value in updates.items():
+        if key in CONFIG:
+            CONFIG[key] = type(CONFIG[key])(value)
+    return {"config": CONFIG}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Gemini/Fal/Stability server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"],
+                        help="Fixed/mean/median response latency")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default=CONFIG["latency_dist"])
+    parser.add_argument("--latency-jitter", type=float, default=CONFIG["latency_jitter"],
+                        help="uniform: ±fraction of the mean, lognormal: sigma")
+    parser.add_argument("--stream-chunk-ms", type=float, default=CONFIG["stream_chunk_ms"],
+                        help="Delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="Fraction of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=CONFIG["throttle_rate"],
+                        help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=CONFIG["retry_after"],
+                        help="Retry-After seconds sent with 429s")
+    parser.add_argument("--embedding-dim", type=int, default=CONFIG["embedding_dim"])
+    parser.add_argument("--seed", type=int, default=None, help="Seed latency/error sampling")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    for key in CONFIG:
+        CONFIG[key] = getattr(args, key)
+    if args.seed is not None:
+        random.seed(args.seed)
+    print("🧪 Mock Provider Server")
+    print("=" * 40)
+    print(f"OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    print(f"GEMINI_BASE_URL=http://{args.host}:{args.port}")
+    print(f"FAL_REST_BASE=http://{args.host}:{args.port}/fal")
+    print(f"STABILITY_API_BASE=http://{args.host}:{args.port}")
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
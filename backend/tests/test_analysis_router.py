@@ -0,0 +1,99 @@
+import pytest
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.analysis_router import AnalysisRouter, LLM_ANALYSIS_OVERHEAD_TOKENS
+from app.services.text_analysis import THERAPY_SCHEMA
+
+
+def _positive(_text):
+    return {"emotion": "POSITIVE", "confidence": 0.9}
+
+
+def _negative(_text):
+    return {"emotion": "NEGATIVE", "confidence": 0.99}
+
+
+@pytest.fixture
+def router(tmp_path):
+    return AnalysisRouter(db_path=str(tmp_path / "router.sqlite3"), sentiment=_positive, enabled=True)
+
+
+class TestAnalysisRouter:
+    def test_short_entry_stays_local(self, router):
+        """Kısa, sinyalsiz giriş LLM'e gitmeden yerel analizle kapanır"""
+        decision = router.decide("Bugün öğle yemeğinde makarna yedim.")
+        assert decision["tier"] == "local"
+        assert decision["reason"] == "short"
+
+        analysis = router.local_analysis("Bugün öğle yemeğinde makarna yedim.", decision)
+        assert analysis["provider_meta"]["tier"] == "local"
+        assert analysis["themes"][0] == "günlük yaşam"
+        assert analysis["risk"]["self_harm_score"] == 0.0
+
+    @pytest.mark.parametrize("text", ["Bugün öğle yemeğinde makarna yedim.", "Toplantı uzadı, eve geç döndüm."])
+    def test_local_analysis_satisfies_schema(self, router, text):
+        """Yerel analiz THERAPY_SCHEMA'nın zorunlu alanlarını ve dizi sınırlarını karşılar"""
+        analysis = router.local_analysis(text, router.decide(text))
+        properties = THERAPY_SCHEMA["properties"]
+        for field in THERAPY_SCHEMA["required"]:
+            assert field in analysis, field
+            spec = properties[field]
+            if spec["type"] == "array":
+                assert spec.get("minItems", 0) <= len(analysis[field]) <= spec.get("maxItems", 99), field
+            for sub in spec.get("required", []):
+                assert sub in analysis[field], f"{field}.{sub}"
+        assert len(set(analysis["themes"])) == len(analysis["themes"])
+
+    def test_risk_keywords_force_llm(self, router):
+        """Risk ifadesi içeren kısa giriş bile tam analize gider"""
+        decision = router.decide("Artık yaşamak istemiyorum.")
+        assert decision["tier"] == "llm"
+        assert decision["reason"] == "risk_keywords"
+
+    @pytest.mark.parametrize("text", [
+        "Intihar etmeyi düşünüyorum",
+        "İNTİHAR etmeyi düşünüyorum",
+        "KENDIMI ÖLDÜRMEK istiyorum",
+        "I want to KILL MYSELF",
+        "I WANT TO DIE",
+    ])
+    def test_capitalised_risk_keywords_force_llm(self, router, text):
+        """Büyük harfli ve ASCII "I" içeren risk ifadeleri de yakalanır"""
+        decision = router.decide(text)
+        assert decision["tier"] == "llm"
+        assert decision["reason"] == "risk_keywords"
+        assert decision["signals"]["risk"]
+
+    def test_long_entry_goes_to_llm(self, router):
+        """Eşik uzunluğundaki girişler her zaman LLM ile analiz edilir"""
+        decision = router.decide(" ".join(["kelime"] * 45))
+        assert decision["tier"] == "llm"
+        assert decision["reason"] == "length"
+
+    def test_strong_negative_goes_to_llm(self, tmp_path):
+        """Orta uzunlukta, güçlü olumsuz duygu taşıyan giriş LLM'e gider"""
+        router = AnalysisRouter(db_path=str(tmp_path / "neg.sqlite3"), sentiment=_negative, enabled=True)
+        decision = router.decide("Bugün yine her şey ters gitti ve hiçbir şeyi düzgün yapamadım gibi hissettim")
+        assert decision["tier"] == "llm"
+        assert decision["reason"] == "strong_negative"
+
+    def test_disabled_router_always_uses_llm(self, tmp_path):
+        router = AnalysisRouter(db_path=str(tmp_path / "off.sqlite3"), sentiment=_positive, enabled=False)
+        assert router.decide("Kısa not.")["reason"] == "routing_disabled"
+
+    def test_stats_count_decisions_and_savings(self, router):
+        """Yerel kararlar kaçınılan çağrı ve tahmini token tasarrufu olarak sayılır"""
+        text = "Kahvaltı yaptım."
+        router.record(router.decide(text), text)
+        router.record(router.decide(text), text)
+        router.record(router.decide("intihar"), "intihar")
+
+        stats = router.stats()
+        assert stats["entries"] == {"local": 2, "llm": 1}
+        assert stats["llm_calls_avoided"] == 2
+        assert stats["tokens_saved"] == 2 * (len(text) // 4 + LLM_ANALYSIS_OVERHEAD_TOKENS)
+        assert stats["reasons"]["llm:risk_keywords"] == 1
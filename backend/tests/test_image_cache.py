@@ -0,0 +1,53 @@
+import pytest
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.image_cache import ImageCache, image_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(db_path=str(tmp_path / "images.sqlite3"))
+
+
+def _put(cache, key, path="generated_images/user_u1_abc.png"):
+    cache.put(key, "u1", "fal", "fal-ai/imagen4/preview", "a quiet lake at dawn", 768, 512,
+              path, f"https://storage.googleapis.com/bucket/{path}", "abc")
+
+
+class TestImageCache:
+    def test_key_scopes_provider_model_size_and_user(self):
+        """Anahtar sağlayıcı, model, boyut ve kullanıcıya göre ayrışır; boşluk farkı aynı sayılır"""
+        base = image_cache_key("u1", "fal", "m1", "a quiet lake", 768, 512)
+        assert base == image_cache_key("u1", "fal", "m1", "  a quiet   lake ", 768, 512)
+        assert base != image_cache_key("u2", "fal", "m1", "a quiet lake", 768, 512)
+        assert base != image_cache_key("u1", "stability", "m1", "a quiet lake", 768, 512)
+        assert base != image_cache_key("u1", "fal", "m2", "a quiet lake", 768, 512)
+        assert base != image_cache_key("u1", "fal", "m1", "a quiet lake", 512, 512)
+
+    def test_hit_after_put(self, cache):
+        key = image_cache_key("u1", "fal", "fal-ai/imagen4/preview", "a quiet lake at dawn", 768, 512)
+        assert cache.get(key) is None
+        _put(cache, key)
+
+        hit = cache.get(key)
+        assert hit["storage_path"] == "generated_images/user_u1_abc.png"
+        assert hit["sha256"] == "abc"
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+    def test_expired_entries_miss(self, tmp_path):
+        cache = ImageCache(db_path=str(tmp_path / "ttl.sqlite3"), ttl=-1)
+        _put(cache, "k1")
+        assert cache.get("k1") is None
+
+    def test_invalidate_paths_drops_entries(self, cache):
+        """Storage'dan silinen nesneye işaret eden kayıtlar düşürülür"""
+        _put(cache, "k1")
+        _put(cache, "k2", path="generated_images/user_u1_def.png")
+        assert cache.invalidate_paths(["generated_images/user_u1_abc.png"]) == 1
+        assert cache.get("k1") is None
+        assert cache.get("k2") is not None
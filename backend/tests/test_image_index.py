@@ -0,0 +1,96 @@
+import pytest
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.image_index import ImageIndex, SQLiteImageIndexBackend, decode_cursor
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ImageIndex(SQLiteImageIndexBackend(str(tmp_path / "images.sqlite3")))
+    # Testlerde Storage'a gidilmez
+    index._legacy_images = lambda user_id: {"success": True, "images": []}
+    return index
+
+
+def _path(i):
+    return f"generated_images/user_u1_{i:04d}.png"
+
+
+class TestImageIndex:
+    def test_cursor_pagination_newest_first(self, index):
+        """Sayfalar yeniden eskiye, tekrar ve boşluk olmadan ilerler"""
+        for i in range(5):
+            index.record("u1", _path(i), url=f"https://cdn/{i}.png", created_at=1000.0 + i)
+        index.record("u2", "generated_images/user_u2_x.png", created_at=2000.0)
+
+        seen = []
+        cursor = None
+        while True:
+            page = index.list("u1", limit=2, cursor=cursor)
+            seen += [img["path"] for img in page["images"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [_path(i) for i in (4, 3, 2, 1, 0)]
+
+    def test_same_timestamp_is_stable(self, index):
+        """Aynı zamanlı kayıtlar id ile ayrışır; sayfa sınırında kayıp olmaz"""
+        for i in range(4):
+            index.record("u1", _path(i), created_at=1000.0)
+        first = index.list("u1", limit=3)
+        second = index.list("u1", limit=3, cursor=first["next_cursor"])
+        paths = [img["path"] for img in first["images"] + second["images"]]
+        assert sorted(paths) == [_path(i) for i in range(4)]
+        assert second["next_cursor"] is None
+
+    def test_reupload_keeps_single_record(self, index):
+        """Aynı içerik-adresli yol yeniden kaydedilince kayıt çoğalmaz, giriş bağı korunur"""
+        index.record("u1", _path(1), url="https://cdn/a.png", entry_id="e1", created_at=1000.0)
+        index.record("u1", _path(1), url="https://cdn/a.png", created_at=2000.0)
+        images = index.list("u1")["images"]
+        assert len(images) == 1
+        assert images[0]["entry_id"] == "e1"
+        assert images[0]["created"].startswith("1970-01-01T00:16:40")
+
+    def test_remove(self, index):
+        index.record("u1", _path(1), created_at=1000.0)
+        index.record("u1", _path(2), created_at=1001.0)
+        index.remove([_path(2)])
+        assert [img["path"] for img in index.list("u1")["images"]] == [_path(1)]
+
+    def test_invalid_cursor(self, index):
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+        with pytest.raises(ValueError):
+            index.list("u1", cursor="%%%")
+
+    def test_legacy_images_seeded_once_even_if_index_not_empty(self, index):
+        """Deploy sonrası yeni görsel eklemiş kullanıcının eski görselleri de taranır; tarama bir kez yapılır"""
+        scans = []
+
+        def legacy(user_id):
+            scans.append(user_id)
+            return {"success": True, "images": [
+                {"path": _path(0), "url": "https://cdn/0.png", "created": "2024-01-01T00:00:00+00:00"},
+            ]}
+
+        index._legacy_images = legacy
+        index.record("u1", _path(1), created_at=2000000000.0)
+
+        paths = [img["path"] for img in index.list("u1")["images"]]
+        assert paths == [_path(1), _path(0)]
+
+        # Yeni süreç (bellek işareti yok) kalıcı işarete bakar, yeniden taramaz
+        fresh = ImageIndex(index.backend)
+        fresh._legacy_images = legacy
+        fresh.list("u1")
+        assert scans == ["u1"]
+
+    def test_failed_scan_is_retried(self, index):
+        index._legacy_images = lambda user_id: {"success": False, "error": "storage down"}
+        index.list("u1")
+        assert not index.backend.is_seeded("u1")
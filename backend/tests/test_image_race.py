@@ -0,0 +1,109 @@
+import pytest
+import asyncio
+import sys
+import os
+import threading
+import time
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.providers.image_race import ImageRaceError, plan_race, race_providers
+from app.services.providers.resilience import HALF_OPEN, BreakerRegistry
+
+COSTS = {"fal": 0.04, "gemini": 0.039, "stability": 0.01}
+
+
+def _ok(name):
+    return lambda prompt: {"success": True, "data": {"image_url": f"https://{name}/img.png"}}
+
+
+def _fail(prompt):
+    return {"success": False, "error": "boom"}
+
+
+class TestPlanRace:
+    def test_cheapest_first_within_budget(self):
+        """Bütçeye sığan en ucuz iki sağlayıcı yarışır, kalan yedekte bekler"""
+        racers, fallbacks = plan_race(["fal", "gemini", "stability"], COSTS, budget=0.06, width=2)
+        assert racers == ["stability", "gemini"]
+        assert fallbacks == ["fal"]
+
+    def test_zero_budget_is_sequential(self):
+        racers, fallbacks = plan_race(["fal", "gemini", "stability"], COSTS, budget=0.0, width=3)
+        assert racers == ["stability"]
+        assert fallbacks == ["gemini", "fal"]
+
+
+class TestRaceProviders:
+    def test_first_success_wins_and_slow_racer_is_cancelled(self):
+        """İlk başarılı sağlayıcı kazanır; yavaş olan iptal edilir ve maliyete sayılır"""
+        release = threading.Event()
+
+        def slow(prompt):
+            release.wait(5)
+            return {"success": True, "data": {"image_url": "https://slow/img.png"}}
+
+        try:
+            result = asyncio.run(race_providers(
+                "a dream", {"gemini": slow, "stability": _ok("stability")},
+                costs=COSTS, budget=0.06, width=2, breakers=BreakerRegistry(),
+            ))
+        finally:
+            release.set()
+        assert result["provider"] == "stability"
+        assert result["data"]["image_url"] == "https://stability/img.png"
+        statuses = {a["provider"]: a["status"] for a in result["attempts"]}
+        assert statuses == {"stability": "won", "gemini": "cancelled"}
+        assert result["cost_usd"] == pytest.approx(0.049)
+
+    def test_job_does_not_wait_for_losing_thread(self):
+        """Kaybeden sağlayıcının thread'i sürse de asyncio.run kazananla hemen döner"""
+        release = threading.Event()
+
+        def slow(prompt):
+            release.wait(5)
+            return {"success": False, "error": "late"}
+
+        start = time.monotonic()
+        try:
+            # Eşit maliyet: yavaş sağlayıcı önce başlar, thread'i kesin çalışıyor olur
+            result = asyncio.run(race_providers(
+                "a dream", {"gemini": slow, "stability": _ok("stability")},
+                costs={"gemini": 0.01, "stability": 0.01}, budget=0.06, width=2, breakers=BreakerRegistry(),
+            ))
+            elapsed = time.monotonic() - start
+        finally:
+            release.set()
+        assert result["provider"] == "stability"
+        assert elapsed < 1.0
+
+    def test_fallback_runs_after_racers_fail(self):
+        result = asyncio.run(race_providers(
+            "a dream", {"fal": _ok("fal"), "stability": _fail},
+            costs=COSTS, budget=0.0, width=2, breakers=BreakerRegistry(),
+        ))
+        assert result["provider"] == "fal"
+        assert [a["status"] for a in result["attempts"]] == ["failed", "won"]
+
+    def test_unused_half_open_fallback_keeps_its_probe(self):
+        """Yarışın ihtiyaç duymadığı half-open yedek, probe hakkını kaybetmez"""
+        breakers = BreakerRegistry()
+        breakers.get("image:fal").state = HALF_OPEN
+
+        result = asyncio.run(race_providers(
+            "a dream", {"fal": _ok("fal"), "stability": _ok("stability")},
+            costs=COSTS, budget=0.0, width=2, breakers=breakers,
+        ))
+
+        assert result["provider"] == "stability"
+        assert [a["provider"] for a in result["attempts"]] == ["stability"]
+        assert breakers.get("image:fal").allow()
+
+    def test_all_failures_raise(self):
+        with pytest.raises(ImageRaceError) as exc:
+            asyncio.run(race_providers(
+                "a dream", {"fal": _fail, "stability": _fail},
+                costs=COSTS, budget=0.1, width=2, breakers=BreakerRegistry(),
+            ))
+        assert len(exc.value.attempts) == 2
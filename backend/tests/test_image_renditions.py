@@ -0,0 +1,41 @@
+import io
+import sys
+import os
+
+from PIL import Image
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.image_renditions import available_formats, render_renditions
+
+
+def _png(width=768, height=512, mode="RGB"):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), (120, 80, 200) if mode == "RGB" else (120, 80, 200, 128)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestImageRenditions:
+    def test_widths_and_aspect_ratio(self):
+        """Her hedef genişlik için oran korunarak WebP üretilir"""
+        renditions = render_renditions(_png(), [160, 320, 640], ["webp"])
+        assert [(r["width"], r["height"]) for r in renditions] == [(160, 107), (320, 213), (640, 427)]
+        for r in renditions:
+            assert r["content_type"] == "image/webp"
+            with Image.open(io.BytesIO(r["data"])) as img:
+                assert img.format == "WEBP"
+                assert img.size == (r["width"], r["height"])
+
+    def test_never_upscales(self):
+        """Orijinalden geniş hedefler atlanır; hiçbiri sığmazsa orijinal genişlik kullanılır"""
+        assert [r["width"] for r in render_renditions(_png(300, 200), [160, 320, 640], ["webp"])] == [160]
+        assert [r["width"] for r in render_renditions(_png(100, 100), [160, 320], ["webp"])] == [100]
+
+    def test_alpha_is_preserved(self):
+        renditions = render_renditions(_png(mode="RGBA"), [160], ["webp"])
+        with Image.open(io.BytesIO(renditions[0]["data"])) as img:
+            assert img.mode == "RGBA"
+
+    def test_webp_always_available(self):
+        assert available_formats()[0] == "webp"
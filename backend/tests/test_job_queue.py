@@ -0,0 +1,121 @@
+import pytest
+import time
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Testlerde geri çekilme beklemesini ortadan kaldır
+    monkeypatch.setattr(job_queue_module, "BASE_BACKOFF_SECONDS", 0.0)
+    return JobQueue(db_path=str(tmp_path / "jobs.sqlite3"))
+
+
+class TestJobQueue:
+    """Kalıcı iş kuyruğu testleri"""
+
+    def test_enqueue_and_claim(self, queue):
+        """Kuyruğa eklenen iş alınır ve tamamlanır"""
+        job_id = queue.enqueue("demo", {"value": 1})
+
+        job = queue.claim("demo")
+
+        assert job["id"] == job_id
+        assert job["payload"] == {"value": 1}
+        assert job["attempts"] == 1
+        assert queue.claim("demo") is None
+
+        queue.complete(job, {"ok": True})
+        assert queue.get(job_id)["status"] == "done"
+        assert queue.get(job_id)["result"] == {"ok": True}
+
+    def test_dedupe_key_returns_existing_job(self, queue):
+        """Aynı dedupe_key ile bekleyen iş varsa yenisi eklenmez"""
+        first = queue.enqueue("demo", {}, dedupe_key="entry:1")
+        second = queue.enqueue("demo", {}, dedupe_key="entry:1")
+
+        assert first == second
+
+    def test_failed_job_is_retried_then_dead_lettered(self, queue):
+        """Deneme hakkı biten iş dead-letter'a düşer ve hook çağrılır"""
+        dead = []
+        queue.register("demo", lambda payload: None, max_attempts=2, on_dead=lambda p, e: dead.append(e))
+        job_id = queue.enqueue("demo", {"value": 1})
+
+        job = queue.claim("demo")
+        assert queue.fail(job, "boom") == "queued"
+
+        job = queue.claim("demo")
+        assert job["attempts"] == 2
+        assert queue.fail(job, "boom again") == "dead"
+
+        assert queue.get(job_id)["status"] == "dead"
+        assert dead == ["boom again"]
+        assert queue.retry_dead(job_id)
+        assert queue.get(job_id)["status"] == "queued"
+
+    def test_expired_visibility_timeout_makes_job_claimable(self, queue):
+        """Görünürlük süresi dolan iş başka worker tarafından alınabilir"""
+        queue.register("demo", lambda payload: None, visibility_timeout=0)
+        job_id = queue.enqueue("demo", {})
+
+        assert queue.claim("demo")["id"] == job_id
+        time.sleep(0.01)
+        reclaimed = queue.claim("demo")
+
+        assert reclaimed["id"] == job_id
+        assert reclaimed["attempts"] == 2
+
+    def test_stale_ack_is_ignored_after_reclaim(self, queue):
+        """Görünürlük süresi dolan worker'ın geç onayı yeni denemenin durumunu ezmez"""
+        queue.register("demo", lambda payload: None, visibility_timeout=0)
+        job_id = queue.enqueue("demo", {})
+
+        stale = queue.claim("demo")
+        time.sleep(0.01)
+        current = queue.claim("demo")
+
+        assert not queue.complete(stale, {"late": True})
+        assert queue.fail(stale, "late failure") == "stale"
+        assert queue.get(job_id)["status"] == "running"
+
+        assert queue.complete(current, {"ok": True})
+        assert queue.get(job_id)["result"] == {"ok": True}
+
+    def test_retry_dead_skips_job_replaced_by_live_duplicate(self, queue):
+        """Aynı dedupe_key ile canlı iş varsa dead iş canlandırılmaz, benzersiz indeks bozulmaz"""
+        queue.register("demo", lambda payload: None, max_attempts=1)
+        dead_id = queue.enqueue("demo", {}, dedupe_key="entry:1")
+        assert queue.fail(queue.claim("demo"), "boom") == "dead"
+        live_id = queue.enqueue("demo", {}, dedupe_key="entry:1")
+
+        assert live_id != dead_id
+        assert not queue.retry_dead(dead_id)
+        assert queue.get(dead_id)["status"] == "dead"
+        assert queue.get(live_id)["status"] == "queued"
+
+    def test_workers_process_jobs(self, queue):
+        """Worker thread'leri kayıtlı handler ile işleri yürütür"""
+        seen = []
+        queue.register("demo", lambda payload: seen.append(payload["value"]), concurrency=2)
+        for i in range(5):
+            queue.enqueue("demo", {"value": i})
+
+        queue.start()
+        try:
+            deadline = time.time() + 5
+            while len(seen) < 5 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            queue.stop()
+
+        assert sorted(seen) == [0, 1, 2, 3, 4]
+        stats = queue.stats()
+        assert stats["depth"]["demo"]["done"] == 5
+        assert stats["process_counters"]["demo"]["completed"] == 5
@@ -0,0 +1,67 @@
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.json_stream import JsonArrayStream, JsonObjectStream
+
+
+class TestJsonArrayStream:
+    """Artımlı JSON dizisi ayrıştırıcı testleri"""
+
+    def test_items_emitted_as_soon_as_complete(self):
+        """Her eleman ayırıcısı geldiği anda döner; kod çiti ve ayraç içeren metinler bozulmaz"""
+        parser = JsonArrayStream()
+        chunks = ['```json\n["Bugün seni en çok ne', ' yordu?", "Hangi an\\"ı', '\\" [tekrar] yaşamak', ' isterdin?"', ', {"a": [1, 2]}]\n```']
+        emitted = [parser.feed(chunk) for chunk in chunks]
+
+        assert emitted == [
+            [],
+            ["Bugün seni en çok ne yordu?"],
+            [],
+            [],
+            ['Hangi an"ı" [tekrar] yaşamak isterdin?', {"a": [1, 2]}],
+        ]
+        assert parser.done
+        assert parser.count == 3
+
+    def test_first_item_available_before_stream_ends(self):
+        """İlk soru, dizinin geri kalanı gelmeden ayrıştırılır"""
+        parser = JsonArrayStream()
+
+        assert parser.feed('["Bir?", "İki') == ["Bir?"]
+        assert parser.feed('?"]') == ["İki?"]
+        assert parser.feed(', "Üç?"]') == []
+
+    def test_non_json_output_yields_nothing(self):
+        """JSON olmayan çıktı eleman üretmez; ham metin buffer'da kalır"""
+        parser = JsonArrayStream()
+
+        assert parser.feed("1. Bugün ne hissettin?\n2. Neden?") == []
+        assert parser.count == 0
+        assert "Neden?" in parser.buffer
+
+
+class TestJsonObjectStream:
+    """Artımlı JSON nesnesi (yapılandırılmış çıktı) ayrıştırıcı testleri"""
+
+    def test_top_level_fields_emitted_in_order(self):
+        """İç içe alanlar kapanınca, tepe seviye alanlar ayırıcı geldiği anda döner"""
+        parser = JsonObjectStream()
+        text = '{"affect": {"primary_emotions": [{"label": "kaygı", "intensity": 0.7}], "valence": -0.4}, ' \
+               '"themes": ["iş", "yorgunluk"], "summary": "Zor, ama {geçici} bir gün."}'
+        emitted = []
+        for i in range(0, len(text), 7):
+            emitted.extend(parser.feed(text[i:i + 7]))
+
+        assert [field for field, _ in emitted] == ["affect", "themes", "summary"]
+        assert emitted[0][1]["primary_emotions"][0]["label"] == "kaygı"
+        assert emitted[2][1] == "Zor, ama {geçici} bir gün."
+        assert parser.done
+
+    def test_affect_available_before_rest_of_object(self):
+        """İlk alan, nesnenin geri kalanı gelmeden kullanılabilir"""
+        parser = JsonObjectStream()
+
+        assert parser.feed('{"affect": {"valence": 0.2}, "themes": ["a"') == [("affect", {"valence": 0.2})]
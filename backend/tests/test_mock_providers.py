@@ -0,0 +1,48 @@
+import pytest
+import sys
+import os
+import random
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_providers import _embedding, schema_instance
+from app.services.text_analysis import THERAPY_SCHEMA
+
+
+def _check(schema, value):
+    kind = schema.get("type")
+    if kind == "object":
+        assert isinstance(value, dict)
+        for key in schema.get("required", []):
+            assert key in value
+        for key, sub in schema.get("properties", {}).items():
+            _check(sub, value[key])
+    elif kind == "array":
+        assert schema.get("minItems", 0) <= len(value) <= schema.get("maxItems", len(value))
+        for item in value:
+            _check(schema.get("items", {}), item)
+    elif kind == "number":
+        assert schema.get("minimum", value) <= value <= schema.get("maximum", value)
+    elif kind == "string":
+        assert isinstance(value, str) and value
+
+
+class TestMockProviders:
+    """Yük testi mock sunucusu yanıt üretimi testleri"""
+
+    def test_therapy_schema_instance_is_valid_and_deterministic(self):
+        """Yapılandırılmış çıktı THERAPY_SCHEMA'ya uyar ve aynı tohumla aynıdır"""
+        first = schema_instance(THERAPY_SCHEMA, random.Random(7))
+        _check(THERAPY_SCHEMA, first)
+        assert first == schema_instance(THERAPY_SCHEMA, random.Random(7))
+
+    def test_embeddings_are_normalized_and_similarity_aware(self):
+        """Ortak kelimeli metinlerin vektörleri, ilgisiz metinlerden daha benzerdir"""
+        a = _embedding("bugün işte çok stresliydim", 256)
+        b = _embedding("bugün işte stresliydim", 256)
+        c = _embedding("hafta sonu deniz tatili", 256)
+
+        dot = lambda x, y: sum(i * j for i, j in zip(x, y))
+        assert dot(a, a) == pytest.approx(1.0)
+        assert dot(a, b) > dot(a, c)
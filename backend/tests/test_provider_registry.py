@@ -0,0 +1,54 @@
+import threading
+import types
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.providers import llm_openai
+from app.services.providers import registry as registry_module
+from app.services.providers.registry import ProviderRegistry
+
+
+class _FakeHttpClient:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def close(self):
+        pass
+
+
+class _FakeOpenAI:
+    def __init__(self, api_key=None, http_client=None):
+        self.http_client = http_client
+
+
+fake_httpx = types.SimpleNamespace(
+    Client=_FakeHttpClient,
+    AsyncClient=_FakeHttpClient,
+    Limits=lambda **kwargs: kwargs,
+    Timeout=lambda *args, **kwargs: (args, kwargs),
+)
+
+
+class TestProviderRegistry:
+    """Süreç başına paylaşılan sağlayıcı istemcileri testleri"""
+
+    def test_openai_llm_builds_without_deadlock(self, monkeypatch):
+        """Fabrika kilit altında paylaşılan httpx istemcilerini alabilir; çağrı takılmaz"""
+        monkeypatch.setattr(registry_module, "httpx", fake_httpx)
+        monkeypatch.setattr(llm_openai, "OpenAI", _FakeOpenAI)
+        monkeypatch.setattr(llm_openai, "AsyncOpenAI", _FakeOpenAI)
+        registry = ProviderRegistry()
+        built = []
+
+        worker = threading.Thread(target=lambda: built.append(registry.openai_llm(api_key="sk-test")), daemon=True)
+        worker.start()
+        worker.join(timeout=2)
+
+        assert not worker.is_alive()
+        provider = built[0]
+        assert provider.client.http_client is registry.http_client()
+        assert provider.async_client.http_client is registry.async_http_client()
+        assert registry.openai_llm(api_key="sk-test") is provider
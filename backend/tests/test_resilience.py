@@ -0,0 +1,109 @@
+import pytest
+import time
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.providers.resilience import (
+    BreakerRegistry,
+    CircuitBreaker,
+    CircuitOpenError,
+    call_with_fallback,
+)
+from app.services.providers.scheduler import MemoryBucketBackend, ProviderScheduler
+
+
+class TestCircuitBreaker:
+    """Model başına devre kesici testleri"""
+
+    def test_opens_on_error_rate_and_recovers_after_probe(self):
+        """Hata oranı eşiği aşılınca açılır, başarılı probe ile kapanır"""
+        breaker = CircuitBreaker("m", window=4, min_calls=4, error_rate=0.5, open_seconds=0.05)
+        for ok in (True, False, True, False):
+            breaker.record(ok, 0.01)
+
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        # Half-open'da aynı anda yalnızca bir probe geçer
+        assert not breaker.allow()
+        breaker.record(True, 0.01)
+        assert breaker.state == "closed"
+
+    def test_opens_on_slow_calls(self):
+        """Yavaş çağrı oranı eşiği aşılınca açılır"""
+        breaker = CircuitBreaker("m", window=3, min_calls=3, slow_call_seconds=0.5, slow_rate=0.6)
+        for latency in (0.6, 0.7, 0.1):
+            breaker.record(True, latency)
+
+        assert breaker.state == "open"
+
+
+class TestCallWithFallback:
+    """Aday modeller arasında geri düşme testleri"""
+
+    def test_skips_open_circuit_without_calling(self):
+        """Devresi açık model çağrılmadan atlanır"""
+        breakers = BreakerRegistry()
+        breakers._breakers["primary"] = CircuitBreaker("primary", min_calls=1, error_rate=0.5)
+        breakers.get("primary").record(False, 0.01)
+        called = []
+
+        def call(model):
+            called.append(model)
+            return model
+
+        result, used = call_with_fallback(["primary", "backup"], call, breakers)
+
+        assert (result, used) == ("backup", "backup")
+        assert called == ["backup"]
+
+    def test_all_open_raises_circuit_open(self):
+        """Tüm devreler açıksa hemen CircuitOpenError fırlatılır"""
+        breakers = BreakerRegistry()
+        breakers._breakers["only"] = CircuitBreaker("only", min_calls=1)
+        breakers.get("only").record(False, 0.01)
+
+        with pytest.raises(CircuitOpenError):
+            call_with_fallback(["only"], lambda m: m, breakers)
+
+    def test_hedge_returns_first_success(self, monkeypatch):
+        """Hedge modunda birincil geciktiğinde yedeğin yanıtı kullanılır"""
+        from app.services.providers import resilience
+        monkeypatch.setattr(resilience, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+
+        def call(model):
+            if model == "slow":
+                time.sleep(0.5)
+            return model
+
+        start = time.monotonic()
+        result, used = call_with_fallback(["slow", "fast"], call, BreakerRegistry(), hedge=True)
+
+        assert used == "fast"
+        assert time.monotonic() - start < 0.4
+
+    def test_local_queue_wait_is_not_model_latency(self):
+        """Kova beklemesi p95'e girmez; yerel RateLimitTimeout model hatası sayılmaz"""
+        scheduler = ProviderScheduler(MemoryBucketBackend(), limits={"p": {"rpm": 240}}, max_wait=0.5)
+        breakers = BreakerRegistry()
+
+        def _call(model):
+            with scheduler.slot("p", model):
+                return "ok"
+
+        # Blok süresince beklenir; bu bekleme gecikmeye eklenmemeli
+        scheduler.penalize("p", seconds=0.2)
+        assert call_with_fallback(["m"], _call, breakers)[0] == "ok"
+        breaker = breakers.get("m")
+        assert breaker._latencies[-1] < 0.05
+
+        scheduler.penalize("p", seconds=2)
+        with pytest.raises(RuntimeError, match="rate limit wait exceeded"):
+            call_with_fallback(["m"], _call, breakers)
+        assert breaker.snapshot()["calls"] == 1
+        assert breaker.snapshot()["error_rate"] == 0.0
@@ -0,0 +1,75 @@
+import pytest
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.providers import response_cache as response_cache_module
+from app.services.providers.response_cache import ResponseCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(max_entries=2, db_path=str(tmp_path / "cache.sqlite3"))
+
+
+class TestResponseCache:
+    """LLM yanıt önbelleği testleri"""
+
+    def test_key_is_canonical(self):
+        """Anahtar sırası ve baş/son boşluklar anahtarı değiştirmez; parametreler değiştirir"""
+        a = cache_key("openai", "m", [{"role": "user", "content": "merhaba "}], 0.2, 400)
+        b = cache_key("openai", "m", [{"content": "merhaba", "role": "user"}], 0.2, 400)
+        c = cache_key("openai", "m", [{"role": "user", "content": "merhaba"}], 0.7, 400)
+
+        assert a == b
+        assert a != c
+
+    def test_sqlite_tier_survives_memory_eviction(self, cache):
+        """LRU'dan düşen kayıt SQLite katmanından döner ve token tasarrufu sayılır"""
+        cache.set("k1", {"text": "bir"}, ttl=60, tokens=100)
+        cache.set("k2", "iki", ttl=60, tokens=10)
+        cache.set("k3", "üç", ttl=60, tokens=10)
+
+        assert cache.get("k1") == (True, {"text": "bir"})
+        stats = cache.stats()
+        assert stats["sqlite_hits"] == 1
+        assert stats["tokens_saved"] == 100
+
+        assert cache.get("k1") == (True, {"text": "bir"})
+        assert cache.stats()["memory_hits"] == 1
+
+    def test_expired_entries_are_misses(self, cache):
+        """Süresi dolan kayıt bulunamaz ve temizlenir"""
+        cache.set("k", "eski", ttl=-1)
+
+        assert cache.get("k") == (False, None)
+        assert cache.purge_expired() == 1
+
+    def test_hits_are_independent_copies(self, cache):
+        """Çağıranın sonucu yerinde değiştirmesi önbellekteki değeri bozmaz"""
+        value = {"summary": "s"}
+        cache.set("k", value, ttl=60)
+        value["provider_meta"] = {"latency_ms": 1}
+
+        _, first = cache.get("k")
+        first["provider_meta"] = {"latency_ms": 2}
+
+        assert cache.get("k") == (True, {"summary": "s"})
+
+    def test_unparsed_fallback_is_not_cached(self, cache, monkeypatch):
+        """JSON çözülemeyen {"raw": ...} yanıtı saklanmaz; sonraki çağrı modele gider"""
+        monkeypatch.setattr(response_cache_module, "response_cache", cache)
+        calls = []
+
+        def produce():
+            calls.append(1)
+            return {"raw": "not json"}, 5
+
+        for _ in range(2):
+            response_cache_module.cached_call("openai", "m", [{"role": "user", "content": "x"}], 0.2, 100,
+                                              None, 60, produce)
+
+        assert len(calls) == 2
+        assert cache.stats()["stores"] == 0
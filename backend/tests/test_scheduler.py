@@ -0,0 +1,88 @@
+import pytest
+import sys
+import os
+import threading
+import time
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.providers.scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    MemoryBucketBackend,
+    ProviderScheduler,
+    RateLimitTimeout,
+    SQLiteBucketBackend,
+    retry_after_seconds,
+    throttle_delay,
+)
+
+
+class _Throttled(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"status_code": 429, "headers": headers})()
+
+
+class TestProviderScheduler:
+    """Sağlayıcı token-bucket zamanlayıcı testleri"""
+
+    def test_request_bucket_limits_burst(self):
+        """Kova boşalınca çağrı bekler, bekleme süresi aşılırsa RateLimitTimeout"""
+        scheduler = ProviderScheduler(MemoryBucketBackend(), limits={"p": {"rpm": 4}}, max_wait=0.1)
+
+        scheduler.acquire("p", priority=INTERACTIVE)
+        with pytest.raises(RateLimitTimeout):
+            scheduler.acquire("p", priority=INTERACTIVE)
+        assert scheduler.stats()["providers"]["p"]["timeouts"] == 1
+
+    def test_background_gets_token_from_single_slot_bucket(self):
+        """Kapasitesi 1 olan kovada rezerv arka plan işlerini sonsuza dek bekletmez"""
+        scheduler = ProviderScheduler(MemoryBucketBackend(), limits={"p": {"rpm": 2}}, max_wait=0.1)
+
+        scheduler.acquire("p", priority=BACKGROUND)
+        assert scheduler.stats()["providers"]["p"]["acquired"] == 1
+
+    def test_interactive_served_before_background(self):
+        """Bekleyen etkileşimli istek, daha önce gelen arka plan isteğinin önüne geçer"""
+        scheduler = ProviderScheduler(MemoryBucketBackend(), limits={"p": {"rpm": 240}}, max_wait=5)
+        scheduler.penalize("p", seconds=0.3)
+        order = []
+
+        def _call(priority, name):
+            scheduler.acquire("p", priority=priority)
+            order.append(name)
+
+        background = threading.Thread(target=_call, args=(BACKGROUND, "background"))
+        background.start()
+        time.sleep(0.05)
+        interactive = threading.Thread(target=_call, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        background.join()
+        interactive.join()
+
+        assert order == ["interactive", "background"]
+
+    def test_retry_after_blocks_shared_backend(self, tmp_path):
+        """429 Retry-After süresi SQLite backend'ini paylaşan tüm zamanlayıcılara uygulanır"""
+        db_path = str(tmp_path / "scheduler.sqlite3")
+        first = ProviderScheduler(SQLiteBucketBackend(db_path), limits={}, max_wait=0.1)
+        second = ProviderScheduler(SQLiteBucketBackend(db_path), limits={}, max_wait=0.1)
+
+        with pytest.raises(_Throttled):
+            with first.slot("openai", "gpt-4o-mini"):
+                raise _Throttled({"Retry-After": "30"})
+
+        with pytest.raises(RateLimitTimeout):
+            second.acquire("openai", "gpt-4o-mini")
+        second.acquire("openai", "gpt-4o")
+        assert "openai:gpt-4o-mini" in second.stats()["blocked"]
+
+    def test_retry_after_parsing(self):
+        """retry-after-ms önceliklidir; 429 olmayan hatalar bekleme üretmez"""
+        assert retry_after_seconds({"retry-after-ms": "1500", "retry-after": "9"}) == 1.5
+        assert retry_after_seconds({}, default=2) == 2
+        assert throttle_delay(ValueError("boom")) is None
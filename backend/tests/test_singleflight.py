@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+import threading
+import time
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Eşzamanlı özdeş çağrıların birleştirilmesi testleri"""
+
+    def test_concurrent_threads_share_one_call(self):
+        """Aynı anahtarla eşzamanlı thread'ler tek hesaplamayı paylaşır"""
+        flight = SingleFlight("test-sync")
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(1)
+            return "sonuç"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", compute))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert results == ["sonuç"] * 5
+        assert len(calls) == 1
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    def test_error_is_shared_and_key_released(self):
+        """Liderin hatası bekleyenlere iletilir; sonraki çağrı yeniden hesaplar"""
+        flight = SingleFlight("test-error")
+
+        def boom():
+            raise ValueError("hata")
+
+        with pytest.raises(ValueError):
+            flight.do("k", boom)
+        assert flight.do("k", lambda: 42) == 42
+
+    def test_async_callers_share_one_task(self):
+        """Aynı event loop'taki async çağrılar tek görevi paylaşır"""
+        flight = SingleFlight("test-async")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "async"
+
+        async def main():
+            return await asyncio.gather(*(flight.do_async("k", compute) for _ in range(4)))
+
+        assert asyncio.run(main()) == ["async"] * 4
+        assert len(calls) == 1
+        assert flight.stats()["coalesced"] == 3
+
+    def test_followers_get_private_copies(self):
+        """Bekleyenler dict sonucun kendi kopyasını alır; birinin değişikliği diğerine yansımaz"""
+        flight = SingleFlight("test-copy")
+        release = threading.Event()
+
+        def compute():
+            release.wait(1)
+            return {"themes": ["iş"]}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", compute))) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+
+        results[0]["themes"].append("aile")
+        assert results[1] == results[2] == {"themes": ["iş"]}
+        assert len({id(r) for r in results}) == 3
+
+    def test_nested_call_from_leader_does_not_deadlock(self):
+        """Lider kendi işinin içinden aynı anahtarı çağırırsa doğrudan yürütülür"""
+        flight = SingleFlight("test-nested")
+
+        def outer():
+            return flight.do("k", lambda: "iç") + "+dış"
+
+        assert flight.do("k", outer) == "iç+dış"
+        assert flight.stats()["coalesced"] == 0
@@ -0,0 +1,58 @@
+import pytest
+import hashlib
+import sys
+import os
+
+# Backend modüllerini import edebilmek için path ekle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.upload_guard import UploadGuard, UploadRejected, sniff_image_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+WEBP = b"RIFF\x10\x00\x00\x00WEBPVP8 " + b"\x00" * 50
+
+
+def _stream(guard, data, size):
+    out = b""
+    for i in range(0, len(data), size):
+        out += guard.feed(data[i:i + size])
+    return out + guard.finish()
+
+
+class TestUploadGuard:
+    def test_sniffs_supported_types(self):
+        assert sniff_image_type(PNG) == ("image/png", "png")
+        assert sniff_image_type(b"\xff\xd8\xff\xe0" + b"\x00" * 8) == ("image/jpeg", "jpg")
+        assert sniff_image_type(WEBP) == ("image/webp", "webp")
+        assert sniff_image_type(b"<svg xmlns=") is None
+
+    def test_small_chunks_pass_through_unchanged(self):
+        """İmza parçalara bölünse de tür bulunur ve baytlar eksiksiz aktarılır"""
+        guard = UploadGuard(max_bytes=1024)
+        assert _stream(guard, PNG, 3) == PNG
+        assert guard.content_type == "image/png"
+        assert guard.size == len(PNG)
+        assert guard.sha256 == hashlib.sha256(PNG).hexdigest()
+
+    def test_rejects_unknown_type_before_writing(self):
+        guard = UploadGuard(max_bytes=1024)
+        with pytest.raises(UploadRejected) as exc:
+            guard.feed(b"%PDF-1.7 not an image")
+        assert exc.value.status_code == 415
+
+    def test_rejects_oversize_mid_stream(self):
+        guard = UploadGuard(max_bytes=100)
+        guard.feed(PNG[:64])
+        with pytest.raises(UploadRejected) as exc:
+            guard.feed(PNG[64:])
+        assert exc.value.status_code == 413
+
+    def test_rejects_declared_length_up_front(self):
+        with pytest.raises(UploadRejected) as exc:
+            UploadGuard(max_bytes=100, declared_length=101)
+        assert exc.value.status_code == 413
+
+    def test_empty_upload(self):
+        with pytest.raises(UploadRejected) as exc:
+            UploadGuard(max_bytes=100).finish()
+        assert exc.value.status_code == 400
@@ -24,6 +24,10 @@ const AnalysisCard = ({ entry, onDelete }) => {
   const lifeDomains = Array.isArray(a.life_domains) ? a.life_domains.slice(0, 2) : [];
   const quote = a.quote || null;
   const media = entry.media || {};
+  const webpSrcSet = (media.derivatives || [])
+    .filter((d) => d.format === 'webp' && d.url)
+    .map((d) => `${d.url} ${d.width}w`)
+    .join(', ');
 
   const handleDelete = async () => {
     if (!window.confirm('Bu günlük girişini silmek istediğinizden emin misiniz?')) {
@@ -108,7 +112,14 @@ const AnalysisCard = ({ entry, onDelete }) => {
       </div>
 
       {media.image_url ? (
-        <img src={media.image_url} alt="entry" style={{ width: '100%', borderRadius: '12px' }} />
+        <img
+          src={media.thumbnail_url || media.image_url}
+          srcSet={webpSrcSet || undefined}
+          sizes="(max-width: 640px) 100vw, 640px"
+          loading="lazy"
+          alt="entry"
+          style={{ width: '100%', borderRadius: '12px' }}
+        />
       ) : null}
 
       <div style={{ color: 'var(--text-dark)', fontSize: '14px', lineHeight: 1.6 }}>
@@ -141,7 +141,7 @@ const Gallery = () => {
               <div className="grid-3">
                 {images.map((img, i) => (
                   <div key={i} className="card card-elevated">
-                    <img src={img.url} alt={img.filename} style={{ width: '100%', borderRadius: 12, marginBottom: 8 }} />
+                    <img src={img.url} alt={img.filename} loading="lazy" style={{ width: '100%', borderRadius: 12, marginBottom: 8 }} />
                     <div style={{ fontWeight: 700 }}>{img.filename}</div>
                   </div>
                 ))}
@@ -365,10 +365,28 @@ export const saveImageToStorage = async ({ image_base64, title }) => {
   }
 }; 
 
+// Görsel dosyasını (File/Blob) base64'e çevirmeden ham gövde olarak yükle
+export const uploadImageFile = async (file) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/emotion/image/upload`, {
+      method: 'POST',
+      headers: withAuth({ 'Content-Type': file.type || 'application/octet-stream' }),
+      body: file
+    });
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.detail || 'Görsel yükleme başarısız');
+    }
+    return { success: true, data };
+  } catch (error) {
+    return { success: false, error: error.message };
+  }
+};
+
 // Kullanıcının galeri görsellerini al
 export const getUserImages = async () => {
   try {
-    // Build images list from diary entries' media.image_url
+    // Build images list from diary entries' media (small WebP thumbnail when available)
     const response = await fetch(`${API_BASE_URL}/api/v1/diary/?limit=50`, {
       headers: withAuth({ 'Content-Type': 'application/json' }),
     });
@@ -376,7 +394,11 @@ export const getUserImages = async () => {
     if (!response.ok) throw new Error(data.detail || 'Entries not available');
     const entries = data.entries || [];
     const images = entries
-      .map((e) => ({ url: e?.media?.image_url, filename: e.title || e.id }))
+      .map((e) => ({
+        url: e?.media?.thumbnail_url || e?.media?.image_url,
+        fullUrl: e?.media?.image_url,
+        filename: e.title || e.id,
+      }))
       .filter((i) => i.url);
     return { success: true, data: { images } };
   } catch (error) {